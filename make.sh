@@ -12,9 +12,28 @@ build(){
     pyinstaller --onefile --add-data "saves;saves" --add-data "doc;doc" --add-data "src;src" --add-data "assets;assets" --noconsole --icon=assets/icon.ico --name ScryNet src/main.py
 }
 
+simulate(){
+    echo "=== Lancement du simulateur"
+    python3 src/Simulator.py "$@"
+}
+
+bench(){
+    echo "=== Lancement des benchmarks"
+    python3 src/Benchmark.py "$@"
+}
+
+test(){
+    echo "=== Lancement des tests"
+    python3 -m pytest tests "$@"
+}
+
+acquire(){
+    python3 src/Headless.py "$@"
+}
+
 run(){
     echo "=== Lancement de l'application"
-    ./dist/ScryNet.exe
+    ./dist/ScryNet.exe "$@"
 }
 
 case "$1" in
@@ -25,11 +44,28 @@ case "$1" in
         build
         ;;
     run)
-        run
+        shift
+        run "$@"
+        ;;
+    simulate)
+        shift
+        simulate "$@"
+        ;;
+    bench)
+        shift
+        bench "$@"
+        ;;
+    acquire)
+        shift
+        acquire "$@"
+        ;;
+    test)
+        shift
+        test "$@"
         ;;
     *)
 
-        echo "Usage: $0 {build|run|doc}"
+        echo "Usage: $0 {build|run|doc|simulate|bench|acquire|test}"
         exit 1
         ;;
 esac    
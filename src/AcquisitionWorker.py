@@ -0,0 +1,199 @@
+import string
+import time
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+import numpy as np
+
+from Instrumentation import METRICS
+
+class TraceFrame:
+    """Traces acquired in one go, ready to be rendered.
+    """
+    def __init__(self, curves: list[tuple[np.ndarray, np.ndarray, string]], yLimits: tuple[float, float] = None, live: bool = False, settings: dict = None) -> None:
+        """Constructor.
+
+        Args:
+            curves (list[tuple[np.ndarray, np.ndarray, string]]): (frequency axis (GHz), (trace, point) matrix, label) per instrument.
+            yLimits (tuple[float, float]): Amplitude range displayed by the instrument (dB).
+            live (bool): Frame produced by the live mode.
+            settings (dict): Start and stop frequencies (GHz) and resolution bandwidth (Hz) of a single instrument frame,
+                with the reference level, scale and trace types when known (exported as metadata).
+        """
+        self.curves = curves
+        self.yLimits = yLimits
+        self.live = live
+        self.settings = settings
+        # Analysis of the first active trace (see ChannelAnalyzer.analyze), None when disabled
+        self.analysis = None
+        # Output of the host-side detectors fed with the first active trace, per detector name
+        self.detectors = {}
+        # Test of the traces of a single instrument frame against the selected limit mask (see MaskResult), None when disabled
+        self.mask = None
+        # Description of the acquisition shown in the status bar (e.g. timings of a segmented scan)
+        self.report = None
+        self.timestamp = time.time()
+
+class LatestQueue:
+    """Bounded queue of frames with latest-wins semantics: when it is full the oldest
+    frame is dropped, and get() only returns the most recent frame.
+    """
+    def __init__(self, maxsize: int = 1) -> None:
+        """Constructor.
+
+        Args:
+            maxsize (int): Number of frames kept.
+        """
+        self.frames = deque(maxlen=maxsize)
+        self.lock = threading.Lock()
+        self.dropped = 0
+
+    def put(self, frame) -> None:
+        """Adds a frame, dropping the oldest one if the queue is full.
+
+        Args:
+            frame: The frame.
+        """
+        with self.lock:
+            if len(self.frames) == self.frames.maxlen:
+                self.dropped += 1
+                METRICS.count('dropped_frames')
+            self.frames.append(frame)
+
+    def get(self):
+        """Takes the most recent frame, the older ones are dropped.
+
+        Returns:
+            The frame, None if the queue is empty.
+        """
+        with self.lock:
+            if not self.frames:
+                return None
+            frame = self.frames.pop()
+            self.dropped += len(self.frames)
+            if self.frames:
+                METRICS.count('dropped_frames', len(self.frames))
+            self.frames.clear()
+            return frame
+
+class AcquisitionWorker:
+    """Single thread performing the acquisitions and the jobs submitted to it.
+
+    Frame requests are coalesced: requests made before a fetch starts are all served by
+    that fetch, requests made during a fetch by a single next one. In live mode the sweep
+    counter is polled and a frame is fetched every time it moves.
+    Submitted jobs always run before the next fetch, so settings are applied before traces are read.
+    """
+    def __init__(self, fetch: Callable[[bool], TraceFrame], queue: LatestQueue, sweepCount: Callable[[], int] = None) -> None:
+        """Constructor, starts the worker thread.
+
+        Args:
+            fetch (Callable[[bool], TraceFrame]): Acquires a frame, called with True in live mode.
+            queue (LatestQueue): Queue receiving the frames.
+            sweepCount (Callable[[], int]): Sweep counter polled in live mode (None if no trace is active).
+        """
+        self.fetch = fetch
+        self.queue = queue
+        self.sweepCount = sweepCount
+        self.condition = threading.Condition()
+        self.jobs = deque()
+        self.requested = False
+        self.live = False
+        self.interval = 0.1
+        self.running = True
+
+        # Sweeps per second measured from the sweep counter in live mode
+        self.sweepRate = 0.0
+        # Last exception raised by a fetch
+        self.error = None
+
+        self.thread = threading.Thread(target=self.run, name='AcquisitionWorker', daemon=True)
+        self.thread.start()
+
+    def request(self) -> None:
+        """Requests a frame, several requests before the fetch give a single frame.
+        """
+        with self.condition:
+            self.requested = True
+            self.condition.notify()
+
+    def setLive(self, live: bool, interval: float = None) -> None:
+        """Starts or stops the live mode.
+
+        Args:
+            live (bool): Live mode.
+            interval (float): Minimum time between two polls of the sweep counter (s).
+        """
+        with self.condition:
+            self.live = live
+            if interval is not None:
+                self.interval = interval
+            self.condition.notify()
+
+    def submit(self, func: Callable[[], object]) -> Future:
+        """Runs a function on the worker thread before the next fetch.
+
+        Args:
+            func (Callable[[], object]): The function.
+
+        Returns:
+            Future: Future of the function result.
+        """
+        future = Future()
+        with self.condition:
+            self.jobs.append((func, future))
+            self.condition.notify()
+        return future
+
+    def stop(self) -> None:
+        """Stops the worker thread once its current task is done.
+        """
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self) -> None:
+        """Worker thread loop.
+        """
+        lastCount = None
+        firstCount, firstTime = None, None
+        nextPoll = 0.0
+        while True:
+            with self.condition:
+                while self.running and not self.jobs and not self.requested and not (self.live and time.perf_counter() >= nextPoll):
+                    self.condition.wait(max(0.0, nextPoll - time.perf_counter()) if self.live else None)
+                if not self.running:
+                    return
+                jobs, self.jobs = self.jobs, deque()
+                # The request is taken when the fetch is decided: a request made during the fetch gives the next one
+                requested, live = self.requested, self.live
+                self.requested = False
+
+            for func, future in jobs:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func())
+                    except Exception as error:
+                        future.set_exception(error)
+            if jobs and not requested and not live:
+                continue
+
+            try:
+                if live and not requested:
+                    nextPoll = time.perf_counter() + self.interval
+                    count = self.sweepCount() if self.sweepCount is not None else None
+                    if count is None or count == lastCount:
+                        continue
+                    now = time.perf_counter()
+                    if firstCount is None or count < lastCount:
+                        # The counter restarts when the trace is cleared or its type changes
+                        firstCount, firstTime = count, now
+                    elif now > firstTime:
+                        self.sweepRate = (count - firstCount)/(now - firstTime)
+                        METRICS.count('sweeps', count - lastCount)
+                    lastCount = count
+                self.queue.put(self.fetch(live))
+                self.error = None
+            except Exception as error:
+                self.error = error
@@ -0,0 +1,253 @@
+import string
+import numpy as np
+
+# Row of a peak table: sweep number (row of the amplitudes), point number, frequency (GHz) and amplitude (dB)
+PEAK_DTYPE = np.dtype([('sweep', 'i4'), ('point', 'i4'), ('frequency', 'f8'), ('amplitude', 'f4')])
+
+def wifiChannels() -> tuple[list[string], np.ndarray, np.ndarray]:
+    """Gives the 20 MHz WiFi channels of the 2.4, 5 and 6 GHz bands (the bands of the presets).
+
+    Returns:
+        tuple[list[string], np.ndarray, np.ndarray]: Channel names, center frequencies (GHz) and widths (GHz).
+    """
+    names, centers = [], []
+    for channel in range(1, 14):
+        names.append(f'2.4G {channel}')
+        centers.append(2.412 + 0.005*(channel - 1))
+    for channel in list(range(36, 65, 4)) + list(range(100, 145, 4)) + list(range(149, 166, 4)):
+        names.append(f'5G {channel}')
+        centers.append(5.0 + 0.005*channel)
+    for channel in range(1, 94, 4):
+        names.append(f'6G {channel}')
+        centers.append(5.950 + 0.005*channel)
+    centers = np.array(centers)
+    return names, centers, np.full(len(centers), 0.020)
+
+def toLinear(amplitudes: np.ndarray) -> np.ndarray:
+    """Converts amplitudes to linear power, missing points (NaN) count as no power.
+
+    Args:
+        amplitudes (np.ndarray): Amplitudes (dBm).
+
+    Returns:
+        np.ndarray: Powers (mW).
+    """
+    return np.nan_to_num(np.power(10.0, amplitudes/10.0, dtype=np.float64), nan=0.0)
+
+def toDb(powers: np.ndarray) -> np.ndarray:
+    """Converts linear powers to dBm, a null power gives -inf.
+
+    Args:
+        powers (np.ndarray): Powers (mW).
+
+    Returns:
+        np.ndarray: Amplitudes (dBm).
+    """
+    with np.errstate(divide='ignore'):
+        return 10*np.log10(powers)
+
+def noiseFloor(amplitudes: np.ndarray, percentile: float = 10.0) -> np.ndarray:
+    """Estimates the noise floor of sweeps as a low percentile of their points, which ignores the signals.
+
+    Args:
+        amplitudes (np.ndarray): Sweep or (sweep, point) matrix (dB).
+        percentile (float): Percentile of the points taken as noise floor.
+
+    Returns:
+        np.ndarray: Noise floor of every sweep (dB).
+    """
+    if not np.shape(amplitudes)[-1]:
+        return np.full(np.shape(amplitudes)[:-1], np.nan)
+    # nanpercentile is much slower, it is only needed when there are missing points
+    if np.isnan(amplitudes).any():
+        return np.nanpercentile(amplitudes, percentile, axis=-1)
+    return np.percentile(amplitudes, percentile, axis=-1)
+
+def peakTable(amplitudes: np.ndarray, frequencies: np.ndarray, threshold: float | np.ndarray = None, margin: float = 10.0, count: int = 5) -> np.ndarray:
+    """Finds the highest local maxima of sweeps.
+
+    Args:
+        amplitudes (np.ndarray): Sweep or (sweep, point) matrix (dB).
+        frequencies (np.ndarray): Frequency axis (GHz).
+        threshold (float | np.ndarray): Minimum amplitude of a peak (dB), per sweep or for all of them.
+            Defaults to the noise floor of every sweep plus margin.
+        margin (float): Margin above the noise floor of the default threshold (dB).
+        count (int): Maximum number of peaks per sweep.
+
+    Returns:
+        np.ndarray: Peak table (PEAK_DTYPE), by sweep then by decreasing amplitude.
+    """
+    amplitudes = np.atleast_2d(amplitudes)
+    if threshold is None:
+        threshold = noiseFloor(amplitudes) + margin
+    threshold = np.broadcast_to(np.asarray(threshold, dtype=np.float64).reshape(-1, 1), (len(amplitudes), 1))
+
+    center = amplitudes[:, 1:-1]
+    with np.errstate(invalid='ignore'):
+        isPeak = (center > amplitudes[:, :-2]) & (center >= amplitudes[:, 2:]) & (center >= threshold)
+    sweeps, points = np.nonzero(isPeak)
+    points += 1
+    values = amplitudes[sweeps, points]
+
+    # Highest peaks first within every sweep, then the rank of every peak in its sweep
+    order = np.lexsort((-values, sweeps))
+    sweeps, points, values = sweeps[order], points[order], values[order]
+    firsts = np.searchsorted(sweeps, sweeps)
+    keep = np.arange(len(sweeps)) - firsts < count
+
+    table = np.empty(int(keep.sum()), dtype=PEAK_DTYPE)
+    table['sweep'] = sweeps[keep]
+    table['point'] = points[keep]
+    table['frequency'] = frequencies[points[keep]]
+    table['amplitude'] = values[keep]
+    return table
+
+class ChannelAnalyzer:
+    """Per channel analyses of sweeps sharing a frequency axis.
+
+    The channel masks and point windows are computed once for the axis, so that every
+    analysis of a (sweep, point) matrix is a few vectorized operations on all the sweeps at once.
+    """
+    def __init__(self, frequencies: np.ndarray, rbw: float = None, channels: tuple[list[string], np.ndarray, np.ndarray] = None) -> None:
+        """Constructor.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz).
+            rbw (float): Resolution bandwidth (Hz), used to integrate the channel power.
+                The powers of the points are summed as is when it is not given.
+            channels (tuple[list[string], np.ndarray, np.ndarray]): Names, centers and widths (GHz) of the channels,
+                the WiFi channels by default. Only the channels entirely within the axis are analysed.
+        """
+        names, centers, widths = wifiChannels() if channels is None else channels
+        self.frequencies = frequencies
+        self.rbw = rbw
+        self.binWidth = (frequencies[-1] - frequencies[0])/(len(frequencies) - 1)*1e9 if len(frequencies) > 1 else 0.0
+        self.scale = self.binWidth/rbw if rbw else 1.0
+
+        lows, highs = centers - widths/2, centers + widths/2
+        inside = (lows >= frequencies[0]) & (highs <= frequencies[-1])
+        self.names = [name for name, keep in zip(names, inside) if keep]
+        self.centers = centers[inside]
+        self.widths = widths[inside]
+
+        # Points [start, stop) of every channel and its mask on the axis
+        self.starts = np.searchsorted(frequencies, lows[inside], side='left')
+        self.stops = np.searchsorted(frequencies, highs[inside], side='right')
+        self.masks = (np.arange(len(frequencies)) >= self.starts[:, None]) & (np.arange(len(frequencies)) < self.stops[:, None])
+        # Windows of points of every channel, padded by repeating its last point
+        length = int((self.stops - self.starts).max()) if len(self.starts) else 0
+        self.windows = np.minimum(self.starts[:, None] + np.arange(length), np.maximum(self.stops - 1, self.starts)[:, None])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def reduce(self, ufunc: np.ufunc, values: np.ndarray) -> np.ndarray:
+        """Reduces the points of every channel, without copying them.
+
+        Args:
+            ufunc (np.ufunc): Reduction (e.g. np.fmax).
+            values (np.ndarray): (sweep, point) matrix.
+
+        Returns:
+            np.ndarray: (sweep, channel) matrix.
+        """
+        if not len(self):
+            return np.empty((len(values), 0), dtype=values.dtype)
+        # reduceat reduces between consecutive indices: the (start, stop) pairs of the channels are interleaved
+        # and only the even results are kept, a last column is added so that every stop is a valid index
+        padded = np.concatenate((values, values[:, -1:]), axis=-1)
+        return ufunc.reduceat(padded, np.column_stack((self.starts, self.stops)).ravel(), axis=-1)[:, ::2]
+
+    def channelPower(self, amplitudes: np.ndarray) -> np.ndarray:
+        """Integrates the power of every channel.
+
+        Args:
+            amplitudes (np.ndarray): Sweep or (sweep, point) matrix (dBm).
+
+        Returns:
+            np.ndarray: (sweep, channel) channel powers (dBm).
+        """
+        return toDb(toLinear(np.atleast_2d(amplitudes)) @ self.masks.T*self.scale)
+
+    def occupiedBandwidth(self, amplitudes: np.ndarray, fraction: float = 0.99) -> np.ndarray:
+        """Measures the bandwidth holding a fraction of the power of every channel.
+
+        Args:
+            amplitudes (np.ndarray): Sweep or (sweep, point) matrix (dBm).
+            fraction (float): Fraction of the channel power.
+
+        Returns:
+            np.ndarray: (sweep, channel) occupied bandwidths (Hz), to the width of a point.
+        """
+        powers = toLinear(np.atleast_2d(amplitudes))
+        if not len(self):
+            return np.empty((len(powers), 0))
+        cumulated = np.cumsum(powers, axis=-1)
+        # Cumulated power at the points of every channel, from the point before the channel
+        windows = cumulated[:, self.windows]
+        before = np.where(self.starts > 0, cumulated[:, np.maximum(self.starts - 1, 0)], 0.0)
+        windows -= before[:, :, None]
+        total = windows[:, :, -1]
+        low = (windows < (total*(1 - fraction)/2)[:, :, None]).sum(axis=-1)
+        high = (windows < (total*(1 + fraction)/2)[:, :, None]).sum(axis=-1)
+        return (high - low + 1)*self.binWidth
+
+    def busy(self, amplitudes: np.ndarray, threshold: float | np.ndarray = None, margin: float = 10.0) -> np.ndarray:
+        """Tells which channels hold a signal, i.e. have a point above the threshold.
+
+        Args:
+            amplitudes (np.ndarray): Sweep or (sweep, point) matrix (dB).
+            threshold (float | np.ndarray): Detection threshold (dB), per sweep or for all of them.
+                Defaults to the noise floor of every sweep plus margin.
+            margin (float): Margin above the noise floor of the default threshold (dB).
+
+        Returns:
+            np.ndarray: (sweep, channel) booleans.
+        """
+        amplitudes = np.atleast_2d(amplitudes)
+        if threshold is None:
+            threshold = noiseFloor(amplitudes) + margin
+        threshold = np.asarray(threshold, dtype=np.float64).reshape(-1, 1)
+        with np.errstate(invalid='ignore'):
+            return self.reduce(np.fmax, amplitudes) > threshold
+
+    def occupancy(self, amplitudes: np.ndarray, threshold: float | np.ndarray = None, margin: float = 10.0) -> dict:
+        """Occupancy statistics of every channel over a set of sweeps.
+
+        Args:
+            amplitudes (np.ndarray): (sweep, point) matrix (dBm).
+            threshold (float | np.ndarray): Detection threshold (dB), see busy.
+            margin (float): Margin above the noise floor of the default threshold (dB).
+
+        Returns:
+            dict: Per channel: 'occupancy' (fraction of the sweeps where the channel is busy),
+                'meanPower' (mean linear power in dBm) and 'maxPower' (dBm).
+        """
+        powers = self.channelPower(amplitudes)
+        return {
+            'occupancy': self.busy(amplitudes, threshold, margin).mean(axis=0),
+            'meanPower': toDb(np.power(10.0, powers/10).mean(axis=0)),
+            'maxPower': powers.max(axis=0),
+        }
+
+    def analyze(self, sweep: np.ndarray, count: int = 5, margin: float = 10.0) -> dict:
+        """Runs every analysis on a sweep.
+
+        Args:
+            sweep (np.ndarray): Amplitudes of the sweep (dBm).
+            count (int): Maximum number of peaks.
+            margin (float): Margin above the noise floor of the peaks and busy channels (dB).
+
+        Returns:
+            dict: 'noiseFloor' (dB), 'peaks' (peak table), then per channel of 'names':
+                'power' (dBm), 'obw' (Hz) and 'busy' (booleans).
+        """
+        floor = float(noiseFloor(sweep))
+        return {
+            'noiseFloor': floor,
+            'peaks': peakTable(sweep, self.frequencies, floor + margin, count=count),
+            'names': self.names,
+            'power': self.channelPower(sweep)[0],
+            'obw': self.occupiedBandwidth(sweep)[0],
+            'busy': self.busy(sweep, floor + margin)[0],
+        }
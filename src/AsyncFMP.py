@@ -0,0 +1,225 @@
+import string
+import asyncio
+import contextvars
+from collections import deque
+from contextlib import asynccontextmanager
+
+from Commands import Commands, SweepWatch, traces
+from FMP import TERMINATOR
+
+class AsyncFMP(Commands):
+    """Field Master Pro class used to control the instrument from an asyncio event loop.
+
+    The commands and the settings cache are the ones of Commands (shared with FMP), every
+    method returns an awaitable. Queries are pipelined: they are written as soon as they are
+    awaited and their responses are matched in order by a single reader task, so several
+    trace fetches and parameter reads can be in flight on the same connection.
+    """
+    def __init__(self, ipAddr: string, port: int = 9001, timeout: float = 5.0, binary: bool = True) -> None:
+        """Constructor, the connection is opened by connect().
+
+        Args:
+            ipAddr (string): IP Address of the analyzer (check system information).
+            port (int): port of the analyzer (9001 for Anritsu)
+            timeout (float): default timeout of a query (s).
+            binary (bool): transfers the traces as 32-bit real blocks instead of ASCII.
+        """
+        self.ip = ipAddr
+        self.port = port
+        self.timeout = timeout
+        self.binary = binary
+
+        self.reader = None
+        self.writer = None
+        self.readerTask = None
+
+        # (future, block) of the queries waiting for their response, in sending order
+        self.inflight = deque()
+        self.requested = asyncio.Event()
+
+        # Settings cache and memoized frequency axis, and commands queued by batch(): every task
+        # has its own batch, shared by the tasks it creates
+        Commands.__init__(self)
+        self.batches = contextvars.ContextVar(f'pending{id(self)}', default=None)
+
+    @property
+    def pending(self) -> list:
+        return self.batches.get()
+
+    @pending.setter
+    def pending(self, pending: list) -> None:
+        self.batches.set(pending)
+
+    async def connect(self, reset: bool = True) -> 'AsyncFMP':
+        """Opens the connection with the instrument.
+
+        Args:
+            reset (bool): Blanks every trace once connected.
+
+        Returns:
+            AsyncFMP: The connected instrument.
+        """
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.ip, self.port), self.timeout)
+        self.readerTask = asyncio.create_task(self._readLoop())
+        await self.setDataFormat(self.binary)
+        if reset:
+            await self.reset()
+        return self
+
+    async def close(self) -> None:
+        """Closes the connection with the instrument.
+        """
+        if self.readerTask is not None:
+            self.readerTask.cancel()
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+    async def __aenter__(self) -> 'AsyncFMP':
+        return await self.connect()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    async def _readResponse(self, block: bool) -> bytes:
+        """Reads the next response of the instrument.
+
+        Args:
+            block (bool): Reads an IEEE 488.2 block (#<digits><length><data>) if True, a line otherwise.
+
+        Returns:
+            bytes: The response without its terminator or block header.
+        """
+        # Drops the line terminators left in front of the response (e.g. after a block)
+        first = await self.reader.readexactly(1)
+        while first in (b'\r', b'\n'):
+            first = await self.reader.readexactly(1)
+        if not block or first != b'#':
+            return (first + await self.reader.readuntil(TERMINATOR))[:-len(TERMINATOR)].strip()
+        digits = int(await self.reader.readexactly(1))
+        if digits == 0:
+            # Indefinite length block, ends with the terminator
+            return (await self.reader.readuntil(TERMINATOR))[:-len(TERMINATOR)]
+        length = int(await self.reader.readexactly(digits))
+        return await self.reader.readexactly(length)
+
+    async def _readLoop(self) -> None:
+        """Reader task, hands every response to the oldest query in flight.
+        """
+        try:
+            while True:
+                if not self.inflight:
+                    # The kind of the next response is only known once a query is sent
+                    self.requested.clear()
+                    await self.requested.wait()
+                    continue
+                future, block = self.inflight[0]
+                response = await self._readResponse(block)
+                self.inflight.popleft()
+                # A timed out or cancelled query still consumes its response
+                if not future.done():
+                    future.set_result(response)
+        except asyncio.CancelledError:
+            raise
+        except Exception as error:
+            while self.inflight:
+                future, _ = self.inflight.popleft()
+                if not future.done():
+                    future.set_exception(ConnectionError(f'Connection with the instrument lost ({error!r})'))
+
+    async def write(self, command: string) -> None:
+        """Sends a command to the instrument without waiting for anything.
+
+        Args:
+            command (string): SCPI command.
+        """
+        self.writer.write(command.encode('ascii') + TERMINATOR)
+        await self.writer.drain()
+
+    async def _run(self, steps):
+        """Runs the exchanges of a command (see Commands) on the connection.
+
+        Args:
+            steps: Generator of the command.
+
+        Returns:
+            The result of the command.
+        """
+        response, error = None, None
+        while True:
+            try:
+                request = steps.throw(error) if error is not None else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
+            response, error = None, None
+            kind = request[0]
+            try:
+                if kind == 'write':
+                    await self.write(request[1])
+                elif kind == 'send':
+                    response = await self._send(request[1], request[2])
+                elif kind == 'receive':
+                    # wait_for cancels the future of a query that timed out, the reader task still consumes its response
+                    response = await asyncio.wait_for(request[1], self.timeout if request[2] is None else request[2])
+                elif kind == 'discard':
+                    request[1].cancel()
+                elif kind == 'sleep':
+                    await asyncio.sleep(request[1])
+            except asyncio.TimeoutError:
+                error = TimeoutError('The instrument did not answer in time')
+            except BaseException as exception:
+                # Thrown into the command, so that it discards the responses it still expects
+                error = exception
+
+    async def _send(self, command: string, block: bool) -> asyncio.Future:
+        """Sends a query.
+
+        Args:
+            command (string): SCPI query.
+            block (bool): The response is a block.
+
+        Returns:
+            asyncio.Future: Future of the response.
+        """
+        if self.readerTask.done():
+            raise ConnectionError('Connection with the instrument lost')
+        future = asyncio.get_running_loop().create_future()
+        # Registering and writing without awaiting in between keeps the responses in order
+        self.inflight.append((future, block))
+        self.requested.set()
+        self.writer.write(command.encode('ascii') + TERMINATOR)
+        await self.writer.drain()
+        return future
+
+    @asynccontextmanager
+    async def batch(self, sync: bool = True):
+        """Groups the commands sent inside the block into compound SCPI lines (see FMP.batch).
+
+        Args:
+            sync (bool): Waits for the commands to be executed with a single *OPC?.
+        """
+        if self.pending is not None:
+            yield self
+            return
+        pending = []
+        token = self.batches.set(pending)
+        try:
+            yield self
+        finally:
+            self.batches.reset(token)
+        await self._run(self._sendBatch(pending, sync))
+
+    async def sweeps(self, nbs: list[int] = traces, continuous: bool = False, timeout: float = None):
+        """Asynchronous generator of the complete sweeps (see FMP.sweeps).
+
+        Args:
+            nbs (list[int]): Numbers of the traces transferred, the first one should be Active in continuous mode.
+            continuous (bool): Watches the sweeps of the continuous mode instead of launching them.
+            timeout (float): Timeout of a sweep (s), defaults to the instrument timeout.
+
+        Yields:
+            tuple[int, np.ndarray]: Sweep number and traces of the sweep (see getTraces).
+        """
+        watch = SweepWatch(nbs, continuous, self.timeout if timeout is None else timeout)
+        while True:
+            yield await self._run(self._nextSweep(watch))
@@ -0,0 +1,269 @@
+import string
+import json
+import time
+from collections import deque
+from typing import Callable
+import numpy as np
+
+from FMP import FMP, traces
+from Presets import PRESETS
+
+# Settings of a band, in the order they are compared when the bands are grouped (the frequencies change at every band)
+BAND_SETTINGS = ('rbw', 'scale', 'ref', 'start', 'stop')
+
+class Band:
+    """Frequency band visited by the scheduler, with its own settings and acquisition length.
+    """
+    def __init__(self, name: string, start: float, stop: float, rbw: float = None, ref: float = None, scale: float = None,
+                 sweeps: int = 1, dwell: float = None) -> None:
+        """Constructor.
+
+        Args:
+            name (string): Name of the band.
+            start (float): Start frequency (GHz).
+            stop (float): Stop frequency (GHz).
+            rbw (float): Resolution bandwidth (Hz), unchanged if None.
+            ref (float): Reference level (dB), unchanged if None.
+            scale (float): Amplitude scale (dB/div), unchanged if None.
+            sweeps (int): Number of sweeps acquired per visit.
+            dwell (float): Time spent acquiring sweeps per visit (s), instead of a number of sweeps.
+        """
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self.rbw = rbw
+        self.ref = ref
+        self.scale = scale
+        self.sweeps = sweeps
+        self.dwell = dwell
+
+    def settings(self) -> dict:
+        """Gives the settings of the band.
+
+        Returns:
+            dict: Value per name of BAND_SETTINGS, the unchanged settings are missing.
+        """
+        return {name: getattr(self, name) for name in BAND_SETTINGS if getattr(self, name) is not None}
+
+def loadBands(path: string) -> list[Band]:
+    """Reads a list of bands from a JSON file: [{"name": "WiFi 5", "start": 5.17, "stop": 5.73, "rbw": 3e5, "sweeps": 2}, ...].
+
+    A band named after a preset takes its frequencies when they are not given.
+
+    Args:
+        path (string): The file.
+
+    Returns:
+        list[Band]: The bands.
+    """
+    with open(path) as file:
+        definitions = json.load(file)
+    bands = []
+    for definition in definitions:
+        start, stop = PRESETS.get(definition['name'], (None, None))
+        bands.append(Band(**{'start': start, 'stop': stop, **definition}))
+    return bands
+
+def orderBands(bands: list[Band]) -> list[Band]:
+    """Orders a cycle of bands so that the bands sharing their settings follow each other.
+
+    The bands are grouped by resolution bandwidth, then scale and reference level: within a group only the
+    frequencies change from one band to the next. The order of the frequencies does not change the cost.
+
+    Args:
+        bands (list[Band]): The bands.
+
+    Returns:
+        list[Band]: The bands in the order they are visited.
+    """
+    return sorted(bands, key=lambda band: tuple((value is not None, value or 0.0) for value in (getattr(band, name) for name in BAND_SETTINGS)))
+
+class BandSeries:
+    """Time series of the sweeps of a band.
+    """
+    def __init__(self, band: Band, length: int = None) -> None:
+        """Constructor.
+
+        Args:
+            band (Band): The band.
+            length (int): Number of sweeps kept, all of them if None.
+        """
+        self.band = band
+        self.frequencies = None
+        self.timestamps = deque(maxlen=length)
+        self.sweeps = deque(maxlen=length)
+        # Start of every visit (time.perf_counter), and time spent setting the band and acquiring its sweeps (s)
+        self.visits = []
+        self.reconfigureTime = 0.0
+        self.acquireTime = 0.0
+        # Number of settings sent to the instrument
+        self.changes = 0
+
+    def times(self) -> np.ndarray:
+        """Gives the time of the sweeps kept.
+
+        Returns:
+            np.ndarray: Times (time.time).
+        """
+        return np.array(self.timestamps)
+
+    def stacked(self) -> np.ndarray:
+        """Stacks the sweeps kept.
+
+        Returns:
+            np.ndarray: (sweep, trace, point) float32 matrix.
+        """
+        return np.stack(self.sweeps) if self.sweeps else np.empty((0, len(traces), 0), dtype=np.float32)
+
+    def revisitInterval(self) -> float:
+        """Gives the mean time between the starts of two visits of the band.
+
+        Returns:
+            float: Interval (s), NaN before the second visit.
+        """
+        return float(np.mean(np.diff(self.visits))) if len(self.visits) > 1 else float('nan')
+
+class BandScheduler:
+    """Round-robin scan of a list of bands, each of them with its own settings.
+
+    The bands are visited in the order given by orderBands, so that only the settings that differ from
+    the previous band are sent (in a single compound line, see FMP.batch). Every visit acquires single
+    sweeps, the time series of each band, the revisit interval and the time spent reconfiguring are kept.
+    """
+    def __init__(self, fmp: FMP, bands: list[Band], nbs: list[int] = traces, timeout: float = None, length: int = None,
+                 listener: Callable[[Band, float, np.ndarray, np.ndarray], None] = None) -> None:
+        """Constructor.
+
+        Args:
+            fmp (FMP): The instrument.
+            bands (list[Band]): The bands.
+            nbs (list[int]): Numbers of the traces transferred.
+            timeout (float): Timeout of a sweep (s), defaults to the instrument timeout.
+            length (int): Number of sweeps kept per band, all of them if None.
+            listener (Callable[[Band, float, np.ndarray, np.ndarray], None]): Called with the band, the time (time.time),
+                the frequency axis (GHz) and the traces of every sweep, as soon as it is acquired.
+        """
+        if not bands:
+            raise ValueError('A band scheduler needs at least one band')
+        self.fmp = fmp
+        self.bands = orderBands(bands)
+        self.nbs = list(nbs)
+        self.timeout = timeout
+        self.series = {band.name: BandSeries(band, length) for band in self.bands}
+        self.listener = listener
+        self.cycles = 0
+        # Number of sweeps acquired, all bands included
+        self.count = 0
+        self.totalTime = 0.0
+        self.stopped = False
+
+    def configure(self, band: Band) -> int:
+        """Sends the settings of a band that differ from the current ones and waits for them to be applied.
+
+        Args:
+            band (Band): The band.
+
+        Returns:
+            int: Number of settings sent.
+        """
+        fmp = self.fmp
+        current = {'start': fmp.getStartFreq(), 'stop': fmp.getStopFreq(), 'rbw': fmp.getRBW(), 'ref': fmp.getRefLvl(), 'scale': fmp.getTraceScale()}
+        changes = {name: value for name, value in band.settings().items() if value != current[name]}
+        if not changes:
+            return 0
+        with fmp.batch():
+            # The stop frequency goes first when the band is above the current one, so that start never exceeds stop
+            frequencies = [('stop', fmp.setStopFreq), ('start', fmp.setStartFreq)] if band.start > current['stop'] else [('start', fmp.setStartFreq), ('stop', fmp.setStopFreq)]
+            for name, setter in frequencies + [('rbw', fmp.setRBW), ('ref', fmp.setRefLvl), ('scale', fmp.setTraceScale)]:
+                if name in changes:
+                    setter(changes[name])
+        return len(changes)
+
+    def visit(self, band: Band) -> None:
+        """Sets a band and acquires its sweeps.
+
+        Args:
+            band (Band): The band.
+        """
+        series = self.series[band.name]
+        start = time.perf_counter()
+        series.visits.append(start)
+        series.changes += self.configure(band)
+        acquisition = time.perf_counter()
+        series.reconfigureTime += acquisition - start
+
+        frequencies = self.fmp.getFrequencies()
+        if series.frequencies is not None and len(series.frequencies) != len(frequencies):
+            # The point number changed: the previous sweeps cannot be stacked with the new ones
+            series.timestamps.clear()
+            series.sweeps.clear()
+        series.frequencies = frequencies
+        count = 0
+        while (count < band.sweeps) if band.dwell is None else (count == 0 or time.perf_counter() - acquisition < band.dwell):
+            amplitudes = self.fmp.getSweep(self.nbs, self.timeout)
+            timestamp = time.time()
+            series.timestamps.append(timestamp)
+            series.sweeps.append(amplitudes)
+            if self.listener is not None:
+                self.listener(band, timestamp, frequencies, amplitudes)
+            count += 1
+            self.count += 1
+        series.acquireTime += time.perf_counter() - acquisition
+
+    def cycle(self) -> None:
+        """Visits every band once, the instrument is left on the last band in single sweep mode.
+        """
+        start = time.perf_counter()
+        if self.cycles == 0:
+            self.fmp.continuousOff()
+        for band in self.bands:
+            self.visit(band)
+        self.cycles += 1
+        self.totalTime += time.perf_counter() - start
+
+    def run(self, cycles: int = None, duration: float = None) -> dict:
+        """Cycles through the bands until the number of cycles or the duration is reached.
+
+        The settings of the instrument are restored afterwards, it is left in single sweep mode.
+
+        Args:
+            cycles (int): Number of cycles, None for no limit.
+            duration (float): Duration (s), None for no limit. The last cycle is always complete.
+
+        Returns:
+            dict: BandSeries per band name.
+        """
+        fmp = self.fmp
+        initial = Band('', fmp.getStartFreq(), fmp.getStopFreq(), fmp.getRBW(), fmp.getRefLvl(), fmp.getTraceScale())
+        start = time.perf_counter()
+        try:
+            done = 0
+            while not self.stopped and (cycles is None or done < cycles) and (duration is None or time.perf_counter() - start < duration):
+                self.cycle()
+                done += 1
+        finally:
+            self.configure(initial)
+        return self.series
+
+    def stop(self) -> None:
+        """Stops run once the current cycle is complete, from another thread.
+        """
+        self.stopped = True
+
+    def report(self) -> string:
+        """Describes the revisit interval of every band and the time spent reconfiguring versus acquiring.
+
+        Returns:
+            string: One line per band, then the totals.
+        """
+        lines = []
+        for name, series in self.series.items():
+            busy = series.reconfigureTime + series.acquireTime
+            lines.append(f'{name} : {len(series.visits)} visites, revisite {series.revisitInterval():.2f} s, '
+                         f'réglage {series.reconfigureTime:.2f} s ({series.changes} réglages) / acquisition {series.acquireTime:.2f} s'
+                         f' ({series.acquireTime/busy*100 if busy else 0.0:.0f} %)')
+        reconfigure = sum(series.reconfigureTime for series in self.series.values())
+        acquire = sum(series.acquireTime for series in self.series.values())
+        lines.append(f'{self.cycles} cycles en {self.totalTime:.2f} s : réglage {reconfigure:.2f} s, acquisition {acquire:.2f} s'
+                     f' ({acquire/self.totalTime*100 if self.totalTime else 0.0:.0f} % du temps)')
+        return '\n'.join(lines)
@@ -0,0 +1,156 @@
+import string
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+from FMP import FMP, traces
+from Simulator import Simulator
+from Masks import MASKS, MaskChecker
+
+# Default limits, used when no baseline file is given: metric -> (limit, True if higher is better)
+LIMITS = {
+    'latency_ms': (5.0, False),
+    'latency_p95_ms': (10.0, False),
+    'traces_per_s': (50.0, True),
+    'reset_ms': (20.0, False),
+    'setparam_ms': (20.0, False),
+    'sweeps_per_s': (50.0, True),
+    'analysis_ms': (5.0, False),
+    'mask_ms': (2.0, False),
+}
+
+def timeit(func, repeat: int) -> np.ndarray:
+    """Times several calls of a function.
+
+    Args:
+        func (Callable[[], None]): Function to time.
+        repeat (int): Number of calls.
+
+    Returns:
+        np.ndarray: Duration of every call (s).
+    """
+    durations = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations[i] = time.perf_counter() - start
+    return durations
+
+def run(fmp: FMP, repeat: int, duration: float) -> dict:
+    """Runs the benchmarks against an instrument.
+
+    Args:
+        fmp (FMP): Instrument (usually connected to the simulator).
+        repeat (int): Number of calls of the timed commands.
+        duration (float): Duration of the sweep rate measure (s).
+
+    Returns:
+        dict: Value of every metric.
+    """
+    results = {}
+
+    # The settings getters are served by the cache, *IDN? always goes to the instrument
+    latencies = timeit(lambda: fmp.query('*IDN?'), repeat)
+    results['latency_ms'] = float(np.median(latencies))*1e3
+    results['latency_p95_ms'] = float(np.percentile(latencies, 95))*1e3
+
+    with fmp.batch():
+        for nb in traces:
+            fmp.setTraceModeActive(nb)
+    fmp.getTraces()
+    tracesDurations = timeit(fmp.getTraces, repeat)
+    results['traces_per_s'] = 1/float(np.median(tracesDurations))
+    results['traces_mb_per_s'] = len(traces)*fmp.getPointNumber()*4/float(np.median(tracesDurations))/1e6
+
+    # Analysis of one sweep, it has to stay well below the sweep period to keep pace with the live mode
+    sweep = fmp.getTrace(1)
+    results['analysis_ms'] = float(np.median(timeit(lambda: fmp.getAnalyzer().analyze(sweep), repeat)))*1e3
+
+    # Test of every trace against a mask, run on the acquisition worker for each frame
+    checker = MaskChecker(MASKS['WiFi 2'])
+    frequencies, amplitudes = fmp.getFrequencies(), fmp.getTraces()
+    results['mask_ms'] = float(np.median(timeit(lambda: checker.check(frequencies, amplitudes), repeat)))*1e3
+
+    results['reset_ms'] = float(np.median(timeit(fmp.reset, repeat)))*1e3
+
+    # Alternates the spans so that the batch never skips the settings
+    spans = iter(range(2*repeat))
+    results['setparam_ms'] = float(np.median(timeit(lambda: fmp.setParam(2.4, 2.5 + next(spans)*1e-3, 0, 10, 3e5), repeat)))*1e3
+
+    fmp.setTraceModeActive(1)
+    fmp.continuousOff()
+    sweeps = 0
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        fmp.sweepLaunch()
+        fmp.waitOperationComplete()
+        fmp.getTrace(1)
+        sweeps += 1
+    results['sweeps_per_s'] = sweeps/duration
+    fmp.continuousOn()
+
+    return results
+
+def check(results: dict, baseline: dict, tolerance: float) -> list[string]:
+    """Compares the results with the baseline.
+
+    Args:
+        results (dict): Value of every metric.
+        baseline (dict): Reference value of the metrics (from --save), None to use LIMITS.
+        tolerance (float): Allowed relative degradation with respect to the baseline.
+
+    Returns:
+        list[string]: Description of every regression.
+    """
+    regressions = []
+    for metric, (limit, higherIsBetter) in LIMITS.items():
+        if baseline is not None:
+            if metric not in baseline:
+                continue
+            limit = baseline[metric]*(1 - tolerance if higherIsBetter else 1 + tolerance)
+        value = results[metric]
+        if (value < limit) if higherIsBetter else (value > limit):
+            regressions.append(f'{metric} = {value:.3f} ({"<" if higherIsBetter else ">"} {limit:.3f})')
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ScryNet latency and throughput benchmarks against the simulator')
+    parser.add_argument('--points', type=int, default=2001, help='number of points of the simulated traces')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated processing time of every command (s)')
+    parser.add_argument('--sweep-time', type=float, default=0.002, help='simulated sweep duration (s)')
+    parser.add_argument('--repeat', type=int, default=50, help='number of calls of the timed commands')
+    parser.add_argument('--duration', type=float, default=2.0, help='duration of the sweep rate measure (s)')
+    parser.add_argument('--binary', action=argparse.BooleanOptionalAction, default=True, help='binary trace transfer')
+    parser.add_argument('--baseline', help='JSON results of a reference run (default: built-in limits)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative degradation from the baseline')
+    parser.add_argument('--save', help='writes the results to a JSON file, to be used as a baseline')
+    args = parser.parse_args()
+
+    simulator = Simulator(port=0, points=args.points, sweepTime=args.sweep_time, latency=args.latency, seed=0).startInThread()
+    fmp = FMP(simulator.host, simulator.port, binary=args.binary)
+    try:
+        results = run(fmp, args.repeat, args.duration)
+    finally:
+        fmp.close()
+        simulator.stop()
+
+    for metric, value in results.items():
+        print(f'{metric:<20}{value:>12.3f}')
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=4)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    regressions = check(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f'\033[91mRegression : {regression}\033[0m')
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import string
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable
+
+from FMP import FMP
+from InstrumentPool import InstrumentPool
+
+class CommandDispatcher:
+    """Runs the commands of the UI on the instrument workers without blocking the caller.
+
+    Commands are identified by the parameter they change: a command replaces the one
+    queued for the same parameter that has not started yet, so the last value wins.
+    Completions and errors are collected until the UI polls them.
+    """
+    def __init__(self, pool: InstrumentPool) -> None:
+        """Constructor.
+
+        Args:
+            pool (InstrumentPool): Instruments the commands are sent to.
+        """
+        self.pool = pool
+        self.lock = threading.Lock()
+        # Commands queued per (instrument IP, parameter) and number of commands queued or running
+        self.queued = {}
+        self.pending = 0
+        # (parameter, exception or None) of the commands done since the last poll
+        self.done = deque()
+
+    def dispatch(self, ipAddr: string, key: string, func: Callable[[FMP], None]) -> None:
+        """Queues a command.
+
+        Args:
+            ipAddr (string): IP address of the instrument.
+            key (string): Parameter changed by the command.
+            func (Callable[[FMP], None]): The command, called with the instrument.
+        """
+        with self.lock:
+            superseded = (ipAddr, key) in self.queued
+            self.queued[(ipAddr, key)] = func
+            if superseded:
+                return
+            self.pending += 1
+        future = self.pool.submit(ipAddr, lambda fmp: self._run(ipAddr, key, fmp))
+        future.add_done_callback(lambda future: self._failed(ipAddr, key, future))
+
+    def _run(self, ipAddr: string, key: string, fmp: FMP) -> None:
+        """Runs the latest command queued for a parameter, on the instrument worker.
+
+        Args:
+            ipAddr (string): IP address of the instrument.
+            key (string): Parameter changed by the command.
+            fmp (FMP): The instrument.
+        """
+        with self.lock:
+            func = self.queued.pop((ipAddr, key))
+        error = None
+        try:
+            func(fmp)
+        except Exception as exception:
+            error = exception
+        with self.lock:
+            self.pending -= 1
+            self.done.append((key, error))
+
+    def _failed(self, ipAddr: string, key: string, future: Future) -> None:
+        """Reports a command that could not run because the connection to the instrument failed.
+
+        _run catches the errors of the commands, so the future only fails when the connection did
+        (or is cancelled when the instrument is removed).
+
+        Args:
+            ipAddr (string): IP address of the instrument.
+            key (string): Parameter changed by the command.
+            future (Future): Future of the submitted command.
+        """
+        error = None if future.cancelled() else future.exception()
+        if error is None and not future.cancelled():
+            return
+        with self.lock:
+            # The queued command is dropped so that the next one for the parameter is submitted again
+            self.queued.pop((ipAddr, key), None)
+            self.pending -= 1
+            if error is not None:
+                self.done.append((key, error))
+
+    def poll(self) -> list[tuple[string, Exception]]:
+        """Takes the commands done since the last poll.
+
+        Returns:
+            list[tuple[string, Exception]]: (parameter, exception or None) of every command done.
+        """
+        with self.lock:
+            done = list(self.done)
+            self.done.clear()
+        return done
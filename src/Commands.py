@@ -0,0 +1,776 @@
+import string
+import time
+from collections import deque
+from typing import Callable
+import numpy as np
+
+from Instrumentation import METRICS
+
+traces = range(1, 7)
+
+# Longest compound command line sent to the instrument
+MAX_LINE_LENGTH = 512
+
+# Shortest and longest interval between two polls of the sweep counter (s), the interval doubles between them
+POLL_MIN = 0.002
+POLL_MAX = 0.1
+
+# Settings read back in a single compound query by Commands.refresh
+SETTINGS = ['FREQ:STAR', 'FREQ:STOP', 'BAND:RES', 'DISP:WIND:TRAC:Y:SCAL:RLEV', 'DISP:WINDow:TRACe:Y:PDIVision', 'DISP:POIN']
+
+def batchLines(pending: list[tuple], applied: dict, sync: bool) -> list[string]:
+    """Builds the compound lines of a batch.
+
+    Args:
+        pending (list[tuple]): (header, value, command) entries, header is None for actions.
+        applied (dict): Values last applied per header, updated with the settings sent.
+        sync (bool): Appends a *OPC? to the last line.
+
+    Returns:
+        list[string]: Lines to send (empty when every setting is unchanged).
+    """
+    commands = []
+    for header, value, command in pending:
+        if header is not None:
+            if applied.get(header) == value:
+                continue
+            applied[header] = value
+        # A leading colon resets the SCPI header path after a ';'
+        commands.append(command if command.startswith(('*', ':')) else ':' + command)
+    if not commands:
+        return []
+    if sync:
+        commands.append('*OPC?')
+
+    lines, line = [], ''
+    for command in commands:
+        if line and len(line) + len(command) + 1 > MAX_LINE_LENGTH:
+            lines.append(line)
+            line = ''
+        line = f'{line};{command}' if line else command
+    lines.append(line)
+    return lines
+
+def decodeTrace(data: bytes, binary: bool) -> np.ndarray:
+    """Decodes the content of a TRACE:DATA? block.
+
+    Args:
+        data (bytes): Block data without its header.
+        binary (bool): 32-bit real little endian data if True, ASCII otherwise.
+
+    Returns:
+        np.ndarray: The trace data as a float32 array.
+    """
+    if binary:
+        return np.frombuffer(data, dtype='<f4')
+    return np.array(data.decode('ascii').strip().split(','), dtype=np.float32)
+
+def stackTraces(data: list[np.ndarray]) -> np.ndarray:
+    """Stacks the traces into a single matrix.
+
+    Args:
+        data (list[np.ndarray]): One array per trace (empty if the trace is not active).
+
+    Returns:
+        np.ndarray: (trace, point) float32 matrix, NaN rows for the traces that are not active.
+    """
+    points = max((len(trace) for trace in data), default=0)
+    stacked = np.full((len(data), points), np.nan, dtype=np.float32)
+    for row, trace in zip(stacked, data):
+        row[:len(trace)] = trace
+    return stacked
+
+class SweepWatch:
+    """State of a stream of sweeps (see FMP.sweeps): sweep number and period measured from the counter.
+    """
+    def __init__(self, nbs: list[int], continuous: bool, timeout: float) -> None:
+        """Constructor.
+
+        Args:
+            nbs (list[int]): Numbers of the traces transferred, the first one should be Active in continuous mode.
+            continuous (bool): Watches the sweeps of the continuous mode instead of launching them.
+            timeout (float): Timeout of a sweep (s).
+        """
+        self.nbs = list(nbs)
+        self.continuous = continuous
+        self.timeout = timeout
+        # Sweep count of the last sweep given (None before the counter is read), exponential average
+        # of the sweep period and time the last sweep was detected (time.perf_counter)
+        self.count = None if continuous else 0
+        self.period = None
+        self.last = None
+
+class Commands:
+    """Commands and settings cache of the Field Master Pro, independent of the transport.
+
+    Every command is written once, as a generator that yields its exchanges with the instrument and
+    returns its result. The exchanges are:
+
+    - ('write', line): sends a line without waiting for anything.
+    - ('send', command, block): sends a query, gives a token of its response (a block if block is True, a line otherwise).
+    - ('receive', token, timeout): gives the response (bytes) of a query sent, its response is given up if the read fails.
+    - ('discard', token): gives up the response of a query sent.
+    - ('sleep', delay): waits (s).
+
+    FMP runs them on a blocking socket and AsyncFMP on an asyncio connection (see their _run), the public
+    methods return the result of _run: their value with FMP, an awaitable of it with AsyncFMP.
+    A transport sets self.timeout, self.binary and self.pending (commands queued by its batch(), None outside
+    of a batch), and implements _run.
+    """
+    def __init__(self) -> None:
+        """Constructor.
+        """
+        # Write-through cache of the instrument settings per SCPI header (also used by batch() to skip unchanged settings)
+        self.cache = {}
+        # Memoized frequency axis: ((start, stop, points), frequencies)
+        self.axis = None
+
+    def _run(self, steps):
+        """Runs the exchanges of a command with the instrument.
+
+        Args:
+            steps: Generator of the command.
+
+        Returns:
+            The result of the command, or an awaitable of it.
+        """
+        raise NotImplementedError
+
+    def _query(self, command: string, block: bool = False, timeout: float = None):
+        """Sends a query, after the commands queued by the batch, and reads its response.
+
+        Args:
+            command (string): SCPI query.
+            block (bool): The response is a block, a line otherwise.
+            timeout (float): Timeout of the query (s), defaults to the instrument timeout.
+
+        Returns:
+            The block data (bytes) or the response line (string).
+        """
+        yield from self._flush()
+        token = yield ('send', command, block)
+        response = yield ('receive', token, timeout)
+        return response if block else response.decode('ascii').strip()
+
+    def query(self, command: string, timeout: float = None) -> string:
+        """Sends a query and reads its response line.
+
+        Args:
+            command (string): SCPI query.
+            timeout (float): Timeout of the query (s), defaults to the instrument timeout.
+
+        Returns:
+            string: Response given by the instrument.
+        """
+        return self._run(self._query(command, False, timeout))
+
+    def queryBlock(self, command: string, timeout: float = None) -> bytes:
+        """Sends a query answered with a block and reads it.
+
+        Args:
+            command (string): SCPI query.
+            timeout (float): Timeout of the query (s), defaults to the instrument timeout.
+
+        Returns:
+            bytes: The block data without its header.
+        """
+        return self._run(self._query(command, True, timeout))
+
+    def waitOperationComplete(self, timeout: float = None) -> None:
+        """Waits until every pending command has been executed by the instrument.
+
+        Args:
+            timeout (float): Timeout of the wait (s), defaults to the instrument timeout.
+        """
+        return self._run(self._query('*OPC?', False, timeout))
+
+    def _sendCommand(self, command: string, timeout: float = None, sync: bool = False):
+        if '?' in command:
+            return (yield from self._query(command, False, timeout))
+        if self.pending is not None:
+            self.pending.append((None, None, command))
+            return ''
+        yield ('write', command)
+        if sync:
+            yield from self._query('*OPC?', False, timeout)
+        return ''
+
+    def send_command(self, command: string, timeout: float = None, sync: bool = False) -> string:
+        """Send a command to the instrument and read the response.
+
+        Queries (commands containing a '?') wait for their response line, other commands
+        return immediately unless a synchronisation is requested.
+
+        Args:
+            command (string): SCPI command.
+            timeout (float): Timeout of the command (s), defaults to the instrument timeout.
+            sync (bool): Waits for the command to be executed (*OPC?) for set-only commands.
+
+        Returns:
+            string: Response given by the instrument ('' for set-only commands).
+        """
+        return self._run(self._sendCommand(command, timeout, sync))
+
+    def _setSetting(self, header: string, value, unit: string = ''):
+        command = f'{header} {value} {unit}'.rstrip()
+        if self.pending is None:
+            yield ('write', command)
+            self.cache[header] = value
+            return
+        # The last value queued for a setting wins (the list is shared by the tasks of an asyncio batch)
+        self.pending[:] = [entry for entry in self.pending if entry[0] != header]
+        self.pending.append((header, value, command))
+
+    def setSetting(self, header: string, value, unit: string = '') -> None:
+        """Sets an instrument setting, queued when a batch is open.
+
+        The value is written through the settings cache.
+
+        Args:
+            header (string): SCPI header of the setting (e.g. FREQ:STAR).
+            value: New value of the setting.
+            unit (string): Unit appended to the value in the command.
+        """
+        return self._run(self._setSetting(header, value, unit))
+
+    def _getSetting(self, header: string, parse: Callable[[string], object] = float):
+        yield from self._flush()
+        if header not in self.cache:
+            self.cache[header] = parse((yield from self._query(f'{header}?')))
+        return self.cache[header]
+
+    def getSetting(self, header: string, parse: Callable[[string], object] = float):
+        """Gets an instrument setting from the cache, the instrument is only queried when
+        the setting is not cached yet or has been invalidated.
+
+        Args:
+            header (string): SCPI header of the setting (e.g. FREQ:STAR).
+            parse (Callable[[string], object]): Conversion of the response.
+
+        Returns:
+            The value of the setting.
+        """
+        return self._run(self._getSetting(header, parse))
+
+    def invalidate(self, *headers: string) -> None:
+        """Marks cached settings as stale (e.g. after they were changed on the front panel).
+
+        Args:
+            *headers (string): SCPI headers of the settings, every setting if none is given.
+        """
+        if not headers:
+            self.cache.clear()
+        for header in headers:
+            self.cache.pop(header, None)
+
+    def _refresh(self):
+        yield from self._flush()
+        self.invalidate()
+        responses = (yield from self._query(';:'.join(f'{header}?' for header in SETTINGS))).split(';')
+        for header, response in zip(SETTINGS, responses):
+            self.cache[header] = float(response)
+
+    def refresh(self) -> None:
+        """Invalidates the cache and reads the main settings back in a single compound query.
+        """
+        return self._run(self._refresh())
+
+    def _flush(self):
+        if self.pending:
+            # Emptied in place: the tasks of an asyncio batch share the list
+            pending = self.pending[:]
+            self.pending.clear()
+            yield from self._sendBatch(pending, False)
+
+    def flush(self) -> None:
+        """Sends the commands queued by the current batch without waiting for them.
+        """
+        return self._run(self._flush())
+
+    def _sendBatch(self, pending: list[tuple], sync: bool):
+        """Sends queued commands as compound lines.
+
+        Args:
+            pending (list[tuple]): (header, value, command) entries, header is None for actions.
+            sync (bool): Appends a *OPC? to the last line and waits for it.
+        """
+        lines = batchLines(pending, self.cache, sync)
+        for line in lines[:-1] if sync else lines:
+            yield ('write', line)
+        if lines and sync:
+            token = yield ('send', lines[-1], False)
+            yield ('receive', token, None)
+
+    def _frequency(self, header: string):
+        return (yield from self._getSetting(header))/1e9
+
+    def getId(self) -> string:
+        """Identifies the instrument.
+
+        Returns:
+            string: Instrument ID.
+        """
+        return self._run(self._query('*IDN?'))
+
+    def getStartFreq(self) -> float:
+        """Gets the start frequency.
+
+        Returns:
+            float: Start frequency (GHz).
+        """
+        return self._run(self._frequency('FREQ:STAR'))
+
+    def setStartFreq(self, freq: float) -> None:
+        """Sets the start frequency.
+
+        Args:
+            freq (float): Start frequency (GHz).
+        """
+        return self._run(self._setSetting('FREQ:STAR', freq*1e9))
+
+    def getStopFreq(self) -> float:
+        """Gets the stop frequency.
+
+        Returns:
+            float: Stop frequency (GHz).
+        """
+        return self._run(self._frequency('FREQ:STOP'))
+
+    def setStopFreq(self, freq: float) -> None:
+        """Sets the stop frequency.
+
+        Args:
+            freq (float): Stop frequency (GHz).
+        """
+        return self._run(self._setSetting('FREQ:STOP', freq*1e9))
+
+    def getRBW(self) -> float:
+        """Gets the Resolution Bandwidth.
+
+        Returns:
+            float: Resolution Bandwidth (Hz)
+        """
+        return self._run(self._getSetting('BAND:RES'))
+
+    def setRBW(self, freq: float) -> None:
+        """Sets the Resolution Bandwidth.
+
+        Args:
+            freq (float): Resolution Bandwidth (Hz).
+        """
+        return self._run(self._setSetting('BAND:RES', freq, 'Hz'))
+
+    def getRefLvl(self) -> float:
+        """Gets the Reference level.
+
+        Returns:
+            float: Amplitude reference (top limit in dB).
+        """
+        return self._run(self._getSetting('DISP:WIND:TRAC:Y:SCAL:RLEV'))
+
+    def setRefLvl(self, ampl: float) -> None:
+        """Sets the Reference level to the corresponding amplitude.
+
+        Args:
+            ampl (float): Amplitude reference (top limit in dB).
+        """
+        return self._run(self._setSetting('DISP:WIND:TRAC:Y:SCAL:RLEV', ampl))
+
+    def getTraceScale(self) -> float:
+        """Gets the trace vertical scale
+
+        Returns:
+            float: Scale (dB/division)
+        """
+        return self._run(self._getSetting('DISP:WINDow:TRACe:Y:PDIVision'))
+
+    def setTraceScale(self, scale: float) -> None:
+        """Sets the trace vertical scale.
+
+        Args:
+            scale (float): Scale (dB/division).
+        """
+        return self._run(self._setSetting('DISP:WINDow:TRACe:Y:PDIVision', scale))
+
+    def _batch(self, steps, sync: bool = True):
+        """Runs the exchanges of a command as a batch (see FMP.batch), or within the batch already open.
+
+        Args:
+            steps: Generator of the command.
+            sync (bool): Waits for the commands to be executed with a single *OPC?.
+        """
+        if self.pending is not None:
+            return (yield from steps)
+        self.pending = []
+        try:
+            result = yield from steps
+        finally:
+            pending, self.pending = self.pending, None
+        yield from self._sendBatch(pending, sync)
+        return result
+
+    def _setParam(self, startFreq: float, stopFreq: float, gainRef: float, gainScale: float, rbw: float):
+        yield from self._setSetting('FREQ:STAR', startFreq*1e9)
+        yield from self._setSetting('FREQ:STOP', stopFreq*1e9)
+        yield from self._setSetting('DISP:WIND:TRAC:Y:SCAL:RLEV', gainRef)
+        yield from self._setSetting('DISP:WINDow:TRACe:Y:PDIVision', gainScale)
+        yield from self._setSetting('BAND:RES', rbw, 'Hz')
+
+    def setParam(self, startFreq: float, stopFreq: float, gainRef: float, gainScale: float, rbw: float) -> None:
+        """Sets the instrument main parameters.
+
+        Args:
+            startFreq (float): Start frequency (GHz).
+            stopFreq (float): Stop frequency (GHz).
+            gainRef (float): Top gain limit (dB)
+            gainScale (float): Cell scale (dB/division)
+            rbw (float): Resolution bandwidth (Hz)
+        """
+        return self._run(self._batch(self._setParam(startFreq, stopFreq, gainRef, gainScale, rbw)))
+
+    def setTraceMode(self, nb: int, mode: string) -> None:
+        """Sets the selected trace mode.
+
+        Args:
+            nb (int): Trace number.
+            mode (string): Trace mode <Active | Hold/View | Blank>
+        """
+        return self._run(self._setSetting(f'TRACe{nb}:UPDate', mode))
+
+    def getTraceMode(self, nb: int) -> string:
+        """Gets the selected trace mode.
+
+        Args:
+            nb (int): Trace number.
+
+        Returns:
+            string: Trace mode ('1' for Active, '0' for Hold/View or Blank).
+        """
+        return self._run(self._getSetting(f'TRACe{nb}:UPDate', str))
+
+    def setTraceModeActive(self, nb: int) -> None:
+        """Sets the selected trace to Active mode.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceMode(nb, '1')
+
+    def setTraceModeHold(self, nb: int) -> None:
+        """Sets the selected trace to Hold/View mode.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceMode(nb, '0')
+
+    def _blank(self, nb: int):
+        yield from self._setSetting(f'TRACe{nb}:UPDate', '0')
+        yield from self._sendCommand(f'TRACe:CLEar {nb}')
+
+    # This method acts like blank but doesn't really change the trace mode on the instrument
+    def setTraceModeBlank(self, nb: int) -> None:
+        """Sets the selected trace to Blank mode.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self._run(self._batch(self._blank(nb)))
+
+    def setTraceType(self, nb: int, type: string) -> None:
+        """Sets the selected trace type.
+
+        Args:
+            nb (int): Trace number.
+            type (string): Trace type : <NORM | MIN | MAX | AVER>
+        """
+        return self._run(self._setSetting(f'TRACe{nb}:TYPE', type))
+
+    def getTraceType(self, nb: int) -> string:
+        """Gets the selected trace type.
+
+        Args:
+            nb (int): Trace number.
+
+        Returns:
+            string: Trace type : <NORM | MIN | MAX | AVER>
+        """
+        return self._run(self._getSetting(f'TRACe{nb}:TYPE', str))
+
+    def setTraceTypeClearWrite(self, nb: int) -> None:
+        """Sets the selected trace to Clear/Write type.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceType(nb, 'NORMal')
+
+    def setTraceTypeMin(self, nb: int) -> None:
+        """Sets the selected trace to Min Hold type.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceType(nb, 'MINimum')
+
+    def setTraceTypeMax(self, nb: int) -> None:
+        """Sets the selected trace to Max Hold type.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceType(nb, 'MAXimum')
+
+    def setTraceTypeAverage(self, nb: int) -> None:
+        """Sets the selected trace to Average type.
+
+        Args:
+            nb (int): Trace number.
+        """
+        return self.setTraceType(nb, 'AVERage')
+
+    def _reset(self):
+        for traceNumber in traces:
+            yield from self._setSetting(f'TRACe{traceNumber}:TYPE', 'NORMal')
+            yield from self._blank(traceNumber)
+
+    def reset(self) -> None:
+        """Blanks every trace.
+        """
+        return self._run(self._batch(self._reset()))
+
+    def _sweepCount(self, nb: int):
+        return int((yield from self._query(f'TRACe{nb}:SWEep:COUNt?')))
+
+    def getSweepCount(self, nb: int) -> int:
+        """Gets the current sweep number.
+
+        Args:
+            nb (int): Trace number.
+
+        Returns:
+            int: Current sweep number.
+        """
+        return self._run(self._sweepCount(nb))
+
+    def abort(self) -> None:
+        """Aborts any sweep in progress.
+        """
+        return self.send_command('ABORT')
+
+    def _continuous(self):
+        return (yield from self._getSetting('INIT:CONT', lambda response: 'ON' if response.strip().upper() in ('1', 'ON') else 'OFF')) == 'ON'
+
+    def isContinuous(self) -> bool:
+        """Gets the sweep mode.
+
+        Returns:
+            bool: True in continuous sweep mode, False in single sweep mode.
+        """
+        return self._run(self._continuous())
+
+    def continuousOn(self) -> None:
+        """Turns on continuous sweep mode.
+        """
+        return self.setSetting('INIT:CONT', 'ON')
+
+    def continuousOff(self) -> None:
+        """Turns off continuous sweep mode.
+        """
+        return self.setSetting('INIT:CONT', 'OFF')
+
+    def sweepLaunch(self) -> None:
+        """Starts a measurement sweep.
+        """
+        return self.send_command('INIT')
+
+    def _waitSweep(self, nb: int, count: int, timeout: float = None, expected: float = 0.0):
+        deadline = time.perf_counter() + (self.timeout if timeout is None else timeout)
+        delay = max(expected, 0.0)
+        interval = POLL_MIN
+        while True:
+            yield ('sleep', min(delay, max(0.0, deadline - time.perf_counter())))
+            current = yield from self._sweepCount(nb)
+            if current != count:
+                return current
+            if time.perf_counter() >= deadline:
+                raise TimeoutError(f'The sweep count of trace {nb} did not move')
+            delay, interval = interval, min(interval*2, POLL_MAX)
+
+    def waitSweep(self, nb: int, count: int, timeout: float = None, expected: float = 0.0) -> int:
+        """Waits until the sweep counter of a trace moves, in continuous sweep mode.
+
+        The counter is first polled after the expected time, then with an interval doubling from POLL_MIN
+        to POLL_MAX, so that a new sweep is detected quickly without flooding the instrument.
+
+        Args:
+            nb (int): Trace number (it should be Active).
+            count (int): Sweep count of the last sweep read.
+            timeout (float): Timeout of the wait (s), defaults to the instrument timeout.
+            expected (float): Time before the next sweep is expected to complete (s).
+
+        Returns:
+            int: The new sweep count (lower than count when the trace has been cleared).
+
+        Raises:
+            TimeoutError: The counter did not move before the timeout.
+        """
+        return self._run(self._waitSweep(nb, count, timeout, expected))
+
+    def _getSweep(self, nbs: list[int], timeout: float = None):
+        # The sweep and its completion query are sent on a single line
+        yield from self._query(':INIT;*OPC?', False, timeout)
+        return (yield from self._getTraces(nbs))
+
+    def getSweep(self, nbs: list[int] = traces, timeout: float = None) -> np.ndarray:
+        """Runs a single sweep and gets its traces, in single sweep mode.
+
+        Args:
+            nbs (list[int]): Numbers of the traces transferred, all of them by default.
+            timeout (float): Timeout of the sweep (s), defaults to the instrument timeout.
+
+        Returns:
+            np.ndarray: The traces of the sweep (see getTraces).
+        """
+        return self._run(self._getSweep(nbs, timeout))
+
+    def _nextSweep(self, watch: SweepWatch):
+        """Acquires the next sweep of a stream (see FMP.sweeps).
+
+        In single sweep mode the sweep is launched and awaited with *OPC?. In continuous mode the sweep counter
+        of the first trace is watched (see waitSweep), and the traces are read again when a sweep completes
+        during their transfer, so that a frame never mixes two sweeps.
+
+        Args:
+            watch (SweepWatch): State of the stream, updated.
+
+        Returns:
+            tuple[int, np.ndarray]: Sweep number and traces of the sweep.
+        """
+        nbs, timeout = watch.nbs, watch.timeout
+        if not watch.continuous:
+            amplitudes = yield from self._getSweep(nbs, timeout)
+            watch.count += 1
+            METRICS.count('sweeps')
+            return watch.count, amplitudes
+
+        if watch.count is None:
+            watch.count = yield from self._sweepCount(nbs[0])
+        # Polling starts a little before the expected end of the sweep
+        expected = 0.9*watch.period - (time.perf_counter() - watch.last) if watch.period else 0.0
+        current = yield from self._waitSweep(nbs[0], watch.count, timeout, expected)
+        detected = time.perf_counter()
+        deadline = detected + timeout
+        while True:
+            amplitudes = yield from self._getTraces(nbs)
+            if len(nbs) == 1:
+                break
+            check = yield from self._sweepCount(nbs[0])
+            if check == current:
+                break
+            if time.perf_counter() >= deadline:
+                raise TimeoutError('The traces could not be read within a sweep')
+            current = check
+
+        if watch.last is not None and current > watch.count:
+            # Exponential average of the period, robust to the jitter of the polls
+            measured = (detected - watch.last)/(current - watch.count)
+            watch.period = measured if watch.period is None else 0.8*watch.period + 0.2*measured
+        METRICS.count('sweeps', current - watch.count if current > watch.count else 1)
+        watch.count, watch.last = current, detected
+        return current, amplitudes
+
+    def _dataFormat(self, binary: bool):
+        if binary:
+            yield from self._setSetting('FORM:DATA', 'REAL,32')
+            yield from self._setSetting('FORM:BORD', 'SWAP')
+        else:
+            yield from self._setSetting('FORM:DATA', 'ASC')
+
+    def setDataFormat(self, binary: bool) -> None:
+        """Sets the format used to transfer the traces.
+
+        Args:
+            binary (bool): 32-bit real little endian blocks if True, ASCII otherwise.
+        """
+        self.binary = binary
+        return self._run(self._batch(self._dataFormat(binary)))
+
+    def _decode(self, nb: int, data: bytes) -> np.ndarray:
+        try:
+            with METRICS.span('parse'):
+                return decodeTrace(data, self.binary)
+        except ValueError:
+            print(f'\033[93mWarning : Trace number {nb} is not active.\033[0m')
+            return np.empty(0, dtype=np.float32)
+
+    def getTrace(self, nb: int, timeout: float = None) -> np.ndarray:
+        """Gets a specific trace data.
+
+        Args:
+            nb (int): The trace number.
+            timeout (float): Timeout of the transfer (s), defaults to the instrument timeout.
+
+        Returns:
+            np.ndarray: The trace data as a float32 array (empty if the trace is not active).
+        """
+        # The block header (#<digits><length>) is removed by the transport, a timeout is raised: the trace may be active
+        return self._run(self._getTraces([nb], timeout, False))
+
+    def _getTraces(self, nbs: list[int], timeout: float = None, stack: bool = True):
+        nbs = [nb for nb in traces if nb in nbs]
+        yield from self._flush()
+        # Every transfer is requested before the first one is read: the instrument sends them back to back
+        tokens, data = deque(), {}
+        try:
+            for nb in nbs:
+                tokens.append((yield ('send', f'TRACE:DATA? {nb}', True)))
+            for nb in nbs:
+                token = tokens.popleft()
+                data[nb] = self._decode(nb, (yield ('receive', token, timeout)))
+        finally:
+            # The transfers still requested after an error are discarded before the next responses
+            for token in tokens:
+                yield ('discard', token)
+        if not stack:
+            return data[nbs[0]]
+        return stackTraces([data.get(nb, np.empty(0, dtype=np.float32)) for nb in traces])
+
+    def getTraces(self, nbs: list[int] = traces) -> np.ndarray:
+        """Gets the instrument traces, the transfers are pipelined.
+
+        Args:
+            nbs (list[int]): Numbers of the traces transferred, all of them by default.
+
+        Returns:
+            np.ndarray: The traces data stacked in a (trace, point) float32 matrix,
+            the rows of the traces that are not active or not transferred are filled with NaN.
+        """
+        return self._run(self._getTraces(nbs))
+
+    def _pointNumber(self):
+        return int((yield from self._getSetting('DISP:POIN')))
+
+    def getPointNumber(self) -> int:
+        """Gets the number of points in the traces.
+
+        Returns:
+            int: Point number.
+        """
+        return self._run(self._pointNumber())
+
+    def _getFrequencies(self):
+        key = ((yield from self._frequency('FREQ:STAR')), (yield from self._frequency('FREQ:STOP')), (yield from self._pointNumber()))
+        if self.axis is None or self.axis[0] != key:
+            frequencies = np.linspace(*key)
+            frequencies.flags.writeable = False
+            self.axis = (key, frequencies)
+        return self.axis[1]
+
+    def getFrequencies(self) -> np.ndarray:
+        """Gets the frequency axis of the traces, memoized until the span or the point number change.
+
+        Returns:
+            np.ndarray: Frequencies (GHz) of the trace points (read-only).
+        """
+        return self._run(self._getFrequencies())
@@ -0,0 +1,78 @@
+import numpy as np
+
+# Coarsest level of the pyramids (blocks), below this the traces are cheap to draw as they are
+MIN_BLOCKS = 256
+
+# Markers are only drawn when there is at most this number of visible points per pixel
+MARKER_DENSITY = 0.25
+
+class MinMaxPyramid:
+    """Multi-resolution min/max envelope of traces sharing a frequency axis.
+
+    Level k holds the minimum and maximum of every block of 2**k points, so that any range of the
+    traces can be reduced to about one min/max pair per pixel without missing a narrow spike.
+    Missing points (NaN) are ignored, a block only made of missing points is missing.
+    """
+    def __init__(self, frequencies: np.ndarray, amplitudes: np.ndarray) -> None:
+        """Constructor, builds every level at once (vectorized over the traces).
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz).
+            amplitudes (np.ndarray): Trace or (trace, point) matrix (dB).
+        """
+        self.frequencies = frequencies
+        amplitudes = np.atleast_2d(amplitudes)
+        self.points = amplitudes.shape[-1]
+        # Level 0 is the traces themselves, without copy
+        self.levels = [(amplitudes, amplitudes)]
+        mins = maxs = amplitudes
+        with np.errstate(invalid='ignore'):
+            while mins.shape[-1] > MIN_BLOCKS:
+                if mins.shape[-1] % 2:
+                    # The last block of the level is completed with its own last point
+                    mins, maxs = np.concatenate((mins, mins[:, -1:]), axis=-1), np.concatenate((maxs, maxs[:, -1:]), axis=-1)
+                mins, maxs = np.fmin(mins[:, 0::2], mins[:, 1::2]), np.fmax(maxs[:, 0::2], maxs[:, 1::2])
+                self.levels.append((mins, maxs))
+
+    def envelope(self, xmin: float, xmax: float, pixels: float) -> tuple[np.ndarray, np.ndarray, float]:
+        """Reduces the traces within a frequency range to at most one min/max pair per pixel.
+
+        The point before and the point after the range are included, so that the lines reach the edges of the axes.
+
+        Args:
+            xmin (float): Start of the range (GHz).
+            xmax (float): Stop of the range (GHz).
+            pixels (float): Width of the range on the screen (pixels).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, float]: Frequencies (GHz), (trace, point) amplitudes to draw and
+                density of the range (points of the traces per pixel).
+        """
+        first = max(0, int(np.searchsorted(self.frequencies, xmin, side='left')) - 1)
+        last = min(self.points, int(np.searchsorted(self.frequencies, xmax, side='right')) + 1)
+        count = max(last - first, 0)
+        density = count/max(pixels, 1.0)
+        level = min(max(0, int(np.ceil(np.log2(density)))) if density > 1 else 0, len(self.levels) - 1)
+        mins, maxs = self.levels[level]
+        if level == 0:
+            return self.frequencies[first:last], mins[:, first:last], density
+
+        size = 2**level
+        start, stop = first//size, -(-last//size)
+        # Every block is drawn as a vertical segment from its minimum to its maximum, at its center
+        centers = self.frequencies[np.minimum(np.arange(start, stop)*size + size//2, self.points - 1)]
+        amplitudes = np.empty((len(mins), 2*(stop - start)), dtype=mins.dtype)
+        amplitudes[:, 0::2] = mins[:, start:stop]
+        amplitudes[:, 1::2] = maxs[:, start:stop]
+        return np.repeat(centers, 2), amplitudes, density
+
+def markersVisible(density: float) -> bool:
+    """Tells whether the markers of the points are drawn, they are hidden when they would overlap.
+
+    Args:
+        density (float): Points of the traces per pixel (see MinMaxPyramid.envelope).
+
+    Returns:
+        bool: True if the markers are drawn.
+    """
+    return density <= MARKER_DENSITY
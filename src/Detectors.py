@@ -0,0 +1,180 @@
+import string
+from abc import ABC, abstractmethod
+import numpy as np
+
+class Detector(ABC):
+    """Detector updated incrementally from a stream of Clear/Write sweeps, in O(points) per sweep
+    and without keeping the sweeps.
+
+    With a window, the detector restarts every time it has seen that many sweeps.
+    """
+    def __init__(self, window: int = None) -> None:
+        """Constructor.
+
+        Args:
+            window (int): Number of sweeps after which the detector restarts, None to never restart.
+        """
+        self.window = window
+        self.state = None
+        self.count = 0
+
+    def reset(self) -> None:
+        """Restarts the detector.
+        """
+        self.state = None
+        self.count = 0
+
+    def push(self, sweep: np.ndarray) -> None:
+        """Updates the detector with a sweep, it restarts when the point number changes or the window is full.
+
+        Args:
+            sweep (np.ndarray): Amplitudes of the sweep (dB).
+        """
+        if self.state is None or len(sweep) != len(self.state) or (self.window and self.count >= self.window):
+            self.count = 0
+            self.state = self.first(sweep)
+        else:
+            self.update(sweep)
+        self.count += 1
+
+    def first(self, sweep: np.ndarray) -> np.ndarray:
+        """Gives the state of the detector after its first sweep.
+        """
+        return np.array(sweep, dtype=np.float64)
+
+    @abstractmethod
+    def update(self, sweep: np.ndarray) -> None:
+        """Updates the state with a sweep, in place.
+        """
+
+    def value(self) -> np.ndarray:
+        """Gives the output of the detector.
+
+        Returns:
+            np.ndarray: Amplitudes (dB), None before the first sweep.
+        """
+        return None if self.state is None else self.state.astype(np.float32)
+
+class MaxHold(Detector):
+    """Maximum of every point, missing points (NaN) are ignored.
+    """
+    def update(self, sweep: np.ndarray) -> None:
+        np.fmax(self.state, sweep, out=self.state)
+
+class MinHold(Detector):
+    """Minimum of every point, missing points (NaN) are ignored.
+    """
+    def update(self, sweep: np.ndarray) -> None:
+        np.fmin(self.state, sweep, out=self.state)
+
+class Average(Detector):
+    """Running mean of the linear power of every point (incremental mean), displayed in dB.
+
+    Every point has its own count of sweeps: a missing point (NaN) is left out of its mean
+    instead of making it NaN for good, a point without any value yet is NaN.
+    """
+    def first(self, sweep: np.ndarray) -> np.ndarray:
+        power = np.power(10.0, np.asarray(sweep, dtype=np.float64)/10)
+        self.counts = (~np.isnan(power)).astype(np.float64)
+        return np.nan_to_num(power, nan=0.0)
+
+    def weights(self, valid: np.ndarray) -> np.ndarray:
+        """Gives the weight of the new sweep on every point, once the counts include it.
+
+        Args:
+            valid (np.ndarray): Points of the sweep that are not missing.
+
+        Returns:
+            np.ndarray: Weights, 0 on the missing points.
+        """
+        return np.divide(valid, self.counts, out=np.zeros_like(self.counts), where=valid)
+
+    def update(self, sweep: np.ndarray) -> None:
+        power = np.power(10.0, np.asarray(sweep, dtype=np.float64)/10)
+        valid = ~np.isnan(power)
+        self.counts += valid
+        self.state += (np.nan_to_num(power, nan=0.0) - self.state)*self.weights(valid)
+
+    def value(self) -> np.ndarray:
+        if self.state is None:
+            return None
+        with np.errstate(divide='ignore'):
+            return np.where(self.counts > 0, 10*np.log10(self.state), np.nan).astype(np.float32)
+
+class ExponentialAverage(Average):
+    """Exponential moving average of the linear power of every point, displayed in dB.
+    """
+    def __init__(self, alpha: float = 0.1, window: int = None) -> None:
+        """Constructor.
+
+        Args:
+            alpha (float): Weight of the new sweep, the average spans about 1/alpha sweeps.
+            window (int): Number of sweeps after which the detector restarts, None to never restart.
+        """
+        super().__init__(window)
+        self.alpha = alpha
+
+    def weights(self, valid: np.ndarray) -> np.ndarray:
+        # The first sweeps of every point are averaged evenly, so that the start does not depend on the first sweep
+        return np.maximum(self.alpha, super().weights(valid))*valid
+
+# Detectors offered by the GUI, by name
+DETECTORS = {
+    'Max': MaxHold,
+    'Min': MinHold,
+    'Moyenne': Average,
+    'Moyenne exp.': ExponentialAverage,
+}
+
+class DetectorBank:
+    """Set of detectors fed with the same sweeps, they restart when the instrument or the frequency axis changes.
+    """
+    def __init__(self) -> None:
+        """Constructor.
+        """
+        self.detectors = {}
+        # (instrument IP, start, stop, points) of the sweeps the detectors hold
+        self.key = None
+
+    def __len__(self) -> int:
+        return len(self.detectors)
+
+    def configure(self, names: list[string], window: int = None) -> None:
+        """Selects the detectors, the ones already running keep their state unless the window changes.
+
+        Args:
+            names (list[string]): Names of the detectors (keys of DETECTORS).
+            window (int): Number of sweeps after which the detectors restart, None to never restart.
+        """
+        self.detectors = {name: self.detectors[name] if name in self.detectors and self.detectors[name].window == window else DETECTORS[name](window=window)
+                          for name in names}
+
+    def push(self, sweep: np.ndarray, ip: string = None, frequencies: np.ndarray = None) -> None:
+        """Updates every detector with a sweep.
+
+        Args:
+            sweep (np.ndarray): Amplitudes of the sweep (dB).
+            ip (string): IP address of the instrument of the sweep.
+            frequencies (np.ndarray): Frequency axis of the sweep (GHz).
+        """
+        key = (ip, frequencies[0], frequencies[-1], len(frequencies)) if frequencies is not None and len(frequencies) else (ip, None, None, len(sweep))
+        if key != self.key:
+            # The held values would be drawn against another span or instrument
+            self.key = key
+            self.reset()
+        for detector in self.detectors.values():
+            detector.push(sweep)
+
+    def reset(self) -> None:
+        """Restarts every detector.
+        """
+        for detector in self.detectors.values():
+            detector.reset()
+
+    def values(self) -> dict:
+        """Gives the output of every detector.
+
+        Returns:
+            dict: Amplitudes (dB) per detector name.
+        """
+        return {name: detector.value() for name, detector in self.detectors.items() if detector.state is not None}
@@ -0,0 +1,233 @@
+import string
+import os
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, Future, CancelledError
+import numpy as np
+
+from FMP import activeTraces
+from Writers import CsvWriter, NpzWriter
+from Recorder import SweepSession
+
+# Formats offered by the export: images of the plot, and raw data (the metadata are always written as JSON)
+EXPORT_FORMATS = ['png', 'svg', 'npz', 'csv']
+
+# Resolution of the exported images (dpi) and size of the figure (inches)
+EXPORT_DPI = 150
+EXPORT_SIZE = (12, 6)
+
+# Number of recorded sweeps exported by a single task of the worker pool
+EXPORT_CHUNK = 8
+
+class Snapshot:
+    """Copy of a displayed frame and of its settings, independent of the GUI so that it can be exported by another process.
+    """
+    def __init__(self, name: string, curves: list[tuple[np.ndarray, np.ndarray, string]], metadata: dict,
+                 detectors: dict = None, yLimits: tuple[float, float] = None) -> None:
+        """Constructor, copies the arrays.
+
+        Args:
+            name (string): Name of the exported files, without extension.
+            curves (list[tuple[np.ndarray, np.ndarray, string]]): (frequency axis (GHz), (trace, point) matrix, instrument IP) per instrument.
+            metadata (dict): Title, time, span, RBW, trace types... written with the data (JSON values).
+            detectors (dict): Output of the host-side detectors, per detector name.
+            yLimits (tuple[float, float]): Amplitude range of the plot (dB).
+        """
+        self.name = name
+        self.curves = [(np.array(frequencies), np.array(amplitudes), ip) for frequencies, amplitudes, ip in curves]
+        self.metadata = metadata
+        self.detectors = {detector: np.array(values) for detector, values in (detectors or {}).items()}
+        self.yLimits = yLimits
+
+def renderFigure(snapshot: Snapshot, paths: list[string]) -> None:
+    """Plots a snapshot like the GUI does and saves it, without pyplot nor Tk (thread and process safe).
+
+    Args:
+        snapshot (Snapshot): The snapshot.
+        paths (list[string]): Image files, the format is given by their extension.
+    """
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=EXPORT_SIZE)
+    ax = fig.add_subplot()
+    for frequencies, amplitudes, ip in snapshot.curves:
+        for i, amplitude in enumerate(activeTraces(amplitudes)):
+            # One legend entry per instrument
+            ax.plot(frequencies, amplitude, label=ip if i == 0 else '_nolegend_')
+    for detector, values in snapshot.detectors.items():
+        ax.plot(snapshot.curves[0][0], values, label=detector)
+    if snapshot.detectors or len(snapshot.curves) > 1:
+        ax.legend()
+    if snapshot.yLimits is not None:
+        ax.set_ylim(*snapshot.yLimits)
+    ax.set_xlabel('Fréquence (GHz)')
+    ax.set_ylabel('Gain (dB)')
+    ax.set_title(snapshot.metadata.get('title', snapshot.name))
+    ax.grid(True)
+    for path in paths:
+        fig.savefig(path, dpi=EXPORT_DPI)
+
+def exportSnapshot(snapshot: Snapshot, directory: string, formats: list[string]) -> list[string]:
+    """Writes a snapshot: images, raw data and metadata (<name>.json).
+
+    The NPZ and CSV files have the layout of the headless acquisition (see Writers.NpzWriter and Writers.CsvWriter).
+
+    Args:
+        snapshot (Snapshot): The snapshot.
+        directory (string): Output directory, created if needed.
+        formats (list[string]): Formats written (see EXPORT_FORMATS).
+
+    Returns:
+        list[string]: The files written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    base = os.path.join(directory, snapshot.name)
+    timestamp = snapshot.metadata.get('time', 0.0)
+    ips = [ip for _, _, ip in snapshot.curves]
+    paths = []
+
+    images = [f'{base}.{extension}' for extension in ('png', 'svg') if extension in formats]
+    if images:
+        renderFigure(snapshot, images)
+        paths += images
+    if 'npz' in formats:
+        with open(f'{base}.npz', 'wb') as stream:
+            writer = NpzWriter(stream, ips)
+            for frequencies, amplitudes, ip in snapshot.curves:
+                writer.write(timestamp, ip, frequencies, amplitudes)
+            writer.close()
+        paths.append(f'{base}.npz')
+    if 'csv' in formats:
+        with open(f'{base}.csv', 'w', newline='') as stream:
+            writer = CsvWriter(stream)
+            for frequencies, amplitudes, ip in snapshot.curves:
+                writer.write(timestamp, ip, frequencies, amplitudes)
+            writer.close()
+        paths.append(f'{base}.csv')
+    with open(f'{base}.json', 'w') as stream:
+        json.dump(snapshot.metadata, stream, indent=2)
+    paths.append(f'{base}.json')
+    return paths
+
+def exportSessionSweeps(path: string, indices: list[int], directory: string, formats: list[string], metadata: dict = None) -> list[string]:
+    """Exports recorded sweeps, the session is read by the worker itself instead of being sent to it.
+
+    Args:
+        path (string): Session directory (see SweepSession).
+        indices (list[int]): Numbers of the sweeps exported.
+        directory (string): Output directory.
+        formats (list[string]): Formats written (see EXPORT_FORMATS).
+        metadata (dict): Metadata shared by every sweep (e.g. instrument IP).
+
+    Returns:
+        list[string]: The files written.
+    """
+    session = SweepSession(path)
+    paths = []
+    for i in indices:
+        settings = session.settings(i)
+        sweepMetadata = {**(metadata or {}), **settings, 'title': f'{os.path.basename(os.path.normpath(path))} - {i + 1}/{len(session)}', 'sweep': i}
+        snapshot = Snapshot(f'sweep_{i:06d}', [(session.frequencies(i), session.sweep(i), sweepMetadata.get('ip', ''))], sweepMetadata)
+        paths += exportSnapshot(snapshot, directory, formats)
+    return paths
+
+class ExportBatch:
+    """Progress of a group of export tasks, updated by the worker pool.
+    """
+    def __init__(self, total: int) -> None:
+        """Constructor.
+
+        Args:
+            total (int): Number of items (frames or sweeps) exported.
+        """
+        self.total = total
+        self.done = 0
+        self.paths = []
+        self.errors = []
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.done >= self.total
+
+    def track(self, future: Future, items: int) -> None:
+        """Counts the items of a task once it is complete, or cancelled (they are then counted as an error).
+
+        Args:
+            future (Future): The task.
+            items (int): Number of items exported by the task.
+        """
+        def complete(future: Future) -> None:
+            with self.lock:
+                self.done += items
+                if future.cancelled():
+                    # Pending tasks are cancelled when the exporter is closed, the batch still finishes
+                    self.errors.append(CancelledError('export annulé'))
+                elif future.exception() is not None:
+                    self.errors.append(future.exception())
+                else:
+                    self.paths += future.result()
+        future.add_done_callback(complete)
+
+class Exporter:
+    """Worker pool writing the exports in other processes, so that rendering large figures never blocks the GUI.
+
+    The processes are spawned (not forked, the GUI runs several threads) on the first export.
+    """
+    def __init__(self, workers: int = None) -> None:
+        """Constructor.
+
+        Args:
+            workers (int): Number of worker processes, defaults to the number of processors (at most 4).
+        """
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.executor = None
+
+    def pool(self) -> ProcessPoolExecutor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self.executor
+
+    def export(self, snapshot: Snapshot, directory: string, formats: list[string]) -> ExportBatch:
+        """Exports a snapshot in the background.
+
+        Args:
+            snapshot (Snapshot): The snapshot.
+            directory (string): Output directory.
+            formats (list[string]): Formats written (see EXPORT_FORMATS).
+
+        Returns:
+            ExportBatch: Progress of the export.
+        """
+        batch = ExportBatch(1)
+        batch.track(self.pool().submit(exportSnapshot, snapshot, directory, formats), 1)
+        return batch
+
+    def exportSession(self, path: string, directory: string, formats: list[string], indices: list[int] = None, metadata: dict = None) -> ExportBatch:
+        """Exports recorded sweeps in the background, EXPORT_CHUNK sweeps per task.
+
+        Args:
+            path (string): Session directory (see SweepSession).
+            directory (string): Output directory.
+            formats (list[string]): Formats written (see EXPORT_FORMATS).
+            indices (list[int]): Numbers of the sweeps exported, all of them by default.
+            metadata (dict): Metadata shared by every sweep.
+
+        Returns:
+            ExportBatch: Progress of the export, counted in sweeps.
+        """
+        if indices is None:
+            indices = range(len(SweepSession(path)))
+        indices = list(indices)
+        batch = ExportBatch(len(indices))
+        for start in range(0, len(indices), EXPORT_CHUNK):
+            chunk = indices[start:start + EXPORT_CHUNK]
+            batch.track(self.pool().submit(exportSessionSweeps, path, chunk, directory, formats, metadata), len(chunk))
+        return batch
+
+    def close(self) -> None:
+        """Stops the worker processes, the pending exports are cancelled.
+        """
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
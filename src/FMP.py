@@ -1,28 +1,65 @@
 import string
-import telnetlib
+import socket
 import time
+from contextlib import contextmanager
+from collections import deque
 import numpy as np
-import matplotlib.pyplot as plt
 
-traces = range(1, 7)
+from Analytics import ChannelAnalyzer, peakTable, noiseFloor
+from Instrumentation import METRICS
+# The helpers of the command layer are also imported from FMP by the other modules
+from Commands import Commands, SweepWatch, traces, batchLines, decodeTrace, stackTraces, MAX_LINE_LENGTH, POLL_MIN, POLL_MAX, SETTINGS
 
-class FMP:
+# SCPI responses are terminated by a line feed
+TERMINATOR = b'\n'
+
+def activeTraces(amplitudes: np.ndarray) -> np.ndarray:
+    """Selects the rows of the active traces.
+
+    Args:
+        amplitudes (np.ndarray): (trace, point) matrix given by FMP.getTraces.
+
+    Returns:
+        np.ndarray: The rows that hold data.
+    """
+    return amplitudes[~np.isnan(amplitudes).all(axis=1)]
+
+class FMP(Commands):
     """Field Master Pro class used to control the instrument.
+
+    The commands and the settings cache are the ones of Commands, run on a blocking socket.
     """
-    def __init__(self, ipAddr: string, port: int = 9001) -> None:
+    def __init__(self, ipAddr: string, port: int = 9001, timeout: float = 5.0, binary: bool = True, reset: bool = True) -> None:
         """Constructor.
 
         Args:
             ipAddr (string): IP Address of the analyzer (check system information).
             port (int): port of the analyzer (9001 for Anritsu)
+            timeout (float): default timeout of a query (s).
+            binary (bool): transfers the traces as 32-bit real blocks instead of ASCII.
+            reset (bool): blanks every trace once connected.
         """
 
         # Define IP address and port
         self.ip = ipAddr
         self.port = port
-
-        # Establish connection to the device
-        self.tn = telnetlib.Telnet(self.ip, self.port)
+        self.timeout = timeout
+
+        # Establish connection to the device (port 9001 is a raw SCPI socket)
+        self.sock = socket.create_connection((self.ip, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+        # Kind (True for a block) of the responses of the queries that timed out, discarded when they arrive
+        self.stale = deque()
+        # (command line, send time) of the queries awaiting their response, timed when the instrumentation is enabled
+        self.outstanding = deque()
+
+        # Settings cache and memoized frequency axis, commands queued by batch(), and channel analyzer of the axis
+        Commands.__init__(self)
+        self.pending = None
+        self.analyzer = None
+
+        self.setDataFormat(binary)
         
         # self.setStartFreq(2.0e9)
         # self.setStopFreq(4.5e9)
@@ -30,7 +67,8 @@ class FMP:
         # self.continuousOff()
         # self.abort()
         
-        self.reset()
+        if reset:
+            self.reset()
             
         # self.setTraceTypeClearWrite(1)
         # self.setTraceModeActive(1)
@@ -38,292 +76,315 @@ class FMP:
         # self.sweepLaunch()
         # self.continuousOn()   
         
-        # currentSweepNumber = self.getSweepCount(1)
-        # while(currentSweepNumber == 0):
-        #     print(self.getSweepCount(1))
-        #     time.sleep(1)
-        
         # self.drawData()
 
         # End connection with the device
-        # self.tn.close()
-
-    def send_command(self, command: string) -> string:
-        """Send a command to the instrument and read the response.
+        # self.close()
 
-        Args:
-            command (string): Telnet command.
-
-        Returns:
-            string: Telnet response given by the instrument.
+    def close(self) -> None:
+        """Closes the connection with the instrument.
         """
-        self.tn.write(command.encode('ascii') + b"\n")
-        time.sleep(1)  # Allow some time for the command to be processed
-        response = self.tn.read_very_eager().decode('ascii').strip()
-        return response
+        self.sock.close()
 
-    def getId(self) -> string:
-        """Identifies the instrument.
+    def write(self, command: string) -> None:
+        """Sends a command to the instrument without waiting for anything.
 
-        Returns:
-            string: Instrument ID.
+        Args:
+            command (string): SCPI command.
         """
-        self.send_command('*IDN?')
-
-    def getStartFreq(self) -> float:
-        """Gets the start frequency.
+        data = command.encode('ascii') + TERMINATOR
+        self.sock.sendall(data)
+        if METRICS.enabled:
+            METRICS.count('bytes_sent', len(data))
+            if '?' in command:
+                self.outstanding.append((command, time.perf_counter()))
 
-        Returns:
-            float: Start frequency (GHz).
-        """
-        return float(float(self.send_command('FREQ:STAR?'))/1.0e9)
-    
-    def setStartFreq(self, freq:float) -> None:
-        """Sets the start frequency.
+    def _fill(self, deadline: float) -> None:
+        """Receives the next chunk of bytes from the instrument into the buffer.
 
         Args:
-            freq (float): Start frequency (GHz).
-        """
-        self.send_command(f'FREQ:STAR {freq*1e9}')
-
-    def getStopFreq(self) -> float:
-        """Gets the stop frequency.
+            deadline (float): Time (time.monotonic) after which the read is aborted.
 
-        Returns:
-            float: Stop frequency (GHz).
+        Raises:
+            TimeoutError: The instrument did not answer before the deadline.
+            ConnectionError: The instrument closed the connection.
         """
-        return float(float(self.send_command('FREQ:STOP?'))/1e9)
-    
-    def setStopFreq(self, freq: float) -> None:
-        """Sets the stop frequency.
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError('The instrument did not answer in time')
+        self.sock.settimeout(remaining)
+        try:
+            chunk = self.sock.recv(65536)
+        except socket.timeout:
+            raise TimeoutError('The instrument did not answer in time') from None
+        if not chunk:
+            raise ConnectionError('The instrument closed the connection')
+        self.buffer += chunk
+        if METRICS.enabled:
+            METRICS.count('bytes_received', len(chunk))
+
+    def _responseEnd(self, block: bool) -> tuple[int, int, int]:
+        """Locates the first response in the buffer, without consuming anything.
 
         Args:
-            freq (float): Stop frequency (GHz).
-        """
-        self.send_command(f'FREQ:STOP {freq*1e9}')
-        
-    def getRBW(self) -> float:
-        """Gets the Resolution Bandwidth.
+            block (bool): The response is an IEEE 488.2 block (#<digits><length><data>), a line otherwise.
 
         Returns:
-            float: Resolution Bandwidth (Hz)
-        """
-        return self.send_command('BAND:RES?')
-        
-    def setRBW(self, freq: float) -> None:
-        """Sets the Resolution Bandwidth.
+            tuple[int, int, int]: Start and end of the response data and end of the response in the buffer,
+                None while the response is incomplete.
+        """
+        if not block or self.buffer[:1] != b'#':
+            end = self.buffer.find(TERMINATOR)
+            return None if end < 0 else (0, end, end + len(TERMINATOR))
+        if len(self.buffer) < 2:
+            return None
+        digits = int(self.buffer[1:2])
+        if digits == 0:
+            # Indefinite length block, ends with the terminator
+            end = self.buffer.find(TERMINATOR, 2)
+            return None if end < 0 else (2, end, end + len(TERMINATOR))
+        if len(self.buffer) < 2 + digits:
+            return None
+        start = 2 + digits
+        end = start + int(self.buffer[2:start])
+        return None if len(self.buffer) < end else (start, end, end)
+
+    def _readResponse(self, block: bool, deadline: float) -> bytes:
+        """Reads the next response, it is only consumed once complete so that a timed out read can be resumed.
 
         Args:
-            freq (float): Resolution Bandwidth (Hz).
-        """
-        self.send_command(f'BAND:RES {freq} Hz')
-        
-    def getRefLvl(self) -> float:
-        """Gets the Reference level.
+            block (bool): The response is a block, a line otherwise.
+            deadline (float): Time (time.monotonic) after which the read is aborted.
 
         Returns:
-            float: Amplitude reference (top limit in dB).
-        """
-        return self.send_command('DISP:WIND:TRAC:Y:SCAL:RLEV?')
-        
-    def setRefLvl(self, ampl: float) -> None:
-        """Sets the Reference level to the corresponding amplitude.
+            bytes: The response without its terminator or block header.
+        """
+        while True:
+            # Drops the line terminators left in front of the response (e.g. after a block)
+            while self.buffer[:1] in (b'\r', b'\n'):
+                del self.buffer[:1]
+            if self.buffer and (bounds := self._responseEnd(block)) is not None:
+                start, end, consumed = bounds
+                data = bytes(self.buffer[start:end])
+                if start == 0:
+                    # A line, not a block
+                    data = data.strip()
+                del self.buffer[:consumed]
+                if self.outstanding:
+                    sent = self.outstanding.popleft()
+                    METRICS.latency(sent[0], time.perf_counter() - sent[1])
+                return data
+            self._fill(deadline)
+
+    def _read(self, block: bool, timeout: float) -> bytes:
+        """Reads the response of the oldest query, after the late responses of the queries that timed out.
 
         Args:
-            ampl (float): Amplitude reference (top limit in dB).
-        """
-        self.send_command(f'DISP:WIND:TRAC:Y:SCAL:RLEV {ampl}')
-        
-    def getTraceScale(self) -> float:
-        """Gets the trace vertical scale
+            block (bool): The response is a block, a line otherwise.
+            timeout (float): Timeout of the read (s), defaults to the instrument timeout.
 
         Returns:
-            float: Scale (dB/division)
-        """
-        return self.send_command('DISP:WINDow:TRACe:Y:PDIVision?')
-        
-    def setTraceScale(self, scale: float) -> None:
-        """Sets the trace vertical scale.
+            bytes: The response without its terminator or block header.
 
-        Args:
-            scale (float): Scale (dB/division).
+        Raises:
+            TimeoutError: The response did not arrive in time, it will be discarded by the next read.
         """
-        self.send_command(f'DISP:WINDow:TRACe:Y:PDIVision {scale}')
-    
-    def setParam(self, startFreq: float, stopFreq: float, gainRef: float, gainScale: float, rbw: float):
-        """Sets the instrument main parameters.
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        try:
+            # A timed out query still consumes its response, otherwise every later query would get the previous answer
+            while self.stale:
+                self._readResponse(self.stale[0], deadline)
+                self.stale.popleft()
+            return self._readResponse(block, deadline)
+        except TimeoutError:
+            self.stale.append(block)
+            raise
+
+    def discard(self, block: bool = False) -> None:
+        """Gives up the response of a query already sent (e.g. pipelined before an error), the next read discards it.
 
         Args:
-            startFreq (float): Start frequency (GHz).
-            stopFreq (float): Stop frequency (GHz).
-            gainRef (float): Top gain limit (dB)
-            gainScale (float): Cell scale (dB/division)
-            rbw (float): Rsolution bandwidth (kHz)
+            block (bool): The response is a block, a line otherwise.
         """
-        self.setStartFreq(startFreq)
-        self.setStopFreq(stopFreq)
-        self.setRefLvl(gainRef)
-        self.setTraceScale(gainScale)
-        self.setRBW(rbw)
+        self.stale.append(block)
 
-    def setTraceMode(self, nb: int, mode: string) -> None:
-        """Sets the selected trace mode.
+    def readLine(self, timeout: float = None) -> string:
+        """Reads a response terminated by the SCPI line terminator.
 
         Args:
-            nb (int): Trace number.
-            mode (string): Trace mode <Active | Hold/View | Blank>
-        """
-        self.send_command(f'TRACe{nb}:UPDate {mode}')
-    
-    def setTraceModeActive(self, nb: int) -> None:
-        """Sets the selected trace to Active mode.
+            timeout (float): Timeout of the read (s), defaults to the instrument timeout.
 
-        Args:
-            nb (int): Trace number.
+        Returns:
+            string: The response without its terminator.
         """
-        self.setTraceMode(nb, '1')
+        return self._read(False, timeout).decode('ascii').strip()
+
+    def readBlock(self, timeout: float = None) -> bytes:
+        """Reads an IEEE 488.2 block response (#<digits><length><data>).
 
-    def setTraceModeHold(self, nb: int) -> None:
-        """Sets the selected trace to Hold/View mode.
+        Falls back to a plain line when the response is not a block.
 
         Args:
-            nb (int): Trace number.
+            timeout (float): Timeout of the read (s), defaults to the instrument timeout.
+
+        Returns:
+            bytes: The block data without its header.
         """
-        self.setTraceMode(nb, '0')
+        return self._read(True, timeout)
 
-    # This method acts like blank but doesn't really change the trace mode on the instrument
-    def setTraceModeBlank(self, nb: int) -> None:
-        """Sets the selected trace to Blank mode.
+    def _run(self, steps):
+        """Runs the exchanges of a command (see Commands) on the socket.
 
         Args:
-            nb (int): Trace number.
-        """
-        self.setTraceMode(nb, '0')
-        self.send_command(f'TRACe:CLEar {nb}')
+            steps: Generator of the command.
 
-    def setTraceType(self, nb: int, type:string) -> None:
-        """Sets the selected trace type.
+        Returns:
+            The result of the command.
+        """
+        response, error = None, None
+        while True:
+            try:
+                request = steps.throw(error) if error is not None else steps.send(response)
+            except StopIteration as stop:
+                return stop.value
+            response, error = None, None
+            kind = request[0]
+            try:
+                if kind == 'write':
+                    self.write(request[1])
+                elif kind == 'send':
+                    # Responses are read in order, the token is the kind of the response
+                    self.write(request[1])
+                    response = request[2]
+                elif kind == 'receive':
+                    # A read that times out leaves its response to be discarded (see _read)
+                    response = self._read(request[1], request[2])
+                elif kind == 'discard':
+                    self.discard(request[1])
+                elif kind == 'sleep':
+                    time.sleep(request[1])
+            except BaseException as exception:
+                # Thrown into the command, so that it discards the responses it still expects
+                error = exception
+
+    @contextmanager
+    def batch(self, sync: bool = True):
+        """Groups the commands sent inside the block into compound SCPI lines.
+
+        Settings that did not change since they were last set are skipped, the
+        lines are sent when the block exits (nested blocks join the outer one).
 
         Args:
-            nb (int): Trace number.
-            type (string): Trace type : <NORM | MIN | MAX | AVER>
+            sync (bool): Waits for the commands to be executed with a single *OPC?.
         """
-        self.send_command(f'TRACe{nb}:TYPE {type}')
+        if self.pending is not None:
+            yield self
+            return
+        self.pending = []
+        try:
+            yield self
+        except BaseException:
+            self.pending = None
+            raise
+        pending, self.pending = self.pending, None
+        self._run(self._sendBatch(pending, sync))
 
-    def setTraceTypeClearWrite(self, nb: int) -> None:
-        """Sets the selected trace to Clear/Write type.
+    def sweeps(self, nbs: list[int] = traces, continuous: bool = False, timeout: float = None):
+        """Generator of the complete sweeps, each of them is given once as soon as it is available.
 
-        Args:
-            nb (int): Trace number.
-        """
-        self.setTraceType(nb, 'NORMal')
-    
-    def setTraceTypeMin(self, nb: int) -> None:
-        """Sets the selected trace to Min Hold type.
+        In single sweep mode every sweep is launched by the generator and awaited with *OPC?.
+        In continuous mode the sweep counter of the first trace is watched (see waitSweep), and the
+        traces are read again when a sweep completes during their transfer, so that a frame never mixes two sweeps.
+        Sweeps completed while the previous one was being used are skipped: the number given jumps.
 
         Args:
-            nb (int): Trace number.
+            nbs (list[int]): Numbers of the traces transferred, the first one should be Active in continuous mode.
+            continuous (bool): Watches the sweeps of the continuous mode instead of launching them.
+            timeout (float): Timeout of a sweep (s), defaults to the instrument timeout.
+
+        Yields:
+            tuple[int, np.ndarray]: Sweep number (sweep count of the first trace in continuous mode,
+                number of sweeps launched otherwise) and traces of the sweep (see getTraces).
+
+        Raises:
+            TimeoutError: No sweep completed, or the traces could not be read within a sweep, before the timeout.
         """
-        self.setTraceType(nb, 'MINimum')
-    
-    def setTraceTypeMax(self, nb: int) -> None:
-        """Sets the selected trace to Max Hold type.
+        watch = SweepWatch(nbs, continuous, self.timeout if timeout is None else timeout)
+        while True:
+            yield self._run(self._nextSweep(watch))
 
-        Args:
-            nb (int): Trace number.
+    def getAnalyzer(self) -> ChannelAnalyzer:
+        """Gets the WiFi channel analyzer of the frequency axis, memoized until the axis or the RBW change.
+
+        Returns:
+            ChannelAnalyzer: The analyzer.
         """
-        self.setTraceType(nb, 'MAXimum')
-    
-    def setTraceTypeAverage(self, nb: int) -> None:
-        """Sets the selected trace to Average type.
+        frequencies, rbw = self.getFrequencies(), self.getRBW()
+        if self.analyzer is None or self.analyzer.frequencies is not frequencies or self.analyzer.rbw != rbw:
+            self.analyzer = ChannelAnalyzer(frequencies, rbw)
+        return self.analyzer
+
+    def getPeaks(self, nb: int, count: int = 5, margin: float = 10.0) -> np.ndarray:
+        """Finds the highest peaks of a trace.
 
         Args:
             nb (int): Trace number.
+            count (int): Maximum number of peaks.
+            margin (float): Minimum height of a peak above the noise floor (dB).
+
+        Returns:
+            np.ndarray: Peak table (see Analytics.PEAK_DTYPE) by decreasing amplitude.
         """
-        self.setTraceType(nb, 'AVERage')
-        
-    def reset(self) -> None:
-        """Blanks every trace.
-        """
-        for traceNumber in traces:
-            self.setTraceTypeClearWrite(traceNumber)
-            self.setTraceModeBlank(traceNumber)
+        return peakTable(self.getTrace(nb), self.getFrequencies(), margin=margin, count=count)
 
-    def getSweepCount(self, nb: int) -> int:
-        """Gets the current sweep number.
+    def getNoiseFloor(self, nb: int) -> float:
+        """Estimates the noise floor of a trace.
 
         Args:
             nb (int): Trace number.
 
         Returns:
-            int: Current sweep number.
-        """
-        return int(self.send_command(f'TRACe{nb}:SWEep:COUNt?'))
-    
-    def abort(self) -> None:
-        """Aborts any sweep in progress.
-        """
-        self.send_command('ABORT')
-        
-    def continuousOn(self) -> None:
-        """Turns on continuous sweep mode.
-        """
-        self.send_command('INIT:CONT ON')
-        
-    def continuousOff(self) -> None:
-        """Turns off continuous sweep mode.
-        """
-        self.send_command('INIT:CONT OFF')
-        
-    def sweepLaunch(self) -> None:
-        """Starts a measurement sweep.
+            float: Noise floor (dB).
         """
-        self.send_command('INIT')
-    
-    def getTrace(self, nb: int) -> list[float]:
-        """Gets a specific trace data.
+        return float(noiseFloor(self.getTrace(nb)))
+
+    def getChannelPowers(self, nb: int) -> dict:
+        """Measures the power of the WiFi channels within the span.
 
         Args:
-            nb (int): The trace number.
+            nb (int): Trace number.
 
         Returns:
-            list[float]: The trace data parsed as a float list.
+            dict: Channel power (dBm) per channel name.
         """
-        trace_data = self.send_command(f'TRACE:DATA? {nb}')
-        try:
-            # We parse the data in a float list while removing the first six characters (irrelevent measure code)
-            return list(map(float, trace_data.split(',', 1)[1].strip().split(',')))
-        except:
-            print(f'\033[93mWarning : Trace number {nb} is not active.\033[0m')
-            return []
-    
-    def getTraces(self) -> list[list[float]]:
-        """Gets all the instrument traces.
+        analyzer = self.getAnalyzer()
+        return dict(zip(analyzer.names, analyzer.channelPower(self.getTrace(nb))[0].tolist()))
 
-        Returns:
-            list[list[float]]: The traces data parsde as a float matrix.
-        """
-        return [self.getTrace(i) for i in traces]
-    
-    def getPointNumber(self) -> int :
-        """Gets the number of points in the traces.
+    def getOccupiedBandwidths(self, nb: int, fraction: float = 0.99) -> dict:
+        """Measures the occupied bandwidth of the WiFi channels within the span.
+
+        Args:
+            nb (int): Trace number.
+            fraction (float): Fraction of the channel power.
 
         Returns:
-            int: Point number.
+            dict: Occupied bandwidth (Hz) per channel name.
         """
-        return int(self.send_command('DISP:POIN?'))
+        analyzer = self.getAnalyzer()
+        return dict(zip(analyzer.names, analyzer.occupiedBandwidth(self.getTrace(nb), fraction)[0].tolist()))
     
     def drawData(self) -> None:
         """Plots the traces.
         """
+        # matplotlib is only needed here, it is not imported by headless users of FMP
+        import matplotlib.pyplot as plt
         self.figure = plt.figure(figsize=(5,5))
         
-        frequencies = np.linspace(self.getStartFreq(), self.getStopFreq(), self.getPointNumber())
+        frequencies = self.getFrequencies()
         amplitudes = self.getTraces()
 
-        for amplitude in amplitudes:
-            if amplitude != []:
-                plt.plot(frequencies, amplitude, marker='x')
+        for amplitude in activeTraces(amplitudes):
+            plt.plot(frequencies, amplitude, marker='x')
 
         plt.xlabel('Fréqence (Hz)')
         plt.ylabel('Gain (dB)')
@@ -1,19 +1,73 @@
 import sys
+import os
 import string
+import json
 import threading
+from concurrent.futures import Future
 from typing import Callable
 import time
 import tkinter as tk
-from tkinter import font
+from tkinter import font, filedialog
 import ttkbootstrap as ttk
 from ttkbootstrap.dialogs import Messagebox
 import numpy as np
 import datetime
-import matplotlib.pyplot as plt
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
-from FMP import FMP
+from FMP import FMP, activeTraces, traces, stackTraces
+from InstrumentPool import InstrumentPool
+from AcquisitionWorker import AcquisitionWorker, LatestQueue, TraceFrame
+from CommandDispatcher import CommandDispatcher
+from Recorder import SweepRecorder, SweepSession
+from Waterfall import WaterfallBuffer
+from Presets import PRESETS
+from Analytics import ChannelAnalyzer
+from Detectors import DetectorBank, DETECTORS
+from SegmentedScan import SegmentedScan
+from Instrumentation import METRICS
+from Exporter import Exporter, Snapshot, EXPORT_FORMATS
+from Decimation import MinMaxPyramid, markersVisible
+from Masks import MASKS, MaskChecker, MaskResult, AlarmStream, describeAlarm
+from SweepBus import SweepBus
+from SweepStream import StreamInstrument, STREAM_PORT
+
+# IP addresses of the analyzers driven by the application, the first one is selected at startup
+INSTRUMENTS = ['192.168.1.17']
+
+# Blanks every trace of the analyzers once connected (in the background, the trace selectors start on Blank)
+RESET_AT_STARTUP = True
+
+# Period of the Tk side consumer of the acquired frames (ms)
+RENDER_PERIOD = 20
+
+# Directory of the saved graphs and recorded sessions, next to the sources whatever the working directory
+SAVES_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'saves'))
+
+# Entry of the mask selector that disables the mask test
+NO_MASK = 'Aucun'
+
+# Zoom factor of a mouse wheel step on the plot
+ZOOM_STEP = 1.25
+
+# Period of the export progress updates (ms)
+EXPORT_PERIOD = 200
+
+# Colour maps offered for the waterfall view
+WATERFALL_COLORMAPS = ['viridis', 'inferno', 'magma', 'gray']
+
+# Minimum period of the analysis table updates (s)
+ANALYSIS_PERIOD = 0.25
+
+# Minimum period of the instrumentation status bar updates (s)
+METRICS_PERIOD = 1.0
+
+# Storage format of the recorded sessions, 'float32' or 'int16' (quantized, half the size)
+RECORD_FORMAT = 'float32'
+
+# Maximum number of points per trace of the sweep bus, it is created again larger for longer sweeps
+BUS_POINTS = 10001
+
+# Maximum time the recording thread waits for a sweep before checking whether it is stopped (s)
+RECORD_POLL = 0.1
 
 def center_window(window) -> None:
     """Function to center a window on the screen.
@@ -34,26 +88,40 @@ class GUI:
     """GUI for the application.
     """
     
-    def __init__(self) -> None:
+    def __init__(self, startTime: float = None, startupReport: string = None, stream: string = None) -> None:
         """Constructor.
+
+        Args:
+            startTime (float): time.perf_counter() at the start of the process, origin of the startup timing report.
+            startupReport (string): File the startup timings are appended to (JSON lines), None to only display them.
+            stream (string): HOST[:PORT] of a sweep server (Headless.py --serve) followed instead of connecting to the instruments.
         """
-        
+        self.stream = stream
+        # Startup timings (s) since startTime, in order
+        self.startTime = time.perf_counter() if startTime is None else startTime
+        self.startupReport = startupReport
+        self.startupTimes = {}
+        self.markStartup('imports')
+
         # Window configuration
         self.window = ttk.Window(themename='darkly')
         self.window.withdraw()
         self.window.geometry('1650x900')
         center_window(self.window)
-        self.window.title('ScryNet')
+        self.window.title('ScryNet' if stream is None else f'ScryNet - {stream}')
         self.window.iconbitmap('../assets/icon.ico')
 
-        # Draws the splash screen while the main application is loading
+        # The splash screen is displayed while the widgets are created, the instruments connect in the background
         self.drawSplashScreen()
-        threading.Thread(target=self.loadApp).start()
-        self.splash.mainloop()
+        self.loadApp()
 
         # Application loop
         self.window.mainloop()
 
+        # The sweep bus is removed with the application, the attached processes keep reading it until they detach
+        if self.bus is not None:
+            self.bus.unlink()
+
     def drawSplashScreen(self) -> None:
         """Displays the splash screen.
         """
@@ -80,8 +148,22 @@ class GUI:
         # Style config
         self.font = 'Arial 20'
         
-        # Connecting to the Field Master Pro
-        self.fmp = FMP('192.168.1.17')
+        # Connecting to the Field Master Pro analyzers in the background, commands wait for the connection on the instrument workers.
+        # In client mode the sweeps come from the process that owns the instrument, its settings cannot be changed
+        if self.stream is None:
+            self.pool = InstrumentPool(INSTRUMENTS, wait=False, reset=RESET_AT_STARTUP)
+        else:
+            host, _, port = self.stream.partition(':')
+            self.pool = InstrumentPool([host], int(port or STREAM_PORT), wait=False, factory=StreamInstrument)
+        self.currentIp = self.pool.ips[0]
+        self.overlayEnabled = False
+
+        # Acquisition pipeline: a single worker fetches the frames, the Tk thread renders them
+        self.frames = LatestQueue()
+        self.worker = AcquisitionWorker(self.fetchFrame, self.frames, self.liveSweepCount)
+
+        # UI commands are sent without blocking the Tk thread
+        self.dispatcher = CommandDispatcher(self.pool)
     
         # Tab manager
         self.tabs = ttk.Notebook(master=self.window)
@@ -102,23 +184,46 @@ class GUI:
         self.amplCase = ttk.StringVar()
         self.rbw  = ttk.StringVar()
         
-        self.drawConfigFrame('Fréquence limite à gauche\n(en GHz)', self.startFreq, self.fmp.getStartFreq, 0)
-        self.drawConfigFrame('Fréquence limite à droite\n(en GHz)', self.stopFreq, self.fmp.getStopFreq, 1)
-        self.drawConfigFrame('Amplitude limite en haut\n(en dB)', self.amplRef, self.fmp.getRefLvl, 2)
-        self.drawConfigFrame('Échelle d\'amplitude\n(en dB/div)', self.amplCase, self.fmp.getTraceScale, 3)
-        self.drawConfigFrame('Largeur de bande\n(en Hz)', self.rbw, self.fmp.getRBW, 4)
+        # The fields are filled once the instrument is connected
+        self.drawConfigFrame('Fréquence limite à gauche\n(en GHz)', self.startFreq, 0)
+        self.drawConfigFrame('Fréquence limite à droite\n(en GHz)', self.stopFreq, 1)
+        self.drawConfigFrame('Amplitude limite en haut\n(en dB)', self.amplRef, 2)
+        self.drawConfigFrame('Échelle d\'amplitude\n(en dB/div)', self.amplCase, 3)
+        self.drawConfigFrame('Largeur de bande\n(en Hz)', self.rbw, 4)
         
         ttk.Button(master=self.configFrame, text='Appliquer', takefocus=False, command=self.applyParam).grid(row=1, column=5, sticky='s')
         
         self.presetBtnFrame = ttk.Frame(master=self.configFrame)
 
-        self.drawPresetBtn('WiFi 2', '2.4', '2.5')
-        self.drawPresetBtn('WiFi 5', '5.170', '5.730')
-        self.drawPresetBtn('WiFi 6E', '5.925', '6.425')
-        self.drawPresetBtn('Preset 4', '0', '9')
-        self.drawPresetBtn('Preset 5', '0', '9')
+        for name, (startFreq, stopFreq) in PRESETS.items():
+            self.drawPresetBtn(name, str(startFreq), str(stopFreq))
 
         self.presetBtnFrame.grid(row=2, column=0, columnspan=2, sticky='ew')
+
+        # Instrument selection
+        self.instrument = ttk.StringVar(value=self.currentIp)
+        self.overlay = ttk.BooleanVar(value=False)
+        instrumentFrame = ttk.Frame(master=self.configFrame)
+        ttk.Label(master=instrumentFrame, text='Instrument', font='Arial 14').pack(side='left', padx=10)
+        instrumentSelect = ttk.Combobox(master=instrumentFrame, state='readonly', values=self.pool.ips, textvariable=self.instrument)
+        instrumentSelect.bind('<<ComboboxSelected>>', lambda _: self.selectInstrument(self.instrument.get()))
+        instrumentSelect.pack(side='left', padx=10)
+        ttk.Checkbutton(master=instrumentFrame, text='Superposer les instruments', variable=self.overlay, takefocus=False, command=self.toggleOverlay).pack(side='left', padx=10)
+        instrumentFrame.grid(row=3, column=0, columnspan=3, sticky='w')
+
+        # Segmented scan of wide spans, used by the graph (not by the live mode)
+        self.segmentedResolution = None
+        # Instruments whose trace still holds the last segment of a scan
+        self.scanned = set()
+        self.segmented = ttk.BooleanVar(value=False)
+        self.resolution = ttk.StringVar(value='1e6')
+        scanFrame = ttk.Frame(master=self.configFrame)
+        ttk.Checkbutton(master=scanFrame, text='Balayage segmenté', variable=self.segmented, takefocus=False, command=self.toggleSegmented).pack(side='left', padx=10)
+        ttk.Label(master=scanFrame, text='Résolution (Hz)', font='Arial 14').pack(side='left', padx=10)
+        resolutionInput = ttk.Entry(master=scanFrame, textvariable=self.resolution, width=10, takefocus=False)
+        resolutionInput.bind('<Return>', lambda _: self.toggleSegmented())
+        resolutionInput.pack(side='left', padx=10)
+        scanFrame.grid(row=3, column=3, columnspan=3, sticky='w')
         
         
         # Trace frame
@@ -139,6 +244,22 @@ class GUI:
         
         # Plot frame
         self.canvas = None
+
+        # (min/max pyramid, lines, markers) of the plotted traces, the lines are drawn decimated to the displayed range
+        self.decimated = []
+        self.fullXLimits = None
+        self.panStart = None
+        # Shaded ranges violating the mask, and name of the mask drawn by the live plot
+        self.violationShading = None
+        self.liveMaskName = None
+
+        # Frame displayed by the plot and its title, copied by the exports
+        self.shownFrame = None
+        self.shownTitle = 'Graphe'
+        # Exports are written by worker processes, their progress is shown in the status bar
+        self.exporter = Exporter()
+        self.exports = []
+        self.exportFormats = {extension: ttk.BooleanVar(value=extension in ('png', 'npz')) for extension in EXPORT_FORMATS}
         
         self.plotFrame = ttk.Frame(master=self.tabs)
         for row in range(2):
@@ -148,6 +269,101 @@ class GUI:
         
         self.progress = ttk.Progressbar(master=self.plotFrame, mode='indeterminate')
         self.progressTitle = ttk.Label(master=self.plotFrame, text='Chargement du graphe...', font=self.font)
+
+        # Live mode controls
+        self.live = False
+        self.liveEnabled = ttk.BooleanVar(value=False)
+        self.liveFps = ttk.IntVar(value=10)
+        self.liveStatus = ttk.StringVar(value='')
+        liveFrame = ttk.Frame(master=self.plotFrame)
+        ttk.Checkbutton(master=liveFrame, text='Direct (Ctrl+L)', variable=self.liveEnabled, takefocus=False, command=self.toggleLive).pack(side='left', padx=10)
+        ttk.Label(master=liveFrame, text='Images/s').pack(side='left', padx=(10, 0))
+        ttk.Spinbox(master=liveFrame, from_=1, to=60, width=4, textvariable=self.liveFps).pack(side='left', padx=10)
+        ttk.Label(master=liveFrame, textvariable=self.liveStatus).pack(side='left', padx=10)
+
+        # Waterfall view of the first active trace, its colour scale follows the amplitude range of the instrument
+        self.waterfallEnabled = False
+        self.waterfallBuffer = None
+        self.waterfallImage = None
+        self.waterfall = ttk.BooleanVar(value=False)
+        self.waterfallDepth = ttk.IntVar(value=200)
+        self.waterfallCmap = ttk.StringVar(value=WATERFALL_COLORMAPS[0])
+        ttk.Checkbutton(master=liveFrame, text='Cascade', variable=self.waterfall, takefocus=False, command=self.toggleWaterfall).pack(side='left', padx=10)
+        ttk.Label(master=liveFrame, text='Profondeur').pack(side='left', padx=(10, 0))
+        ttk.Spinbox(master=liveFrame, from_=10, to=10000, increment=10, width=6, textvariable=self.waterfallDepth).pack(side='left', padx=10)
+        ttk.Combobox(master=liveFrame, state='readonly', values=WATERFALL_COLORMAPS, width=8, textvariable=self.waterfallCmap).pack(side='left', padx=10)
+
+        # Analysis of the first active trace (peaks, noise floor, WiFi channels), computed by the acquisition worker
+        self.analysisEnabled = False
+        self.analysis = ttk.BooleanVar(value=False)
+        ttk.Checkbutton(master=liveFrame, text='Analyse', variable=self.analysis, takefocus=False, command=self.toggleAnalysis).pack(side='left', padx=10)
+        self.analysisFrame = ttk.Frame(master=self.plotFrame)
+        self.analysisSummary = ttk.StringVar(value='')
+        ttk.Label(master=self.analysisFrame, textvariable=self.analysisSummary, justify='left').pack(side='top', fill='x', pady=5)
+        self.analysisTable = ttk.Treeview(master=self.analysisFrame, columns=('power', 'obw', 'occupancy'), height=20)
+        self.analysisTable.heading('#0', text='Canal')
+        self.analysisTable.heading('power', text='Puissance (dBm)')
+        self.analysisTable.heading('obw', text='OBW (MHz)')
+        self.analysisTable.heading('occupancy', text='Occupation (%)')
+        for column in ('#0', 'power', 'obw', 'occupancy'):
+            self.analysisTable.column(column, width=110, anchor='e')
+        self.analysisTable.pack(side='top', expand=1, fill='both')
+        ttk.Button(master=self.analysisFrame, text='Réinitialiser', takefocus=False, command=self.resetOccupancy).pack(side='top', pady=5)
+        self.resetOccupancy()
+
+        # Host-side detectors fed with the first active trace, the bank is only used by the acquisition worker
+        self.detectors = DetectorBank()
+        self.detectorSelection = {name: ttk.BooleanVar(value=False) for name in DETECTORS}
+        self.detectorWindow = ttk.IntVar(value=0)
+        detectorFrame = ttk.Frame(master=self.plotFrame)
+        ttk.Label(master=detectorFrame, text='Détecteurs').pack(side='left', padx=10)
+        for name, var in self.detectorSelection.items():
+            ttk.Checkbutton(master=detectorFrame, text=name, variable=var, takefocus=False, command=self.configureDetectors).pack(side='left', padx=10)
+        ttk.Label(master=detectorFrame, text='Fenêtre (balayages, 0 = sans fin)').pack(side='left', padx=(10, 0))
+        windowInput = ttk.Spinbox(master=detectorFrame, from_=0, to=100000, width=7, textvariable=self.detectorWindow, command=self.configureDetectors)
+        windowInput.bind('<Return>', lambda _: self.configureDetectors())
+        windowInput.pack(side='left', padx=10)
+        ttk.Button(master=detectorFrame, text='Réinitialiser', takefocus=False, command=lambda: self.worker.submit(self.detectors.reset)).pack(side='left', padx=10)
+        detectorFrame.grid(row=4, column=0, columnspan=2, sticky='w')
+
+        # Sweep bus fed by the acquisition worker (created with the first sweep), and recording controls:
+        # the recorder is only used by the recording thread, a consumer of the bus
+        self.bus = None
+        self.recorder = None
+        self.recordStop = None
+        self.recordEnabled = ttk.BooleanVar(value=False)
+        self.recordStatus = ttk.StringVar(value='')
+        ttk.Checkbutton(master=liveFrame, text='Enregistrer', variable=self.recordEnabled, takefocus=False, command=self.toggleRecord).pack(side='left', padx=10)
+        ttk.Label(master=liveFrame, textvariable=self.recordStatus).pack(side='left', padx=10)
+        ttk.Button(master=liveFrame, text='Lecture...', takefocus=False, command=self.openSession).pack(side='left', padx=10)
+        # Limit mask tested by the acquisition worker on every frame, the violations are shaded and raised as rate-limited alarms
+        self.maskChecker = None
+        self.alarms = AlarmStream()
+        self.alarmCount = 0
+        self.maskName = ttk.StringVar(value=NO_MASK)
+        self.alarmStatus = ttk.StringVar(value='')
+        ttk.Label(master=liveFrame, text='Masque').pack(side='left', padx=(10, 0))
+        maskInput = ttk.Combobox(master=liveFrame, state='readonly', values=[NO_MASK] + list(MASKS), width=8, textvariable=self.maskName)
+        maskInput.bind('<<ComboboxSelected>>', lambda _: self.selectMask())
+        maskInput.pack(side='left', padx=10)
+        ttk.Label(master=liveFrame, textvariable=self.alarmStatus).pack(side='left', padx=10)
+        liveFrame.grid(row=2, column=0, columnspan=2, sticky='w')
+
+        self.session = None
+        self.playbackIndex = ttk.IntVar(value=0)
+        self.playbackTime = ttk.StringVar(value='')
+        self.playbackPending = False
+        self.playbackFrame = ttk.Frame(master=self.plotFrame)
+        self.playbackScale = ttk.Scale(master=self.playbackFrame, from_=0, to=0, command=lambda _: self.scheduleSweep())
+        self.playbackScale.pack(side='left', expand=1, fill='x', padx=10)
+        ttk.Label(master=self.playbackFrame, textvariable=self.playbackTime, width=32).pack(side='left', padx=10)
+        ttk.Label(master=self.playbackFrame, text='Aller à').pack(side='left', padx=(10, 0))
+        self.playbackSeek = ttk.StringVar()
+        seekEntry = ttk.Entry(master=self.playbackFrame, textvariable=self.playbackSeek, width=20)
+        seekEntry.bind('<Return>', lambda _: self.seekSession())
+        seekEntry.pack(side='left', padx=10)
+        ttk.Button(master=self.playbackFrame, text='Exporter...', takefocus=False, command=self.exportSession).pack(side='left', padx=10)
+        ttk.Button(master=self.playbackFrame, text='Fermer', takefocus=False, command=self.closeSession).pack(side='left', padx=10)
         
         # Adding tabs to the tab manager
         self.tabs.add(self.configFrame, text='Paramètres')
@@ -161,6 +377,7 @@ class GUI:
                 case 'Paramètres':
                     self.window.unbind_all('<Key>')
                     self.window.bind('<Return>', lambda _: self.applyParam())
+                    self.window.bind('<Control-r>', lambda _: self.refreshParam())
                 case 'Traces':
                     self.window.unbind_all('<Key>')
                     pass
@@ -168,44 +385,168 @@ class GUI:
                     self.window.unbind_all('<Key>')
                     self.window.bind('<Control-s>', lambda _: self.saveGraph())
                     self.window.bind('<Control-r>', lambda _: self.loadGraph())
+                    self.window.bind('<Control-l>', lambda _: self.switchLive())
+                    self.window.bind('<Left>', lambda _: self.stepSession(-1))
+                    self.window.bind('<Right>', lambda _: self.stepSession(1))
                     self.loadGraph()
                     # self.window.state('zoomed')
         
         self.tabs.bind('<<NotebookTabChanged>>', on_tab_change)
         
+        # Status bar
+        self.status = ttk.StringVar(value='')
+        ttk.Label(master=self.window, textvariable=self.status, anchor='w').pack(side='bottom', fill='x', padx=10)
+
+        # Instrumentation bar: SCPI latencies, parse/plot/draw timings and rates, exported for bug reports
+        self.metricsEnabled = ttk.BooleanVar(value=METRICS.enabled)
+        self.metricsStatus = ttk.StringVar(value='')
+        self.metricsUpdate = 0.0
+        metricsFrame = ttk.Frame(master=self.window)
+        ttk.Checkbutton(master=metricsFrame, text='Mesures', variable=self.metricsEnabled, takefocus=False, command=lambda: METRICS.enable(self.metricsEnabled.get())).pack(side='left', padx=10)
+        ttk.Label(master=metricsFrame, textvariable=self.metricsStatus, anchor='w').pack(side='left', expand=1, fill='x', padx=10)
+        ttk.Button(master=metricsFrame, text='Réinitialiser', takefocus=False, command=METRICS.reset).pack(side='right', padx=10)
+        ttk.Button(master=metricsFrame, text='Exporter...', takefocus=False, command=self.exportMetrics).pack(side='right', padx=10)
+        metricsFrame.pack(side='bottom', fill='x')
+
         self.tabs.pack(expand=1, fill='both')
 
         self.window.bind('<Return>', lambda _: self.applyParam())
         
+        # Frames are rendered and command results reported on the Tk thread only
+        self.window.after(RENDER_PERIOD, self.renderFrames)
+        self.window.after(RENDER_PERIOD, self.pollCommands)
+
         # App finished loading
         self.splash.destroy()
         self.window.deiconify()
+        self.window.update_idletasks()
+        self.markStartup('fenêtre')
+
+        self.status.set(f'Connexion à {self.currentIp}...')
+        self.whenDone(self.pool.connection(self.currentIp), self.onConnected)
 
         # # Application loop
         # self.window.mainloop()
 
+    def markStartup(self, step: string) -> None:
+        """Records the time at which a startup step is reached.
+
+        Args:
+            step (string): Name of the step.
+        """
+        self.startupTimes[step] = time.perf_counter() - self.startTime
+
+    def reportStartup(self) -> None:
+        """Displays the startup timings and appends them to the report file.
+        """
+        report = ', '.join(f'{step} {elapsed:.2f} s' for step, elapsed in self.startupTimes.items())
+        self.status.set(f'Démarrage : {report}')
+        print(f'Démarrage : {report}')
+        if self.startupReport:
+            with open(self.startupReport, 'a') as file:
+                file.write(json.dumps({'date': str(datetime.datetime.now()), **self.startupTimes}) + '\n')
+
+    def whenDone(self, future: Future, callback: Callable[[object], None]) -> None:
+        """Calls a function with the result of a future on the Tk thread once it is done, without blocking it.
+
+        An exception raised by the future is shown in the status bar instead.
+
+        Args:
+            future (Future): The future.
+            callback (Callable[[object], None]): Function called with the result.
+        """
+        if not future.done():
+            self.window.after(RENDER_PERIOD, lambda: self.whenDone(future, callback))
+            return
+        try:
+            result = future.result()
+        except Exception as error:
+            self.status.set(f'Erreur : {error}')
+            return
+        callback(result)
+
+    def onConnected(self, fmp: FMP) -> None:
+        """Called once the selected instrument is connected: reads its parameters.
+
+        Args:
+            fmp (FMP): The instrument.
+        """
+        self.markStartup('connexion')
+        self.status.set('')
+        self.loadParam()
+
+    def selectInstrument(self, ip: string) -> None:
+        """Switches to another instrument of the pool without reconnecting.
+
+        Args:
+            ip (string): IP address of the instrument.
+        """
+        self.currentIp = ip
+        self.loadParam()
+
+    def toggleOverlay(self) -> None:
+        """Copies the overlay checkbox for the acquisition worker (Tk variables stay on the Tk thread).
+        """
+        self.overlayEnabled = self.overlay.get()
+
+    def refreshParam(self) -> None:
+        """Reads the parameters back from the instrument (e.g. after they were changed on the front panel).
+        """
+        self.pool.submit(self.currentIp, FMP.refresh)
+        self.loadParam()
+
+    def loadParam(self) -> None:
+        """Reads the instrument settings in the background and fills the parameter fields when they arrive.
+        """
+        ip = self.currentIp
+        def fill(values: tuple) -> None:
+            if ip != self.currentIp:
+                return
+            for var, value in zip((self.startFreq, self.stopFreq, self.amplRef, self.amplCase, self.rbw), values):
+                var.set(str(value))
+            if 'paramètres' not in self.startupTimes:
+                self.markStartup('paramètres')
+                self.reportStartup()
+        future = self.pool.submit(ip, lambda fmp: (fmp.getStartFreq(), fmp.getStopFreq(), fmp.getRefLvl(), fmp.getTraceScale(), fmp.getRBW()))
+        self.whenDone(future, fill)
+
     def applyParam(self) -> None:
         """Applies the selected parameters.
         """
-        self.fmp.setParam(
-        float(self.startFreq.get()),
-        float(self.stopFreq.get()),
-        float(self.amplRef.get()),
-        float(self.amplCase.get()),
-        float(self.rbw.get()))
+        try:
+            param = (float(self.startFreq.get()),
+                     float(self.stopFreq.get()),
+                     float(self.amplRef.get()),
+                     float(self.amplCase.get()),
+                     float(self.rbw.get()))
+        except ValueError:
+            self.status.set('Paramètres invalides')
+            return
+        self.dispatcher.dispatch(self.currentIp, 'param', lambda fmp: fmp.setParam(*param))
+
+    def pollCommands(self) -> None:
+        """Reports the commands completion and errors in the status bar, then schedules itself.
+        """
+        errors = [f'{key} : {error}' for key, error in self.dispatcher.poll() if error is not None]
+        if errors:
+            self.status.set('Erreur : ' + ', '.join(errors))
+        elif self.dispatcher.pending:
+            self.status.set(f'Envoi en cours ({self.dispatcher.pending} commande(s))...')
+        elif self.status.get().startswith('Envoi'):
+            self.status.set('')
+        self.window.after(RENDER_PERIOD, self.pollCommands)
       
-    def drawConfigFrame(self, title: string, var: ttk.StringVar,setDefaultValueFunc: Callable[[None], float], col: int) -> None:
+    def drawConfigFrame(self, title: string, var: ttk.StringVar, col: int) -> None:
         """Draws a custom frame to configure the instrument's parameters.
 
         Args:
             title (string): Parameter name.
-            var (ttk.StringVar): StringVar linked to the entry.
-            setDefaultValueFunc (Callable[[None], str]): Function to get the current value of the parameter.
+            var (ttk.StringVar): StringVar linked to the entry, holds a placeholder until the instrument is read.
             col (int): Column where to draw the frame.
         """
         inputFrame = ttk.Frame(master=self.configFrame)
         ttk.Label(master=inputFrame, text=title, font='Arial 14', justify='center').pack(expand=1, fill='both')
-        var.set(str(setDefaultValueFunc()))
+        var.set('...')
         paramInput = ttk.Entry(master=inputFrame, textvariable=var, takefocus=False)
         paramInput.bind('<FocusIn>', lambda _: var.set(''))
         
@@ -221,6 +562,7 @@ class GUI:
         """
         self.startFreq.set(startFreq)
         self.stopFreq.set(stopFreq)
+        # Only the frequencies change, the other settings are skipped by the batch of setParam
         self.applyParam()
 
     def drawPresetBtn(self, text: string, startFreq: string, stopFreq: string) -> None:
@@ -244,14 +586,17 @@ class GUI:
         traceName = ttk.Label(master=self.traceFrame, text=f'Trace {num}', font=self.font)
         
         def setType(type: string) -> None:
-            if type=='Clear/Write':
-                self.fmp.setTraceTypeClearWrite(num)
-            elif type=='Maximum':
-                self.fmp.setTraceTypeMax(num)
-            elif type=='Minimum':
-                self.fmp.setTraceTypeMin(num)
-            else:
-                self.fmp.setTraceTypeAverage(num)
+            def apply(fmp: FMP) -> None:
+                with fmp.batch():
+                    if type=='Clear/Write':
+                        fmp.setTraceTypeClearWrite(num)
+                    elif type=='Maximum':
+                        fmp.setTraceTypeMax(num)
+                    elif type=='Minimum':
+                        fmp.setTraceTypeMin(num)
+                    else:
+                        fmp.setTraceTypeAverage(num)
+            self.dispatcher.dispatch(self.currentIp, f'type{num}', apply)
         
         selectedTraceType = ttk.StringVar()
         typeValues = ['Clear/Write', 'Maximum', 'Minimum', 'Average']
@@ -260,12 +605,15 @@ class GUI:
         traceType.bind('<<ComboboxSelected>>', lambda _: setType(selectedTraceType.get()))
         
         def setMode(mode: string) -> None:
-            if mode=='Active':
-                self.fmp.setTraceModeActive(num)
-            elif mode=='Hold/View':
-                self.fmp.setTraceModeHold(num)
-            else:
-                self.fmp.setTraceModeBlank(num)
+            def apply(fmp: FMP) -> None:
+                with fmp.batch():
+                    if mode=='Active':
+                        fmp.setTraceModeActive(num)
+                    elif mode=='Hold/View':
+                        fmp.setTraceModeHold(num)
+                    else:
+                        fmp.setTraceModeBlank(num)
+            self.dispatcher.dispatch(self.currentIp, f'mode{num}', apply)
         
         selectedTraceMode = ttk.StringVar()
         modeValues = ['Active', 'Hold/View', 'Blank']
@@ -291,25 +639,417 @@ class GUI:
         font_to_use = font.Font(family='Arial', size=20)
         widget.tk.call(dropdown_listbox, 'configure', '-font', font_to_use)
         
-    def plotGraph(self) -> None:
-        """Generates and displays the plot in the Tkinter window."""
-        frequencies = np.linspace(self.fmp.getStartFreq(), self.fmp.getStopFreq(), self.fmp.getPointNumber()-1)
-        amplitudes = self.fmp.getTraces()
+    def fetchFrame(self, live: bool) -> TraceFrame:
+        """Acquires a frame, called by the acquisition worker.
 
-        if not hasattr(self, 'fig'):
-            self.fig = Figure()
-            self.ax = self.fig.add_subplot()
+        Args:
+            live (bool): Frame requested by the live mode.
 
-        self.ax.clear()
+        Returns:
+            TraceFrame: The acquired traces.
+        """
+        if self.overlayEnabled and not live:
+            # Every instrument of the pool is acquired at once
+            acquisition = self.pool.getTraces()
+            curves = [(acquisition.frequencies[ip], acquisition.traces[ip], ip) for ip in acquisition.traces]
+            return TraceFrame(curves)
 
-        for amplitude in amplitudes:
-            if len(amplitude) > 0:
-                self.ax.plot(frequencies, amplitude, marker='x')
+        if self.segmentedResolution is not None and not live:
+            return self.scanFrame(self.segmentedResolution)
 
-        self.ax.set_xlabel('Fréquence (Hz)')
-        self.ax.set_ylabel('Gain (dB)')
-        self.ax.set_title('Graphe')
-        self.ax.grid(True)
+        detecting = len(self.detectors) > 0
+        ip = self.currentIp
+        def acquire(fmp: FMP) -> tuple[TraceFrame, ChannelAnalyzer]:
+            if ip in self.scanned:
+                # A sweep of the whole span replaces the last segment of the scan before the traces are read
+                self.scanned.discard(ip)
+                continuous = fmp.isContinuous()
+                with fmp.batch():
+                    fmp.continuousOff()
+                    fmp.sweepLaunch()
+                if continuous:
+                    fmp.continuousOn()
+            refLvl, scale = float(fmp.getRefLvl()), float(fmp.getTraceScale())
+            # The reference level, scale and trace types are only kept as metadata of the exports
+            settings = {'start': fmp.getStartFreq(), 'stop': fmp.getStopFreq(), 'rbw': fmp.getRBW(), 'ref': refLvl, 'scale': scale,
+                        'types': {nb: fmp.getTraceType(nb) for nb in traces}}
+            analyzer = fmp.getAnalyzer() if self.analysisEnabled else None
+            # The detectors only need the first active trace: a single transfer per frame
+            nbs = [nb for nb in traces if fmp.getTraceMode(nb) == '1'][:1] if detecting else traces
+            return TraceFrame([(fmp.getFrequencies(), fmp.getTraces(nbs), None)], (refLvl - 10*scale, refLvl), live, settings), analyzer
+        frame, analyzer = self.pool.submit(ip, acquire).result()
+        self.publish(frame)
+        # The analysis and the detectors run on the acquisition worker, the instrument is free for the next commands
+        rows = activeTraces(frame.curves[0][1])
+        if detecting and len(rows):
+            self.detectors.push(rows[0], self.currentIp, frame.curves[0][0])
+            frame.detectors = self.detectors.values()
+        if analyzer is not None and len(rows) and len(rows[0]) == len(analyzer.frequencies):
+            frame.analysis = analyzer.analyze(rows[0])
+        self.checkMask(frame)
+        return frame
+
+    def scanFrame(self, resolution: float) -> TraceFrame:
+        """Acquires the span of the selected instrument with a segmented scan, called by the acquisition worker.
+
+        Args:
+            resolution (float): Maximum spacing of the points (Hz).
+
+        Returns:
+            TraceFrame: The stitched trace, on the first active trace row.
+        """
+        ip = self.currentIp
+        def scan(fmp: FMP) -> TraceFrame:
+            refLvl, scale = float(fmp.getRefLvl()), float(fmp.getTraceScale())
+            active = [nb for nb in traces if fmp.getTraceMode(nb) == '1']
+            scan = SegmentedScan(fmp, fmp.getStartFreq(), fmp.getStopFreq(), resolution, active[0] if active else 1)
+            try:
+                amplitudes = scan.run()
+            finally:
+                self.scanned.add(ip)
+            settings = {'start': fmp.getStartFreq(), 'stop': fmp.getStopFreq(), 'rbw': fmp.getRBW()}
+            frame = TraceFrame([(scan.frequencies, stackTraces([amplitudes if nb == scan.nb else np.empty(0, dtype=np.float32) for nb in traces]), None)],
+                               (refLvl - 10*scale, refLvl), False, settings)
+            frame.report = f'Balayage segmenté : {scan.report()}'
+            return frame
+        frame = self.pool.submit(ip, scan).result()
+        self.publish(frame)
+        self.checkMask(frame)
+        return frame
+
+    def checkMask(self, frame: TraceFrame) -> None:
+        """Tests every trace of a frame against the selected mask and raises the alarms, run on the acquisition worker.
+
+        Args:
+            frame (TraceFrame): Single instrument frame.
+        """
+        checker, alarms = self.maskChecker, self.alarms
+        if checker is None:
+            return
+        frequencies, amplitudes, _ = frame.curves[0]
+        frame.mask = checker.check(frequencies, amplitudes)
+        alarms.push(frame.mask, frame.timestamp)
+
+    def selectMask(self) -> None:
+        """Selects the limit mask according to its selector, the alarms start again.
+        """
+        name = self.maskName.get()
+        self.alarms = AlarmStream()
+        self.alarmCount = 0
+        self.alarmStatus.set('')
+        self.maskChecker = MaskChecker(MASKS[name]) if name in MASKS else None
+        # The live plot is set up again with the limits of the mask
+        self.liveFrequencies = None
+
+    def toggleSegmented(self) -> None:
+        """Enables or disables the segmented scan according to its checkbox and resolution.
+        """
+        if not self.segmented.get():
+            self.segmentedResolution = None
+            return
+        try:
+            self.segmentedResolution = float(self.resolution.get())
+        except ValueError:
+            self.segmented.set(False)
+            self.segmentedResolution = None
+            self.status.set('Résolution invalide')
+
+    def configureDetectors(self) -> None:
+        """Applies the selection of detectors and their window to the detector bank.
+        """
+        names = [name for name, var in self.detectorSelection.items() if var.get()]
+        try:
+            window = self.detectorWindow.get() or None
+        except tk.TclError:
+            window = None
+        self.worker.submit(lambda: self.detectors.configure(names, window))
+        # The live plot is set up again with the lines of the detectors
+        self.liveFrequencies = None
+
+    def toggleAnalysis(self) -> None:
+        """Shows or hides the analysis panel according to its checkbox.
+        """
+        self.analysisEnabled = self.analysis.get()
+        if self.analysisEnabled:
+            self.resetOccupancy()
+            self.analysisFrame.grid(row=0, column=2, rowspan=2, sticky='ns', padx=10)
+        else:
+            self.analysisFrame.grid_forget()
+
+    def resetOccupancy(self) -> None:
+        """Restarts the channel occupancy statistics.
+        """
+        self.occupancyNames = None
+        self.occupancyCounts = None
+        self.occupancySweeps = 0
+        self.analysisShown = 0.0
+
+    def showAnalysis(self, analysis: dict) -> None:
+        """Accumulates the occupancy of the channels and displays the analysis of a frame.
+
+        Args:
+            analysis (dict): Analysis of the frame (see ChannelAnalyzer.analyze).
+        """
+        if analysis['names'] != self.occupancyNames:
+            # New span: the statistics and the rows of the table start over
+            self.occupancyNames = analysis['names']
+            self.occupancyCounts = np.zeros(len(self.occupancyNames))
+            self.occupancySweeps = 0
+            self.analysisTable.delete(*self.analysisTable.get_children())
+            for name in self.occupancyNames:
+                self.analysisTable.insert('', 'end', iid=name, text=name)
+        self.occupancyCounts += analysis['busy']
+        self.occupancySweeps += 1
+
+        now = time.perf_counter()
+        if now - self.analysisShown < ANALYSIS_PERIOD:
+            return
+        self.analysisShown = now
+        peaks = '\n'.join(f'  {peak["frequency"]:.4f} GHz : {peak["amplitude"]:.1f} dB' for peak in analysis['peaks'])
+        self.analysisSummary.set(f'Plancher de bruit : {analysis["noiseFloor"]:.1f} dB\nPics :\n{peaks}\nOccupation sur {self.occupancySweeps} balayages')
+        occupancy = self.occupancyCounts/self.occupancySweeps*100
+        for name, power, obw, busy in zip(self.occupancyNames, analysis['power'], analysis['obw'], occupancy):
+            self.analysisTable.item(name, values=(f'{power:.1f}', f'{obw/1e6:.1f}', f'{busy:.0f}'))
+
+    def toggleRecord(self) -> None:
+        """Starts or stops the recording according to its checkbox.
+        """
+        if self.recordStop is not None:
+            self.recordStop.set()
+            self.recordStop = None
+        if self.recordEnabled.get():
+            path = os.path.join(SAVES_DIR, str(datetime.datetime.now()).replace(':', '_')) # ':' is a prohibited character in windows filenames
+            self.recordStop = threading.Event()
+            threading.Thread(target=self.recordSweeps, args=(path, self.recordStop), name='SweepRecorder', daemon=True).start()
+            self.recordStatus.set('Enregistrement...')
+        else:
+            self.recordStatus.set('')
+
+    def publish(self, frame: TraceFrame) -> None:
+        """Publishes the sweep of a frame on the sweep bus, run on the acquisition worker.
+
+        Frames of the overlay mode are not published. The bus is created with the first sweep,
+        and created again larger when a sweep does not fit in it.
+
+        Args:
+            frame (TraceFrame): The acquired frame.
+        """
+        if frame.settings is None:
+            return
+        frequencies, amplitudes, _ = frame.curves[0]
+        if self.bus is None or not self.bus.fits(amplitudes):
+            bus, self.bus = self.bus, SweepBus(len(traces), max(len(frequencies), BUS_POINTS))
+            if bus is not None:
+                # The consumers move to the new bus with their next sweep, the old one is released once they dropped it
+                bus.unlink()
+        self.bus.publish(frequencies, amplitudes, frame.timestamp, frame.settings)
+
+    def recordSweeps(self, path: string, stop: threading.Event) -> None:
+        """Appends every sweep published on the bus to a recorded session, run on the recording thread until stopped.
+
+        Disk writes never delay the acquisition: when they fall behind, the oldest sweeps of the bus are skipped.
+        When the number of points changes the session is closed and a new one is started next to it.
+
+        Args:
+            path (string): Session directory.
+            stop (threading.Event): Stops the recording.
+        """
+        reader, sessions = None, 0
+        try:
+            while not stop.is_set():
+                bus = self.bus
+                if bus is None:
+                    stop.wait(RECORD_POLL)
+                    continue
+                if reader is None or reader.bus is not bus:
+                    # A bus created during the recording is read from its first sweep
+                    reader = bus.reader(start=None if reader is None else 1)
+                sweep = reader.wait(RECORD_POLL)
+                if sweep is None:
+                    continue
+                recorder = self.recorder
+                if recorder is not None and sweep.amplitudes.shape != (recorder.traces, recorder.points):
+                    recorder.close()
+                    recorder = None
+                if recorder is None:
+                    recorder = SweepRecorder(path + (f'_{sessions}' if sessions else ''), *sweep.amplitudes.shape, RECORD_FORMAT)
+                    self.recorder = recorder
+                    sessions += 1
+                recorder.append(sweep.amplitudes, sweep.settings['start'], sweep.settings['stop'], sweep.settings['rbw'], sweep.timestamp)
+                if not sweep.intact():
+                    # Overwritten on the bus while it was written to disk
+                    recorder.discardLast()
+                del sweep
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
+            self.recorder = None
+
+    def openSession(self) -> None:
+        """Opens a recorded session for playback.
+        """
+        path = filedialog.askdirectory(initialdir=SAVES_DIR, mustexist=True)
+        if not path:
+            return
+        try:
+            session = SweepSession(path)
+        except (OSError, ValueError, KeyError) as error:
+            self.status.set(f'Session illisible : {error}')
+            return
+        if not len(session):
+            self.status.set('Session vide')
+            return
+        if self.live:
+            self.switchLive()
+        self.session = session
+        self.playbackScale.configure(to=len(session) - 1)
+        self.playbackScale.set(0)
+        self.playbackFrame.grid(row=3, column=0, columnspan=2, sticky='ew')
+        self.scheduleSweep()
+
+    def closeSession(self) -> None:
+        """Leaves the playback mode.
+        """
+        self.session = None
+        self.playbackFrame.grid_forget()
+        self.loadGraph()
+
+    def stepSession(self, step: int) -> None:
+        """Moves to the previous or next recorded sweep.
+
+        Args:
+            step (int): Number of sweeps to move by.
+        """
+        if self.session is not None:
+            self.playbackScale.set(min(max(0, round(self.playbackScale.get()) + step), len(self.session) - 1))
+
+    def seekSession(self) -> None:
+        """Moves to the sweep recorded at the time typed in the seek field (e.g. 2024-06-12 14:30:00).
+        """
+        try:
+            timestamp = datetime.datetime.fromisoformat(self.playbackSeek.get()).timestamp()
+        except ValueError:
+            self.status.set('Date invalide')
+            return
+        self.playbackScale.set(self.session.seek(timestamp))
+
+    def scheduleSweep(self) -> None:
+        """Renders the selected sweep once the pending Tk events are processed, so that scrubbing renders only the last position.
+        """
+        if not self.playbackPending:
+            self.playbackPending = True
+            self.window.after_idle(self.showSweep)
+
+    def showSweep(self) -> None:
+        """Renders the recorded sweep selected by the playback slider.
+        """
+        self.playbackPending = False
+        if self.session is None:
+            return
+        i = round(self.playbackScale.get())
+        settings = self.session.settings(i)
+        title = str(datetime.datetime.fromtimestamp(settings['time']))
+        self.playbackTime.set(f'{i + 1}/{len(self.session)} - {title}')
+        frame = TraceFrame([(self.session.frequencies(i), self.session.sweep(i), None)], settings=settings)
+        self.plotGraph(frame, title)
+
+    def liveSweepCount(self) -> int:
+        """Gets the sweep counter of the first active trace, called by the acquisition worker.
+
+        Returns:
+            int: Sweep count (None if no trace is active).
+        """
+        def count(fmp: FMP) -> int:
+            active = [nb for nb in traces if fmp.getTraceMode(nb) == '1']
+            return fmp.getSweepCount(active[0]) if active else None
+        return self.pool.submit(self.currentIp, count).result()
+
+    def renderFrames(self) -> None:
+        """Tk side consumer of the acquisition pipeline: renders the latest frame then schedules itself.
+        """
+        frame = self.frames.get()
+        if frame is not None:
+            METRICS.count('frames')
+            if frame.live and self.live:
+                self.renderLive(frame)
+            elif not frame.live and not self.live and self.session is None:
+                self.plotGraph(frame)
+            if frame.analysis is not None and self.analysisEnabled:
+                self.showAnalysis(frame.analysis)
+            alarms = self.alarms
+            if frame.mask is not None and alarms.count != self.alarmCount:
+                self.alarmCount = alarms.count
+                self.alarmStatus.set(f'{alarms.count} alarme(s)')
+                self.status.set(describeAlarm(alarms.alarms[-1]))
+            if frame.report is not None:
+                self.status.set(frame.report)
+        elif self.worker.error is not None and not self.live and self.progressTitle.winfo_ismapped():
+            self.progress.stop()
+            self.progressTitle.configure(text=f'Erreur : {self.worker.error}')
+
+        if self.live:
+            elapsed = time.perf_counter() - self.liveStart
+            self.liveStatus.set(f'{self.liveFrames/elapsed:.1f} images/s - {self.worker.sweepRate:.1f} balayages/s - {self.frames.dropped - self.liveDroppedStart} images perdues')
+        recorder = self.recorder
+        if self.recordEnabled.get() and recorder is not None:
+            self.recordStatus.set(f'{recorder.count} balayages enregistrés')
+        if METRICS.enabled and time.perf_counter() - self.metricsUpdate >= METRICS_PERIOD:
+            self.metricsUpdate = time.perf_counter()
+            self.metricsStatus.set(METRICS.status())
+        self.window.after(RENDER_PERIOD, self.renderFrames)
+
+    def exportMetrics(self) -> None:
+        """Exports a snapshot of the instrumentation as JSON or CSV, according to the extension chosen.
+        """
+        path = filedialog.asksaveasfilename(initialdir=SAVES_DIR, initialfile=f'mesures_{datetime.datetime.now():%Y%m%d_%H%M%S}.json',
+                                            defaultextension='.json', filetypes=[('JSON', '*.json'), ('CSV', '*.csv')])
+        if not path:
+            return
+        try:
+            METRICS.export(path)
+            self.status.set(f'Mesures exportées dans {path}')
+        except OSError as error:
+            self.status.set(f'Export impossible : {error}')
+
+    def plotGraph(self, frame: TraceFrame, title: string = 'Graphe') -> None:
+        """Generates and displays the plot in the Tkinter window.
+
+        Args:
+            frame (TraceFrame): The traces to plot.
+            title (string): Title of the plot.
+        """
+        self.shownFrame, self.shownTitle = frame, title
+        self.drawCanvas()
+        with METRICS.span('plot'):
+            self.ax.clear()
+
+            # The lines get their data from the decimation, once the range is set
+            self.decimated = []
+            for frequencies, amplitudes, ip in frame.curves:
+                rows = activeTraces(amplitudes)
+                # One legend entry per instrument
+                lines = [self.ax.plot([], [], label=ip if i == 0 else '_nolegend_')[0] for i in range(len(rows))]
+                self.decimated.append((MinMaxPyramid(frequencies, rows), lines, True))
+            if frame.detectors:
+                lines = [self.ax.plot([], [], label=name)[0] for name in frame.detectors]
+                self.decimated.append((MinMaxPyramid(frame.curves[0][0], np.stack(list(frame.detectors.values()))), lines, False))
+            if frame.detectors or any(ip is not None for _, _, ip in frame.curves):
+                self.ax.legend()
+            self.violationShading = None
+            if frame.mask is not None:
+                self.drawMask(frame.mask, False)
+            self.setFullRange(min((frequencies[0] for frequencies, _, _ in frame.curves if len(frequencies)), default=0.0),
+                              max((frequencies[-1] for frequencies, _, _ in frame.curves if len(frequencies)), default=1.0))
+            self.ax.relim()
+            self.ax.autoscale_view(scalex=False)
+
+            self.ax.set_xlabel('Fréquence (Hz)')
+            self.ax.set_ylabel('Gain (dB)')
+            self.ax.set_title(title)
+            self.ax.grid(True)
+
+            frequencies, amplitudes, _ = frame.curves[0]
+            self.updateWaterfall(frequencies, amplitudes, frame.yLimits, False)
 
         self.progress.stop()
         self.progress.grid_forget()
@@ -318,26 +1058,369 @@ class GUI:
         # ttk.Button(master=self.plotFrame, text='Show Plot', takefocus=False, command=self.plotGraph).grid(row=0, column=0, sticky='news')
         # ttk.Button(master=self.plotFrame, text='Enregister', takefocus=False, command=self.saveGraph).grid(row=0, column=1, sticky='news')
 
+        with METRICS.span('draw'):
+            self.canvas.draw()
+        self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=2, sticky='news')
+
+    def drawCanvas(self) -> None:
+        """Creates the figure and its canvas the first time they are needed.
+        """
+        # matplotlib is only imported when the first graph is drawn, to speed up the startup
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        if not hasattr(self, 'fig'):
+            self.fig = Figure()
+            self.layoutFigure()
         if self.canvas is None:
             self.canvas = FigureCanvasTkAgg(self.fig, master=self.plotFrame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=2, sticky='news')
+            # The blitting background is captured again after every full redraw (e.g. resize)
+            self.canvas.mpl_connect('draw_event', self.captureBackground)
+            # The decimation follows the width of the axes
+            self.canvas.mpl_connect('resize_event', lambda _: self.decimate())
+            # Zoom with the wheel, pan by dragging and back to the whole span with a double click
+            self.canvas.mpl_connect('scroll_event', self.zoomPlot)
+            self.canvas.mpl_connect('button_press_event', self.startPan)
+            self.canvas.mpl_connect('motion_notify_event', self.pan)
+            self.canvas.mpl_connect('button_release_event', self.endPan)
+
+    def layoutFigure(self) -> None:
+        """Creates the axes of the figure: the traces, with the waterfall below them when it is enabled.
+        """
+        self.fig.clear()
+        if self.waterfallEnabled:
+            self.ax, self.waterfallAx = self.fig.subplots(2, 1)
+        else:
+            self.ax, self.waterfallAx = self.fig.add_subplot(), None
+        self.waterfallBuffer = None
+        self.waterfallImage = None
+        self.waterfallFrequencies = None
+        self.decimated = []
+        self.violationShading = None
+        # The live artists are created again with the next frame
+        self.liveFrequencies = None
+
+    def toggleWaterfall(self) -> None:
+        """Shows or hides the waterfall according to its checkbox.
+        """
+        self.waterfallEnabled = self.waterfall.get()
+        if not hasattr(self, 'fig'):
+            return
+        self.layoutFigure()
+        if self.session is not None:
+            self.scheduleSweep()
+        else:
+            self.loadGraph()
+
+    def updateWaterfall(self, frequencies: np.ndarray, amplitudes: np.ndarray, yLimits: tuple[float, float], animated: bool) -> bool:
+        """Adds the first active trace of a frame to the waterfall and updates its image in place.
+
+        The history is cleared when the frequency axis or the depth change.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis of the traces (GHz).
+            amplitudes (np.ndarray): (trace, point) matrix.
+            yLimits (tuple[float, float]): Amplitude range used as colour scale (dB), None to use the range of the first sweep.
+            animated (bool): The image is drawn by blitting (live mode).
+
+        Returns:
+            bool: The waterfall axes were drawn again and the canvas needs a full redraw.
+        """
+        rows = activeTraces(amplitudes)
+        if self.waterfallAx is None or not len(rows) or len(rows[0]) != len(frequencies):
+            return False
+        created = False
+        sweep = rows[0]
+        try:
+            depth = max(1, self.waterfallDepth.get())
+        except tk.TclError:
+            depth = self.waterfallBuffer.depth if self.waterfallBuffer is not None else 200
+
+        buffer = self.waterfallBuffer
+        if buffer is None or buffer.depth != depth or not (frequencies is self.waterfallFrequencies or np.array_equal(frequencies, self.waterfallFrequencies)):
+            self.waterfallBuffer = buffer = WaterfallBuffer(depth, len(frequencies))
+            self.waterfallFrequencies = frequencies
+            if yLimits is None:
+                yLimits = (float(np.nanmin(sweep)), float(np.nanmax(sweep)))
+            self.waterfallAx.clear()
+            self.waterfallImage = self.waterfallAx.imshow(buffer.view(), aspect='auto', interpolation='nearest', vmin=yLimits[0], vmax=yLimits[1],
+                                                          extent=(frequencies[0], frequencies[-1], buffer.span, 0))
+            self.waterfallAx.set_xlabel('Fréquence (GHz)')
+            self.waterfallAx.set_ylabel('Balayages')
+            self.waterfallAx.set_title(f'Cascade ({yLimits[0]:g} à {yLimits[1]:g} dB)')
+            created = True
+        elif yLimits is not None and self.waterfallImage.get_clim() != yLimits:
+            self.waterfallImage.set_clim(*yLimits)
+            self.waterfallAx.set_title(f'Cascade ({yLimits[0]:g} à {yLimits[1]:g} dB)')
+            created = True
+
+        buffer.push(sweep)
+        self.waterfallImage.set_data(buffer.view(max(1, int(self.waterfallAx.bbox.height))))
+        self.waterfallImage.set_cmap(self.waterfallCmap.get())
+        self.waterfallImage.set_animated(animated)
+        return created
 
     def loadGraph(self) -> None:
+        """Requests a new graph, requests made while a fetch is in progress are coalesced.
+        """
+        if self.live or self.session is not None:
+            return
         if self.canvas:
             self.canvas.get_tk_widget().grid_forget()
         
+        self.progressTitle.configure(text='Chargement du graphe...')
         self.progressTitle.grid(row=0, column=0, columnspan=2, sticky='s')
         self.progress.grid(row=1, column=0, columnspan=2, sticky='new', padx=200, pady=50)
         self.progress.start()
-        threading.Thread(target=self.plotGraph).start()
+        self.worker.request()
+
+    def switchLive(self) -> None:
+        """Switches the live mode on or off (Ctrl+L).
+        """
+        self.liveEnabled.set(not self.liveEnabled.get())
+        self.toggleLive()
+
+    def toggleLive(self) -> None:
+        """Starts or stops the live mode according to its checkbox.
+        """
+        if self.liveEnabled.get() == self.live:
+            return
+        if self.live:
+            self.live = False
+            self.liveStatus.set('')
+            self.worker.setLive(False)
+            return
+
+        if self.session is not None:
+            self.closeSession()
+        self.live = True
+        self.liveFrames = 0
+        self.liveStart = time.perf_counter()
+        self.liveDroppedStart = self.frames.dropped
+        self.liveFrequencies = None
+        try:
+            interval = 1/max(1, self.liveFps.get())
+        except tk.TclError:
+            interval = 0.1
+        self.pool.submit(self.currentIp, FMP.continuousOn)
+        self.worker.setLive(True, interval)
+
+    def setupLivePlot(self, frequencies: np.ndarray, yLimits: tuple[float, float], mask: MaskResult = None) -> None:
+        """Creates the live artists (one line per trace) and draws the static part of the plot.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis of the traces (GHz).
+            yLimits (tuple[float, float]): Amplitude range (dB).
+            mask (MaskResult): Test of the first frame against the selected mask, None without mask.
+        """
+        self.drawCanvas()
+        self.progress.stop()
+        self.progress.grid_forget()
+        self.progressTitle.grid_forget()
+        self.canvas.get_tk_widget().grid(row=1, column=0, columnspan=2, sticky='news')
+
+        self.ax.clear()
+        self.liveFrequencies = frequencies
+        self.decimated = []
+        self.liveLines = [self.ax.plot([], [], animated=True)[0] for _ in traces]
+        self.detectorLines = {name: self.ax.plot([], [], animated=True, label=name)[0]
+                              for name, var in self.detectorSelection.items() if var.get()}
+        if self.detectorLines:
+            self.ax.legend(handles=list(self.detectorLines.values()))
+        self.violationShading = None
+        self.liveMaskName = None if mask is None else mask.mask.name
+        if mask is not None:
+            self.drawMask(mask, True)
+        self.setFullRange(frequencies[0], frequencies[-1])
+        self.ax.set_ylim(*yLimits)
+        self.ax.set_xlabel('Fréquence (Hz)')
+        self.ax.set_ylabel('Gain (dB)')
+        self.ax.set_title('Graphe')
+        self.ax.grid(True)
+        # The history of the waterfall is kept, only its image becomes animated
+        if self.waterfallImage is not None:
+            self.waterfallImage.set_animated(True)
+        self.canvas.draw()
+
+    def setFullRange(self, xmin: float, xmax: float) -> None:
+        """Shows the whole frequency range of the plot, the lines are decimated for it.
+
+        Args:
+            xmin (float): Start of the range (GHz).
+            xmax (float): Stop of the range (GHz).
+        """
+        self.fullXLimits = (xmin, xmax)
+        # The callbacks of the axes are reset by clear()
+        self.ax.callbacks.connect('xlim_changed', lambda _: self.decimate())
+        self.ax.set_xlim(xmin, xmax)
+
+    def decimate(self) -> None:
+        """Sets the data of the plotted lines to the min/max envelope of their traces over the displayed range,
+        about one point pair per pixel. The markers are only drawn when the points are far enough apart.
+        """
+        if not self.decimated:
+            return
+        xmin, xmax = self.ax.get_xlim()
+        pixels = self.ax.bbox.width
+        for pyramid, lines, markers in self.decimated:
+            x, y, density = pyramid.envelope(xmin, xmax, pixels)
+            marker = 'x' if markers and markersVisible(density) else 'None'
+            for line, row in zip(lines, y):
+                line.set_data(x, row)
+                line.set_marker(marker)
+
+    def setXLimits(self, xmin: float, xmax: float) -> None:
+        """Displays a frequency range within the whole range of the plot.
+
+        Args:
+            xmin (float): Start of the range (GHz).
+            xmax (float): Stop of the range (GHz).
+        """
+        fullMin, fullMax = self.fullXLimits
+        width = min(xmax - xmin, fullMax - fullMin)
+        xmin = min(max(xmin, fullMin), fullMax - width)
+        self.ax.set_xlim(xmin, xmin + width)
+        self.canvas.draw_idle()
+
+    def zoomPlot(self, event) -> None:
+        """Zooms the frequency axis around the mouse pointer.
+
+        Args:
+            event: matplotlib scroll event.
+        """
+        if event.inaxes is not self.ax or self.fullXLimits is None:
+            return
+        xmin, xmax = self.ax.get_xlim()
+        scale = ZOOM_STEP**-event.step
+        self.setXLimits(event.xdata - (event.xdata - xmin)*scale, event.xdata + (xmax - event.xdata)*scale)
+
+    def startPan(self, event) -> None:
+        """Starts dragging the frequency axis, a double click shows the whole range again.
+
+        Args:
+            event: matplotlib button press event.
+        """
+        if event.inaxes is not self.ax or event.button != 1 or self.fullXLimits is None:
+            return
+        if event.dblclick:
+            self.setXLimits(*self.fullXLimits)
+            return
+        self.panStart = (event.x, self.ax.get_xlim())
+
+    def pan(self, event) -> None:
+        """Drags the frequency axis with the mouse pointer.
+
+        Args:
+            event: matplotlib motion event.
+        """
+        if self.panStart is None or event.x is None:
+            return
+        x, (xmin, xmax) = self.panStart
+        shift = (event.x - x)*(xmax - xmin)/self.ax.bbox.width
+        self.setXLimits(xmin - shift, xmax - shift)
+
+    def endPan(self, event) -> None:
+        """Stops dragging the frequency axis.
+
+        Args:
+            event: matplotlib button release event.
+        """
+        self.panStart = None
+
+    def drawMask(self, result: MaskResult, animated: bool) -> None:
+        """Draws the limits of a mask and shades the ranges where the traces violate it.
+
+        Args:
+            result (MaskResult): Test of the displayed frame.
+            animated (bool): The shading is drawn by blitting (live mode).
+        """
+        from matplotlib.collections import PolyCollection
+        for vertices in (result.mask.upper, result.mask.lower):
+            if len(vertices):
+                self.ax.plot(vertices[:, 0], vertices[:, 1], color='red', linestyle='--', linewidth=1)
+        # The shaded ranges span the whole height of the axes
+        self.violationShading = PolyCollection([], facecolor='red', alpha=0.25, transform=self.ax.get_xaxis_transform(), animated=animated)
+        self.ax.add_collection(self.violationShading, autolim=False)
+        self.shadeViolations(result)
+
+    def shadeViolations(self, result: MaskResult) -> None:
+        """Updates the shaded ranges violating the mask.
+
+        Args:
+            result (MaskResult): Test of the displayed frame.
+        """
+        frequencies = result.frequencies
+        # Every range is widened by half a point on both sides, so that a single point stays visible
+        half = (frequencies[-1] - frequencies[0])/(len(frequencies) - 1)/2 if len(frequencies) > 1 else 0.0
+        self.violationShading.set_verts([[(start - half, 0), (stop + half, 0), (stop + half, 1), (start - half, 1)] for start, stop in result.regions])
+
+    def captureBackground(self, event=None) -> None:
+        """Saves the static part of the plot used as blitting background.
+        """
+        if self.live and self.liveFrequencies is not None:
+            self.liveBackground = self.canvas.copy_from_bbox(self.fig.bbox)
+            self.blitLines()
+
+    def blitLines(self) -> None:
+        """Draws the live lines over the saved background.
+        """
+        self.canvas.restore_region(self.liveBackground)
+        if self.violationShading is not None:
+            self.ax.draw_artist(self.violationShading)
+        for line in self.liveLines + list(self.detectorLines.values()):
+            self.ax.draw_artist(line)
+        if self.waterfallImage is not None and self.waterfallImage.get_animated():
+            self.waterfallAx.draw_artist(self.waterfallImage)
+        self.canvas.blit(self.fig.bbox)
+
+    def renderLive(self, frame: TraceFrame) -> None:
+        """Renders a live frame by updating the lines y-data only.
+
+        Args:
+            frame (TraceFrame): The live frame.
+        """
+        self.shownFrame, self.shownTitle = frame, 'Direct'
+        frequencies, amplitudes, _ = frame.curves[0]
+        if frequencies is not self.liveFrequencies or self.liveMaskName != (None if frame.mask is None else frame.mask.mask.name):
+            # The span or the mask changed: the axes are drawn again
+            self.setupLivePlot(frequencies, frame.yLimits, frame.mask)
+        with METRICS.span('plot'):
+            for line, amplitude in zip(self.liveLines, amplitudes):
+                line.set_visible(len(amplitude) == len(frequencies) and not np.isnan(amplitude).all())
+            self.decimated = [(MinMaxPyramid(frequencies, amplitudes), self.liveLines, True)]
+            if self.detectorLines:
+                values = []
+                for name, line in self.detectorLines.items():
+                    value = frame.detectors.get(name)
+                    line.set_visible(value is not None and len(value) == len(frequencies))
+                    values.append(value if line.get_visible() else np.full(len(frequencies), np.nan))
+                self.decimated.append((MinMaxPyramid(frequencies, np.stack(values)), list(self.detectorLines.values()), False))
+            self.decimate()
+            if frame.mask is not None and self.violationShading is not None:
+                self.shadeViolations(frame.mask)
+            redraw = self.updateWaterfall(frequencies, amplitudes, frame.yLimits, True)
+        with METRICS.span('draw'):
+            if redraw:
+                # The static part of the plot is drawn again with the new waterfall axes
+                self.canvas.draw()
+            self.blitLines()
+        self.liveFrames += 1
+        try:
+            self.worker.setLive(True, 1/max(1, self.liveFps.get()))
+        except tk.TclError:
+            pass
 
     def saveGraph(self) -> None:
-        """Saves the current plot into the 'saves' directory.
+        """Exports the displayed plot into the 'saves' directory, in the background.
         """
+        if self.shownFrame is None:
+            self.status.set('Aucun graphe à sauvegarder')
+            return
+        # The frame is taken when the dialog opens, a live frame received meanwhile is not exported
+        frame, title = self.shownFrame, self.shownTitle
+
         self.saveWindow = ttk.Toplevel(self.window)
         self.saveWindow.withdraw()
-        self.saveWindow.geometry('460x180')
+        self.saveWindow.geometry('460x230')
         center_window(self.saveWindow)
         self.saveWindow.deiconify()
         self.saveWindow.resizable(False, False)
@@ -346,7 +1429,7 @@ class GUI:
         def confirm_save() -> None:
             name = graphName.get()
             if name:  
-                self.fig.savefig('../saves/'+name+'.png') # change to '../saves/'+name='.png' when compiled
+                self.exportFrame(frame, title, name)
                 self.saveWindow.destroy()
         
         graphName = ttk.StringVar()
@@ -355,8 +1438,71 @@ class GUI:
         saveName = ttk.Entry(master=self.saveWindow, textvariable=graphName, font=self.font)
         saveName.bind('<FocusIn>', lambda _: graphName.set(''))
         saveName.pack(expand=1, fill='x')
+        formatFrame = ttk.Frame(master=self.saveWindow)
+        for extension, var in self.exportFormats.items():
+            ttk.Checkbutton(master=formatFrame, text=extension.upper(), variable=var, takefocus=False).pack(side='left', padx=10)
+        formatFrame.pack(pady=5)
         btnFrame = ttk.Frame(master=self.saveWindow)
         ttk.Button(master=btnFrame, text='Confirmer', takefocus=False, command=confirm_save).pack(side='left', padx=5,expand=1, fill='x')
         ttk.Button(master=btnFrame, text='Annuler', takefocus=False, command=self.saveWindow.destroy).pack(side='left', padx=5, expand=1, fill='x')
         btnFrame.pack(expand=1, fill='x', pady=10)
+
+    def selectedFormats(self) -> list[string]:
+        """Gives the export formats checked in the save dialog.
+
+        Returns:
+            list[string]: The formats (see EXPORT_FORMATS).
+        """
+        return [extension for extension, var in self.exportFormats.items() if var.get()]
+
+    def exportFrame(self, frame: TraceFrame, title: string, name: string) -> None:
+        """Exports a frame and its settings in the background.
+
+        Args:
+            frame (TraceFrame): The frame.
+            title (string): Title of the plot.
+            name (string): Name of the exported files, without extension.
+        """
+        metadata = {'title': title, 'time': frame.timestamp, **(frame.settings or {})}
+        if self.session is None:
+            metadata['ip'] = self.currentIp
+        if frame.yLimits is not None:
+            metadata['yLimits'] = list(frame.yLimits)
+        curves = [(frequencies, amplitudes, ip or metadata.get('ip', '')) for frequencies, amplitudes, ip in frame.curves]
+        snapshot = Snapshot(name, curves, metadata, frame.detectors, frame.yLimits)
+        self.trackExport(self.exporter.export(snapshot, SAVES_DIR, self.selectedFormats()))
+
+    def exportSession(self) -> None:
+        """Exports every sweep of the session played back, in the background, into a directory next to the session.
+        """
+        if self.session is None:
+            return
+        directory = os.path.normpath(self.session.path) + '_export'
+        self.trackExport(self.exporter.exportSession(self.session.path, directory, self.selectedFormats()))
+
+    def trackExport(self, batch) -> None:
+        """Shows the progress of an export in the status bar until every export is finished.
+
+        Args:
+            batch (ExportBatch): Progress of the export.
+        """
+        self.exports.append(batch)
+        if len(self.exports) == 1:
+            self.window.after(EXPORT_PERIOD, self.pollExports)
+
+    def pollExports(self) -> None:
+        """Reports the progress of the exports, then schedules itself while some are running.
+        """
+        done, total = sum(batch.done for batch in self.exports), sum(batch.total for batch in self.exports)
+        if done < total:
+            self.status.set(f'Export : {done}/{total}')
+            self.window.after(EXPORT_PERIOD, self.pollExports)
+            return
+        errors = [error for batch in self.exports for error in batch.errors]
+        paths = [path for batch in self.exports for path in batch.paths]
+        self.exports = []
+        if errors:
+            self.status.set(f"Erreur d'export : {errors[0]}")
+        else:
+            self.status.set(f'Export terminé : {len(paths)} fichier(s) dans {os.path.dirname(paths[0]) if paths else SAVES_DIR}')
         
\ No newline at end of file
@@ -0,0 +1,294 @@
+import string
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+
+from FMP import FMP, traces, stackTraces
+from InstrumentPool import InstrumentPool
+from SegmentedScan import SegmentedScan
+from Presets import PRESETS
+from Instrumentation import METRICS
+from SweepBus import SweepBus
+from BandScheduler import Band, BandScheduler, loadBands, orderBands
+from SweepStream import SweepServer, STREAM_PORT
+from Masks import MASKS, LimitMask, MaskChecker, AlarmStream, describeAlarm, loadMasks
+from Writers import CsvWriter, BinaryWriter, NpzWriter
+
+# Period of the sweep rate reports (s)
+REPORT_PERIOD = 5.0
+
+def configure(fmp: FMP, args: argparse.Namespace) -> None:
+    """Applies the settings given on the command line, the others are left unchanged.
+
+    Args:
+        fmp (FMP): The instrument.
+        args (argparse.Namespace): Command line arguments.
+    """
+    with fmp.batch():
+        if args.start is not None:
+            fmp.setStartFreq(args.start)
+        if args.stop is not None:
+            fmp.setStopFreq(args.stop)
+        if args.ref is not None:
+            fmp.setRefLvl(args.ref)
+        if args.scale is not None:
+            fmp.setTraceScale(args.scale)
+        if args.rbw is not None:
+            fmp.setRBW(args.rbw)
+        for nb in args.traces or []:
+            fmp.setTraceTypeClearWrite(nb)
+            fmp.setTraceModeActive(nb)
+        # Every sweep is launched by the acquisition, unless the sweeps of the continuous mode are watched
+        if args.continuous and args.resolution is None:
+            fmp.continuousOn()
+        else:
+            fmp.continuousOff()
+
+def acquire(pool: InstrumentPool, writer, sweeps: int, duration: float, timeout: float, scans: dict = None, continuous: bool = False,
+            mask: LimitMask = None, busName: string = None, server: SweepServer = None) -> tuple[int, float]:
+    """Acquires sweeps from every instrument until the number of sweeps or the duration is reached.
+
+    Every sweep is complete and written once (see FMP.sweeps), the next one is awaited on the
+    instruments while the previous one is being written.
+    The acquisition can be stopped with Ctrl+C.
+
+    Args:
+        pool (InstrumentPool): The instruments.
+        writer: CsvWriter, BinaryWriter or NpzWriter receiving the sweeps, None to write nothing.
+        sweeps (int): Number of sweeps, None for no limit.
+        duration (float): Duration of the acquisition (s), None for no limit.
+        timeout (float): Timeout of a sweep (s).
+        scans (dict): Segmented scan per instrument IP, every sweep is then a whole scan.
+        continuous (bool): Watches the sweeps of the continuous mode instead of launching them.
+        mask (LimitMask): Mask every sweep is tested against, the alarms are printed on the standard error.
+        busName (string): Name of a sweep bus every sweep is published on, for consumers of other processes.
+        server (SweepServer): Server every sweep is published on, for the GUI of other desktops.
+
+    Returns:
+        tuple[int, float]: Number of sweeps acquired per instrument and duration of the acquisition (s).
+    """
+    def stream(fmp: FMP):
+        # Only the active traces are transferred, the first one gives the sweep count in continuous mode
+        active = [nb for nb in traces if fmp.getTraceMode(nb) == '1']
+        return fmp.sweeps(active or traces, continuous, timeout)
+
+    def sweep(fmp: FMP) -> tuple:
+        if scans:
+            scan = scans[fmp.ip]
+            amplitudes = scan.run()
+            return time.time(), scan.frequencies, stackTraces([amplitudes if nb == scan.nb else np.empty(0, dtype=np.float32) for nb in traces])
+        _, amplitudes = next(streams[fmp.ip])
+        return time.time(), fmp.getFrequencies(), amplitudes
+
+    def running(count: int, elapsed: float) -> bool:
+        return (sweeps is None or count < sweeps) and (duration is None or elapsed < duration)
+
+    # The generators run on the thread of their instrument, like every other use of the connection
+    streams = None if scans else pool.fanOut(stream)
+    # One checker and one alarm stream per instrument, their frequency axes can differ
+    checkers = {ip: MaskChecker(mask) for ip in pool.ips} if mask is not None else {}
+    alarms = {ip: AlarmStream() for ip in checkers}
+    # The bus is sized by the first sweeps, the settings do not change during the acquisition
+    bus = None
+    settings = pool.fanOut(lambda fmp: {'rbw': fmp.getRBW(), 'ref': float(fmp.getRefLvl()), 'scale': float(fmp.getTraceScale()),
+                                        'types': {nb: fmp.getTraceType(nb) for nb in traces}}) if server is not None else None
+    count = 0
+    start = time.perf_counter()
+    lastReport, lastCount = start, 0
+    futures = {ip: pool.submit(ip, sweep) for ip in pool.ips} if running(0, 0.0) else None
+    try:
+        while futures is not None:
+            results = {ip: future.result() for ip, future in futures.items()}
+            count += 1
+            now = time.perf_counter()
+            futures = {ip: pool.submit(ip, sweep) for ip in pool.ips} if running(count, now - start) else None
+            if busName is not None and bus is None:
+                bus = SweepBus(len(traces), max(len(frequencies) for _, frequencies, _ in results.values()), name=busName)
+            for ip, (timestamp, frequencies, amplitudes) in results.items():
+                if writer is not None:
+                    writer.write(timestamp, ip, frequencies, amplitudes)
+                if server is not None:
+                    server.publish(frequencies, amplitudes, timestamp, settings[ip], pool.ips.index(ip))
+                if bus is not None:
+                    bus.publish(frequencies, amplitudes, timestamp, {'start': frequencies[0], 'stop': frequencies[-1]}, pool.ips.index(ip))
+                if ip in checkers:
+                    for alarm in alarms[ip].push(checkers[ip].check(frequencies, amplitudes), timestamp):
+                        print(f'{ip} : {describeAlarm(alarm)}', file=sys.stderr)
+            METRICS.count('frames', len(results))
+
+            if now - lastReport >= REPORT_PERIOD:
+                print(f'{count} balayages, {(count - lastCount)/(now - lastReport):.1f} balayages/s' + (f', {server.report()}' if server is not None else ''), file=sys.stderr)
+                lastReport, lastCount = now, count
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if bus is not None:
+            bus.close()
+    for ip, ipAlarms in alarms.items():
+        print(f'{ip} : {ipAlarms.count} alarme(s) {mask.name}', file=sys.stderr)
+    return count, time.perf_counter() - start
+
+def acquireBands(pool: InstrumentPool, writer, bands: list[Band], cycles: int, duration: float, timeout: float, mask: LimitMask = None) -> dict:
+    """Cycles every instrument through a list of bands until the number of cycles or the duration is reached (see BandScheduler).
+
+    Every sweep is written as soon as it is acquired, under the name '<ip> <band>' (one time series per instrument and band).
+    The acquisition can be stopped with Ctrl+C, once the current cycles are complete.
+
+    Args:
+        pool (InstrumentPool): The instruments.
+        writer: CsvWriter, BinaryWriter or NpzWriter receiving the sweeps, None to write nothing.
+        bands (list[Band]): The bands.
+        cycles (int): Number of cycles, None for no limit.
+        duration (float): Duration of the acquisition (s), None for no limit.
+        timeout (float): Timeout of a sweep (s).
+        mask (LimitMask): Mask every sweep is tested against, the alarms are printed on the standard error.
+
+    Returns:
+        dict: BandScheduler per instrument IP, with the revisit intervals and reconfiguration times.
+    """
+    lock = threading.Lock()
+    names = [f'{ip} {band.name}' for ip in pool.ips for band in bands]
+    # One checker and one alarm stream per instrument and band, their frequency axes differ
+    checkers = {name: MaskChecker(mask) for name in names} if mask is not None else {}
+    alarms = {name: AlarmStream() for name in checkers}
+
+    def schedule(fmp: FMP) -> BandScheduler:
+        def write(band: Band, timestamp: float, frequencies: np.ndarray, amplitudes: np.ndarray) -> None:
+            name = f'{fmp.ip} {band.name}'
+            # The instruments run in parallel, the writer is shared
+            with lock:
+                if writer is not None:
+                    writer.write(timestamp, name, frequencies, amplitudes)
+                if name in checkers:
+                    for alarm in alarms[name].push(checkers[name].check(frequencies, amplitudes), timestamp):
+                        print(f'{name} : {describeAlarm(alarm)}', file=sys.stderr)
+            METRICS.count('frames')
+        active = [nb for nb in traces if fmp.getTraceMode(nb) == '1']
+        # Only the statistics of the series are kept, the sweeps are written as they come
+        return BandScheduler(fmp, bands, active or traces, timeout, 0, write)
+
+    schedulers = pool.fanOut(schedule)
+    futures = {ip: pool.submit(ip, lambda fmp: schedulers[fmp.ip].run(cycles, duration)) for ip in pool.ips}
+    try:
+        for future in futures.values():
+            future.result()
+    except KeyboardInterrupt:
+        for scheduler in schedulers.values():
+            scheduler.stop()
+        for future in futures.values():
+            future.result()
+    for name, nameAlarms in alarms.items():
+        print(f'{name} : {nameAlarms.count} alarme(s) {mask.name}', file=sys.stderr)
+    return schedulers
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ScryNet headless acquisition: streams the traces of the analyzers without GUI')
+    parser.add_argument('ips', nargs='+', help='IP addresses of the analyzers')
+    parser.add_argument('--port', type=int, default=9001, help='port of the analyzers')
+    parser.add_argument('--preset', choices=list(PRESETS), help='frequency preset (overridden by --start/--stop)')
+    parser.add_argument('--start', type=float, help='start frequency (GHz)')
+    parser.add_argument('--stop', type=float, help='stop frequency (GHz)')
+    parser.add_argument('--rbw', type=float, help='resolution bandwidth (Hz)')
+    parser.add_argument('--ref', type=float, help='reference level (dB)')
+    parser.add_argument('--scale', type=float, help='amplitude scale (dB/div)')
+    parser.add_argument('--traces', type=int, nargs='+', choices=list(traces), help='traces set to Clear/Write and Active (default: unchanged)')
+    parser.add_argument('--reset', action='store_true', help='blanks every trace once connected')
+    parser.add_argument('--continuous', action='store_true', help='acquires the sweeps of the continuous mode instead of launching single sweeps')
+    parser.add_argument('--bands', nargs='+', choices=list(PRESETS), help='cycles through these preset bands, --sweeps is then the number of cycles')
+    parser.add_argument('--band-file', help='cycles through the bands of a JSON file with their own settings (see BandScheduler.loadBands)')
+    parser.add_argument('--resolution', type=float, help='segmented scan of the span with points spaced by at most this resolution (Hz), on the first of --traces')
+    limit = parser.add_mutually_exclusive_group()
+    limit.add_argument('--sweeps', type=int, help='number of sweeps (default: 1 unless --duration or --serve is given)')
+    limit.add_argument('--duration', type=float, help='duration of the acquisition (s)')
+    parser.add_argument('--format', choices=['csv', 'npz', 'bin'], default='csv', help='output format (npz only with --sweeps)')
+    parser.add_argument('--output', help='output file, - for the standard output (default unless --serve is given)')
+    parser.add_argument('--timeout', type=float, default=10.0, help='timeout of a sweep (s)')
+    parser.add_argument('--mask', help=f'limit mask every sweep is tested against, the alarms are printed on the standard error ({", ".join(MASKS)} or a mask of --mask-file)')
+    parser.add_argument('--mask-file', help='JSON file of limit masks (see Masks.loadMasks)')
+    parser.add_argument('--serve', metavar='[HOST:]PORT', nargs='?', const=str(STREAM_PORT),
+                        help=f'publisher mode: serves the sweeps to the GUI of other desktops (main.py --connect), on localhost:{STREAM_PORT} by default')
+    parser.add_argument('--bus', help='name of a sweep bus every sweep is also published on (see SweepBus.py)')
+    parser.add_argument('--metrics', help='records the SCPI latencies and throughput, and exports them to this file (.json or .csv)')
+    args = parser.parse_args()
+
+    if args.preset is not None:
+        presetStart, presetStop = PRESETS[args.preset]
+        args.start = presetStart if args.start is None else args.start
+        args.stop = presetStop if args.stop is None else args.stop
+    if args.sweeps is None and args.duration is None and args.serve is None:
+        args.sweeps = 1
+    if args.output is None and args.serve is None:
+        args.output = '-'
+    if args.format == 'npz' and args.sweeps is None and args.output is not None:
+        # The archive is only written at the end, its memory would grow for the whole acquisition
+        parser.error('--format npz needs --sweeps, use --format bin or csv for open-ended acquisitions')
+    bands = loadBands(args.band_file) if args.band_file else [Band(name, *PRESETS[name]) for name in args.bands or []]
+    if bands:
+        # The scheduler launches single sweeps of whole bands, and its series do not share a frequency axis
+        unsupported = [option for option, value in (('--continuous', args.continuous), ('--resolution', args.resolution), ('--serve', args.serve), ('--bus', args.bus))
+                       if value not in (None, False)]
+        if unsupported:
+            parser.error(f'--bands and --band-file do not support {", ".join(unsupported)}')
+    masks = {**MASKS, **(loadMasks(args.mask_file) if args.mask_file else {})}
+    if args.mask is not None and args.mask not in masks:
+        parser.error(f'unknown mask: {args.mask} (available: {", ".join(masks)})')
+
+    text = args.format == 'csv'
+    if args.output is None:
+        stream = None
+    elif args.output == '-':
+        stream = sys.stdout if text else sys.stdout.buffer
+    else:
+        stream = open(args.output, 'w' if text else 'wb', newline='' if text else None)
+
+    if args.metrics:
+        METRICS.enable()
+    start = time.perf_counter()
+    pool = InstrumentPool(args.ips, args.port, reset=args.reset)
+    print(f'Connexion : {time.perf_counter() - start:.2f} s', file=sys.stderr)
+    # With bands, every instrument and band has its own time series
+    names = [f'{ip} {band.name}' for ip in pool.ips for band in orderBands(bands)] if bands else pool.ips
+    writer = None if stream is None else CsvWriter(stream) if text else BinaryWriter(stream, names) if args.format == 'bin' else NpzWriter(stream, names)
+    server = None
+    if args.serve is not None:
+        host, _, port = args.serve.rpartition(':')
+        server = SweepServer(host or '127.0.0.1', int(port)).startInThread()
+        print(f'Publication des balayages sur {server.host}:{server.port}', file=sys.stderr)
+    try:
+        pool.fanOut(lambda fmp: configure(fmp, args))
+        if bands:
+            start = time.perf_counter()
+            schedulers = acquireBands(pool, writer, bands, args.sweeps, args.duration, args.timeout,
+                                      masks.get(args.mask) if args.mask is not None else None)
+            # Mean number of sweeps per instrument, over all the bands
+            count, elapsed = sum(scheduler.count for scheduler in schedulers.values())//len(schedulers), time.perf_counter() - start
+            for ip, scheduler in schedulers.items():
+                print(f'{ip} :\n{scheduler.report()}', file=sys.stderr)
+        else:
+            scans = None
+            if args.resolution is not None:
+                nb = args.traces[0] if args.traces else 1
+                scans = pool.fanOut(lambda fmp: SegmentedScan(fmp, fmp.getStartFreq(), fmp.getStopFreq(), args.resolution, nb, args.timeout))
+            count, elapsed = acquire(pool, writer, args.sweeps, args.duration, args.timeout, scans, args.continuous,
+                                     masks.get(args.mask) if args.mask is not None else None, args.bus, server)
+            for ip, scan in (scans or {}).items():
+                print(f'{ip} : {scan.report()}', file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+        if stream not in (None, sys.stdout, sys.stdout.buffer):
+            stream.close()
+        if server is not None:
+            server.stop()
+        pool.fanOut(FMP.continuousOn)
+        pool.close()
+        if args.metrics:
+            METRICS.export(args.metrics)
+
+    if count:
+        print(f'{count} balayages en {elapsed:.2f} s : {count/elapsed:.1f} balayages/s par instrument', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable
+import numpy as np
+
+from FMP import FMP
+
+class Acquisition:
+    """Traces acquired from every instrument of a pool during the same acquisition.
+    """
+    def __init__(self, timestamp: float) -> None:
+        """Constructor.
+
+        Args:
+            timestamp (float): Time (time.time) at which the acquisition was launched on every instrument.
+        """
+        self.timestamp = timestamp
+        # Per instrument IP: time at the middle of the transfer, frequency axis (GHz) and (trace, point) matrix
+        self.times = {}
+        self.frequencies = {}
+        self.traces = {}
+        # Per instrument IP: exception raised during the acquisition
+        self.errors = {}
+
+    @property
+    def skew(self) -> float:
+        """Spread between the instruments acquisition times.
+
+        Returns:
+            float: Skew (s).
+        """
+        return max(self.times.values()) - min(self.times.values()) if self.times else 0.0
+
+    def stacked(self) -> np.ndarray:
+        """Stacks the traces of every instrument.
+
+        Returns:
+            np.ndarray: (instrument, trace, point) float32 matrix, in the order of self.traces.
+        """
+        return np.stack(list(self.traces.values()))
+
+class InstrumentPool:
+    """Holds one persistent FMP connection per analyzer and fans commands out to all of them.
+
+    Each instrument has its own single worker thread so that the commands sent to an
+    instrument are serialized while every instrument runs in parallel. The connection is
+    the first task of a worker: commands submitted while it is in progress wait for it.
+    """
+    def __init__(self, ipAddrs: list[string], port: int = 9001, wait: bool = True, factory: Callable[..., FMP] = FMP, **kwargs) -> None:
+        """Constructor, connects to every instrument in parallel.
+
+        Args:
+            ipAddrs (list[string]): IP Addresses of the analyzers.
+            port (int): port of the analyzers (9001 for Anritsu)
+            wait (bool): waits for the connections, otherwise they go on in the background (see connection).
+            factory (Callable[..., FMP]): Connection class, called with the IP address, the port and kwargs
+                (e.g. SweepStream.StreamInstrument to follow the instruments of a sweep server).
+            **kwargs: Other FMP constructor arguments.
+        """
+        self.port = port
+        self.factory = factory
+        self.kwargs = kwargs
+        # Future of the FMP connection per instrument IP
+        self.connections = {}
+        self.workers = {}
+        for ip in ipAddrs:
+            self.connections[ip] = self._open(ip)
+        if wait:
+            for future in self.connections.values():
+                future.result()
+
+    def _open(self, ipAddr: string) -> Future:
+        """Starts the worker of an instrument and connects to it.
+
+        Args:
+            ipAddr (string): IP Address of the analyzer.
+
+        Returns:
+            Future: Future of the FMP connection.
+        """
+        self.workers[ipAddr] = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'FMP-{ipAddr}')
+        return self.workers[ipAddr].submit(self.factory, ipAddr, self.port, **self.kwargs)
+
+    @property
+    def ips(self) -> list[string]:
+        """IP Addresses of the instruments in the pool.
+        """
+        return list(self.connections)
+
+    def __getitem__(self, ipAddr: string) -> FMP:
+        return self.connections[ipAddr].result()
+
+    def __len__(self) -> int:
+        return len(self.connections)
+
+    def connection(self, ipAddr: string) -> Future:
+        """Gives the connection of an instrument without waiting for it.
+
+        Args:
+            ipAddr (string): IP Address of the analyzer.
+
+        Returns:
+            Future: Future of the FMP connection.
+        """
+        return self.connections[ipAddr]
+
+    def add(self, ipAddr: string) -> FMP:
+        """Connects a new instrument, or returns the existing connection.
+
+        Args:
+            ipAddr (string): IP Address of the analyzer.
+
+        Returns:
+            FMP: The instrument connection.
+        """
+        if ipAddr not in self.connections:
+            self.connections[ipAddr] = self._open(ipAddr)
+        return self[ipAddr]
+
+    def remove(self, ipAddr: string) -> None:
+        """Disconnects an instrument.
+
+        Args:
+            ipAddr (string): IP Address of the analyzer.
+        """
+        connection = self.connections.pop(ipAddr)
+        worker = self.workers.pop(ipAddr)
+        worker.submit(lambda: connection.result().close())
+        worker.shutdown()
+
+    def close(self) -> None:
+        """Disconnects every instrument.
+        """
+        for ip in self.ips:
+            self.remove(ip)
+
+    def submit(self, ipAddr: string, func: Callable[[FMP], object]) -> Future:
+        """Runs a function on the worker of an instrument.
+
+        Args:
+            ipAddr (string): IP Address of the analyzer.
+            func (Callable[[FMP], object]): Function called with the instrument connection.
+
+        Returns:
+            Future: Future of the function result (its exception if the connection failed).
+        """
+        connection = self.connections[ipAddr]
+        # The connection is done when the worker gets to the function
+        return self.workers[ipAddr].submit(lambda: func(connection.result()))
+
+    def fanOut(self, func: Callable[[FMP], object]) -> dict:
+        """Runs a function on every instrument at once and waits for all of them.
+
+        Args:
+            func (Callable[[FMP], object]): Function called with each instrument connection.
+
+        Returns:
+            dict: Result per instrument IP.
+        """
+        futures = {ip: self.submit(ip, func) for ip in self.ips}
+        return {ip: future.result() for ip, future in futures.items()}
+
+    def setParam(self, startFreq: float, stopFreq: float, gainRef: float, gainScale: float, rbw: float) -> None:
+        """Sets the main parameters of every instrument (see FMP.setParam).
+        """
+        self.fanOut(lambda fmp: fmp.setParam(startFreq, stopFreq, gainRef, gainScale, rbw))
+
+    def sweepLaunch(self) -> None:
+        """Starts a measurement sweep on every instrument.
+        """
+        self.fanOut(FMP.sweepLaunch)
+
+    def continuousOn(self) -> None:
+        """Turns on continuous sweep mode on every instrument.
+        """
+        self.fanOut(FMP.continuousOn)
+
+    def continuousOff(self) -> None:
+        """Turns off continuous sweep mode on every instrument.
+        """
+        self.fanOut(FMP.continuousOff)
+
+    def abort(self) -> None:
+        """Aborts any sweep in progress on every instrument.
+        """
+        self.fanOut(FMP.abort)
+
+    def getTraces(self) -> Acquisition:
+        """Acquires the traces of every instrument at once.
+
+        An instrument that fails is reported in Acquisition.errors instead of failing the whole acquisition.
+
+        Returns:
+            Acquisition: The traces and frequency axes of every instrument.
+        """
+        def acquire(fmp: FMP) -> tuple:
+            frequencies = fmp.getFrequencies()
+            start = time.time()
+            amplitudes = fmp.getTraces()
+            return (start + time.time())/2, frequencies, amplitudes
+
+        acquisition = Acquisition(time.time())
+        futures = {ip: self.submit(ip, acquire) for ip in self.ips}
+        for ip, future in futures.items():
+            try:
+                acquisition.times[ip], acquisition.frequencies[ip], acquisition.traces[ip] = future.result()
+            except (OSError, ValueError) as error:
+                acquisition.errors[ip] = error
+        return acquisition
@@ -0,0 +1,271 @@
+import string
+import csv
+import json
+import time
+import bisect
+import threading
+from contextlib import nullcontext
+import numpy as np
+
+# Upper bounds of the histogram buckets (s): 10 buckets per decade from 10 µs to 100 s, the last bucket is unbounded
+BUCKETS = (10.0**(np.arange(-50, 21)/10)).tolist()
+
+# Context manager returned by Metrics.span when the instrumentation is disabled
+DISABLED_SPAN = nullcontext()
+
+def commandKey(command: string) -> string:
+    """Gives the name under which the latency of a command line is recorded.
+
+    The queries of the line are kept without their arguments and numeric suffixes,
+    so that e.g. 'TRACe2:SWEep:COUNt?' and 'TRACe5:SWEep:COUNt?' share a histogram.
+
+    Args:
+        command (string): Command line sent to the instrument.
+
+    Returns:
+        string: Name of the command.
+    """
+    queries = [part.strip().lstrip(':').split(' ')[0] for part in command.split(';') if '?' in part]
+    return ';'.join(''.join(char for char in query if not char.isdigit()).upper() for query in queries or [command.split(' ')[0]])
+
+class Histogram:
+    """Histogram of durations with logarithmic buckets (see BUCKETS), in constant memory.
+    """
+    def __init__(self) -> None:
+        """Constructor.
+        """
+        self.counts = [0]*(len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration: float) -> None:
+        """Records a duration.
+
+        Args:
+            duration (float): The duration (s).
+        """
+        self.counts[bisect.bisect_left(BUCKETS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    def percentile(self, percentile: float) -> float:
+        """Estimates a percentile of the durations, to the upper bound of its bucket.
+
+        Args:
+            percentile (float): The percentile (0 to 100).
+
+        Returns:
+            float: The duration (s), NaN if nothing has been recorded.
+        """
+        if not self.count:
+            return float('nan')
+        rank = np.searchsorted(np.cumsum(self.counts), percentile/100*self.count)
+        return min(BUCKETS[rank] if rank < len(BUCKETS) else self.max, self.max)
+
+    def summary(self) -> dict:
+        """Summarizes the durations.
+
+        Returns:
+            dict: 'count', then 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms' and 'max_ms' (ms).
+        """
+        return {
+            'count': self.count,
+            'mean_ms': self.total/self.count*1e3 if self.count else float('nan'),
+            'p50_ms': self.percentile(50)*1e3,
+            'p95_ms': self.percentile(95)*1e3,
+            'p99_ms': self.percentile(99)*1e3,
+            'max_ms': self.max*1e3,
+        }
+
+class Span:
+    """Context manager timing a block into a histogram.
+    """
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: string) -> None:
+        """Constructor.
+
+        Args:
+            metrics (Metrics): Instrumentation recording the duration.
+            name (string): Name of the span (e.g. parse, plot).
+        """
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self) -> 'Span':
+        """Starts the timing.
+
+        Returns:
+            Span: The span.
+        """
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception) -> None:
+        """Records the duration of the block, even when it raised.
+
+        Args:
+            *exception: Exception raised by the block, if any.
+        """
+        self.metrics.record('spans', self.name, time.perf_counter() - self.start)
+
+class Metrics:
+    """Instrumentation of the hot paths: latency of the SCPI commands, bytes exchanged with the
+    instruments, timing spans (parse, plot, draw...) and counters (sweeps, frames, dropped frames).
+
+    Every recording method is a no-op when the instrumentation is disabled, and the callers of the
+    hot paths check enabled first, so that the disabled instrumentation costs a single attribute test.
+    The recordings can come from any thread.
+    """
+    def __init__(self, enabled: bool = False) -> None:
+        """Constructor.
+
+        Args:
+            enabled (bool): Records from the start.
+        """
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.reset()
+
+    def enable(self, enabled: bool = True) -> None:
+        """Starts or stops the recording, the recorded values are kept.
+
+        Args:
+            enabled (bool): Records from now on.
+        """
+        if enabled and not self.enabled:
+            with self.lock:
+                # The rates are computed over the time spent recording
+                self.resumed = time.perf_counter()
+        elif not enabled and self.enabled:
+            with self.lock:
+                self.recorded += time.perf_counter() - self.resumed
+        self.enabled = enabled
+
+    def reset(self) -> None:
+        """Clears every recorded value.
+        """
+        with self.lock:
+            self.histograms = {'commands': {}, 'spans': {}}
+            self.counters = {}
+            self.recorded = 0.0
+            self.resumed = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """Gives the time spent recording since the last reset.
+
+        Returns:
+            float: Duration (s).
+        """
+        return self.recorded + (time.perf_counter() - self.resumed if self.enabled else 0.0)
+
+    def record(self, kind: string, name: string, duration: float) -> None:
+        """Adds a duration to a histogram.
+
+        Args:
+            kind (string): 'commands' or 'spans'.
+            name (string): Name of the command or span.
+            duration (float): The duration (s).
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            histograms = self.histograms[kind]
+            if name not in histograms:
+                histograms[name] = Histogram()
+            histograms[name].add(duration)
+
+    def latency(self, command: string, duration: float) -> None:
+        """Records the round trip of a command line (see commandKey).
+
+        Args:
+            command (string): Command line sent to the instrument.
+            duration (float): Time between the command and the end of its response (s).
+        """
+        self.record('commands', commandKey(command), duration)
+
+    def count(self, name: string, increment: int = 1) -> None:
+        """Increments a counter.
+
+        Args:
+            name (string): Name of the counter (e.g. 'sweeps', 'bytes_sent').
+            increment (int): Increment.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + increment
+
+    def span(self, name: string):
+        """Times a block: `with METRICS.span('draw'): ...`.
+
+        Args:
+            name (string): Name of the span.
+
+        Returns:
+            Context manager recording the duration of the block, a shared no-op one when disabled.
+        """
+        return Span(self, name) if self.enabled else DISABLED_SPAN
+
+    def snapshot(self) -> dict:
+        """Gives every recorded value.
+
+        Returns:
+            dict: 'time' (time.time), 'elapsed' (s), 'commands' and 'spans' (histogram summary per name,
+                see Histogram.summary) and 'counters' ({'count', 'per_s'} per name).
+        """
+        elapsed = self.elapsed()
+        with self.lock:
+            return {
+                'time': time.time(),
+                'elapsed': elapsed,
+                'commands': {name: histogram.summary() for name, histogram in sorted(self.histograms['commands'].items())},
+                'spans': {name: histogram.summary() for name, histogram in sorted(self.histograms['spans'].items())},
+                'counters': {name: {'count': count, 'per_s': count/elapsed if elapsed > 0 else 0.0} for name, count in sorted(self.counters.items())},
+            }
+
+    def export(self, path: string) -> None:
+        """Writes a snapshot to a file, as CSV if its name ends with '.csv' and as JSON otherwise.
+
+        The CSV has one row per command, span and counter: kind, name, count, per_s, then the durations (ms).
+
+        Args:
+            path (string): The file.
+        """
+        snapshot = self.snapshot()
+        if not path.lower().endswith('.csv'):
+            with open(path, 'w') as file:
+                json.dump(snapshot, file, indent=2)
+            return
+        columns = ['kind', 'name', 'count', 'per_s', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, columns, restval='')
+            writer.writeheader()
+            for kind in ('commands', 'spans', 'counters'):
+                for name, values in snapshot[kind].items():
+                    writer.writerow({'kind': kind, 'name': name, **values})
+
+    def status(self) -> string:
+        """Summarizes the main values for a status bar.
+
+        Returns:
+            string: Sweep and frame rates, dropped frames, throughput, command taking the most time and mean of the spans.
+        """
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        def rate(name: string) -> float:
+            return counters.get(name, {}).get('per_s', 0.0)
+        parts = [f'{rate("sweeps"):.1f} balayages/s', f'{rate("frames"):.1f} images/s',
+                 f'{counters.get("dropped_frames", {}).get("count", 0)} images perdues',
+                 f'{(rate("bytes_received") + rate("bytes_sent"))/1e3:.0f} ko/s']
+        commands = snapshot['commands']
+        if commands:
+            name, summary = max(commands.items(), key=lambda item: item[1]['mean_ms']*item[1]['count'])
+            parts.append(f'{name} {summary["mean_ms"]:.1f} ms (p95 {summary["p95_ms"]:.1f})')
+        parts += [f'{name} {summary["mean_ms"]:.2f} ms' for name, summary in snapshot['spans'].items()]
+        return ' - '.join(parts)
+
+# Instrumentation shared by the whole application, disabled by default
+METRICS = Metrics()
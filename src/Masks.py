@@ -0,0 +1,187 @@
+import string
+import json
+import time
+from collections import deque
+import numpy as np
+
+from FMP import traces
+
+# Minimum time between two alarms of the same trace (s), the violations in between are only counted
+ALARM_PERIOD = 5.0
+
+class LimitMask:
+    """Upper and/or lower limit lines, piecewise linear between their vertices.
+
+    There is no limit outside the frequency range of a line. A step is made of two vertices at the same frequency.
+    """
+    def __init__(self, name: string, upper: list[tuple[float, float]] = None, lower: list[tuple[float, float]] = None) -> None:
+        """Constructor.
+
+        Args:
+            name (string): Name of the mask.
+            upper (list[tuple[float, float]]): (frequency (GHz), level (dBm)) vertices of the upper limit, by increasing frequency.
+            lower (list[tuple[float, float]]): (frequency (GHz), level (dBm)) vertices of the lower limit, by increasing frequency.
+        """
+        self.name = name
+        self.upper = np.array(upper or [], dtype=np.float64).reshape(-1, 2)
+        self.lower = np.array(lower or [], dtype=np.float64).reshape(-1, 2)
+
+    def interpolate(self, frequencies: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Computes the limits at every point of a frequency axis.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz).
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Upper and lower limits (dBm), +inf and -inf where there is no limit.
+        """
+        def line(vertices: np.ndarray, unlimited: float) -> np.ndarray:
+            if not len(vertices):
+                return np.full(len(frequencies), unlimited)
+            return np.interp(frequencies, vertices[:, 0], vertices[:, 1], left=unlimited, right=unlimited)
+        return line(self.upper, np.inf), line(self.lower, -np.inf)
+
+def loadMasks(path: string) -> dict:
+    """Reads masks from a JSON file: {"name": {"upper": [[GHz, dBm], ...], "lower": [[GHz, dBm], ...]}, ...}.
+
+    Args:
+        path (string): The file.
+
+    Returns:
+        dict: LimitMask per name.
+    """
+    with open(path) as file:
+        definitions = json.load(file)
+    return {name: LimitMask(name, definition.get('upper'), definition.get('lower')) for name, definition in definitions.items()}
+
+# Example emission masks of the preset bands (a limit in the band, a lower one just outside of it),
+# to be replaced by the limits of the measurement with loadMasks
+MASKS = {
+    'WiFi 2': LimitMask('WiFi 2', upper=[(2.350, -50), (2.400, -50), (2.400, -20), (2.4835, -20), (2.4835, -50), (2.550, -50)]),
+    'WiFi 5': LimitMask('WiFi 5', upper=[(5.100, -50), (5.150, -50), (5.150, -20), (5.850, -20), (5.850, -50), (5.900, -50)]),
+    'WiFi 6E': LimitMask('WiFi 6E', upper=[(5.875, -50), (5.925, -50), (5.925, -20), (6.425, -20), (6.425, -50), (6.475, -50)]),
+}
+
+class MaskResult:
+    """Outcome of the test of a sweep against a mask.
+    """
+    def __init__(self, mask: LimitMask, frequencies: np.ndarray, upper: np.ndarray, lower: np.ndarray, margins: np.ndarray) -> None:
+        """Constructor, summarizes the margins.
+
+        Args:
+            mask (LimitMask): The mask.
+            frequencies (np.ndarray): Frequency axis (GHz).
+            upper (np.ndarray): Upper limit at every point (dBm).
+            lower (np.ndarray): Lower limit at every point (dBm).
+            margins (np.ndarray): (trace, point) distance to the nearest limit (dB), negative when it is violated.
+        """
+        self.mask = mask
+        self.frequencies = frequencies
+        self.upper = upper
+        self.lower = lower
+        with np.errstate(invalid='ignore'):
+            violations = margins < 0
+        # Per trace: number of points violating the mask, worst margin (inf without data) and its frequency
+        self.counts = violations.sum(axis=-1)
+        filled = np.where(np.isnan(margins), np.inf, margins)
+        points = filled.argmin(axis=-1)
+        self.margins = filled[np.arange(len(filled)), points]
+        self.worstFrequencies = np.where(np.isfinite(self.margins), frequencies[points], np.nan) if len(frequencies) else np.full(len(points), np.nan)
+
+        # Ranges of consecutive violating points of any trace, [start, stop] (GHz)
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], violations.any(axis=0), [0])).astype(np.int8)))
+        self.regions = np.column_stack((frequencies[edges[0::2]], frequencies[edges[1::2] - 1])) if len(edges) else np.empty((0, 2))
+
+    @property
+    def violated(self) -> bool:
+        return bool(self.counts.any())
+
+class MaskChecker:
+    """Tests sweeps against a mask, the limits are interpolated once per frequency axis.
+    """
+    def __init__(self, mask: LimitMask) -> None:
+        """Constructor.
+
+        Args:
+            mask (LimitMask): The mask.
+        """
+        self.mask = mask
+        # (start, stop, points) of the axis the limits are interpolated on, and the (point,) limits
+        self.key = None
+        self.upper = None
+        self.lower = None
+
+    def check(self, frequencies: np.ndarray, amplitudes: np.ndarray) -> MaskResult:
+        """Tests every trace of a sweep at once.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz).
+            amplitudes (np.ndarray): Trace or (trace, point) matrix given by FMP.getTraces (dBm), missing traces are NaN.
+
+        Returns:
+            MaskResult: Violations, worst margins and violating ranges.
+        """
+        key = (frequencies[0], frequencies[-1], len(frequencies)) if len(frequencies) else None
+        if key != self.key:
+            self.key = key
+            self.upper, self.lower = self.mask.interpolate(frequencies)
+        amplitudes = np.atleast_2d(amplitudes)
+        with np.errstate(invalid='ignore'):
+            margins = np.fmin(self.upper - amplitudes, amplitudes - self.lower)
+        return MaskResult(self.mask, frequencies, self.upper, self.lower, margins)
+
+class AlarmStream:
+    """Rate-limited alarms of the mask violations: at most one alarm per trace every period,
+    the violations in between are counted in the next alarm.
+    """
+    def __init__(self, period: float = ALARM_PERIOD, length: int = 100) -> None:
+        """Constructor.
+
+        Args:
+            period (float): Minimum time between two alarms of the same trace (s).
+            length (int): Number of alarms kept.
+        """
+        self.period = period
+        self.alarms = deque(maxlen=length)
+        self.last = {}
+        self.suppressed = {}
+        self.count = 0
+
+    def push(self, result: MaskResult, timestamp: float = None) -> list[dict]:
+        """Raises the alarms of a test.
+
+        Args:
+            result (MaskResult): The test of a sweep.
+            timestamp (float): Time of the sweep (time.time), now by default.
+
+        Returns:
+            list[dict]: The new alarms: 'time', 'mask', 'trace', 'margin' (dB), 'frequency' (GHz) and 'suppressed'
+                (violations of the trace since its previous alarm).
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        alarms = []
+        for row in np.flatnonzero(result.counts):
+            nb = traces[row] if len(result.counts) == len(traces) else int(row) + 1
+            if timestamp - self.last.get(nb, -np.inf) < self.period:
+                self.suppressed[nb] = self.suppressed.get(nb, 0) + 1
+                continue
+            alarms.append({'time': timestamp, 'mask': result.mask.name, 'trace': nb, 'margin': float(result.margins[row]),
+                           'frequency': float(result.worstFrequencies[row]), 'suppressed': self.suppressed.pop(nb, 0)})
+            self.last[nb] = timestamp
+        self.alarms.extend(alarms)
+        self.count += len(alarms)
+        return alarms
+
+def describeAlarm(alarm: dict) -> string:
+    """Formats an alarm for display.
+
+    Args:
+        alarm (dict): Alarm given by AlarmStream.push.
+
+    Returns:
+        string: Description of the alarm.
+    """
+    text = f'{time.strftime("%H:%M:%S", time.localtime(alarm["time"]))} {alarm["mask"]} : trace {alarm["trace"]} dépasse de {-alarm["margin"]:.1f} dB à {alarm["frequency"]:.4f} GHz'
+    if alarm['suppressed']:
+        text += f' (+{alarm["suppressed"]} dépassements)'
+    return text
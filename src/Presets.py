@@ -0,0 +1,8 @@
+# Frequency presets shared by the GUI and the headless acquisition: name -> (start, stop) in GHz
+PRESETS = {
+    'WiFi 2': (2.4, 2.5),
+    'WiFi 5': (5.170, 5.730),
+    'WiFi 6E': (5.925, 6.425),
+    'Preset 4': (0, 9),
+    'Preset 5': (0, 9),
+}
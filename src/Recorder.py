@@ -0,0 +1,217 @@
+import string
+import os
+import json
+import time
+import numpy as np
+
+# Settings recorded with every sweep
+INDEX_DTYPE = np.dtype([('time', '<f8'), ('start', '<f8'), ('stop', '<f8'), ('rbw', '<f8')])
+
+# Quantization step of the int16 format (dB) and value of the points without data
+INT16_STEP = 0.01
+INT16_MISSING = np.iinfo(np.int16).min
+
+# Number of sweeps appended between two flushes of the session files
+FLUSH_INTERVAL = 256
+
+def sessionFiles(path: string) -> tuple[string, string, string]:
+    """Gives the files of a session.
+
+    Args:
+        path (string): Session directory.
+
+    Returns:
+        tuple[string, string, string]: Header, amplitudes and index files.
+    """
+    return os.path.join(path, 'session.json'), os.path.join(path, 'sweeps.bin'), os.path.join(path, 'index.bin')
+
+def resize(file: string, size: int) -> None:
+    """Resizes a file.
+
+    Args:
+        file (string): Path of the file.
+        size (int): New size (bytes).
+    """
+    with open(file, 'r+b') as handle:
+        handle.truncate(size)
+
+class SweepRecorder:
+    """Appends sweeps to an on-disk session.
+
+    The amplitudes are stored in a preallocated memory-mapped (sweep, trace, point) array
+    whose capacity doubles when it is full, so recording keeps a bounded memory footprint.
+    """
+    def __init__(self, path: string, traces: int, points: int, dtype: string = 'float32', capacity: int = 1024) -> None:
+        """Constructor, creates the session.
+
+        Args:
+            path (string): Session directory (created).
+            traces (int): Number of traces per sweep.
+            points (int): Number of points per trace.
+            dtype (string): Storage format, 'float32' or 'int16' (quantized to INT16_STEP dB).
+            capacity (int): Number of sweeps preallocated.
+        """
+        if dtype not in ('float32', 'int16'):
+            raise ValueError(f'Unsupported session format {dtype}')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.traces = traces
+        self.points = points
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.count = 0
+        self.headerFile, self.dataFile, self.indexFile = sessionFiles(path)
+
+        self.data = np.memmap(self.dataFile, dtype=self.dtype, mode='w+', shape=(capacity, traces, points))
+        self.index = np.memmap(self.indexFile, dtype=INDEX_DTYPE, mode='w+', shape=(capacity,))
+        self.writeHeader()
+
+    def writeHeader(self) -> None:
+        """Writes the session header.
+        """
+        header = {'traces': self.traces, 'points': self.points, 'dtype': self.dtype.name, 'step': INT16_STEP, 'count': self.count}
+        with open(self.headerFile, 'w') as file:
+            json.dump(header, file)
+
+    def grow(self) -> None:
+        """Doubles the capacity of the session.
+        """
+        self.flush()
+        del self.data, self.index
+        self.capacity *= 2
+        resize(self.dataFile, self.capacity*self.traces*self.points*self.dtype.itemsize)
+        resize(self.indexFile, self.capacity*INDEX_DTYPE.itemsize)
+        self.data = np.memmap(self.dataFile, dtype=self.dtype, mode='r+', shape=(self.capacity, self.traces, self.points))
+        self.index = np.memmap(self.indexFile, dtype=INDEX_DTYPE, mode='r+', shape=(self.capacity,))
+
+    def append(self, amplitudes: np.ndarray, start: float, stop: float, rbw: float, timestamp: float = None) -> None:
+        """Appends a sweep.
+
+        Args:
+            amplitudes (np.ndarray): (trace, point) matrix given by FMP.getTraces.
+            start (float): Start frequency (GHz).
+            stop (float): Stop frequency (GHz).
+            rbw (float): Resolution bandwidth (Hz).
+            timestamp (float): Time of the sweep (time.time), now by default.
+
+        Raises:
+            ValueError: The sweep shape does not match the session (e.g. the point number changed).
+        """
+        if amplitudes.shape != (self.traces, self.points):
+            raise ValueError(f'Sweep of shape {amplitudes.shape} recorded in a {(self.traces, self.points)} session')
+        if self.count == self.capacity:
+            self.grow()
+        if self.dtype == np.int16:
+            quantized = np.round(amplitudes/INT16_STEP)
+            self.data[self.count] = np.where(np.isnan(quantized), INT16_MISSING, quantized)
+        else:
+            self.data[self.count] = amplitudes
+        self.index[self.count] = (time.time() if timestamp is None else timestamp, start, stop, rbw)
+        self.count += 1
+        if self.count % FLUSH_INTERVAL == 0:
+            self.flush()
+
+    def discardLast(self) -> None:
+        """Drops the last appended sweep, its place is taken by the next one.
+        """
+        self.count = max(self.count - 1, 0)
+
+    def flush(self) -> None:
+        """Writes the recorded sweeps to disk.
+        """
+        self.data.flush()
+        self.index.flush()
+        self.writeHeader()
+
+    def close(self) -> None:
+        """Closes the session, the files are truncated to the recorded sweeps.
+        """
+        self.flush()
+        del self.data, self.index
+        resize(self.dataFile, self.count*self.traces*self.points*self.dtype.itemsize)
+        resize(self.indexFile, self.count*INDEX_DTYPE.itemsize)
+
+class SweepSession:
+    """Read-only access to a recorded session for playback.
+
+    The files are memory-mapped: only the sweeps that are accessed are read from disk.
+    """
+    def __init__(self, path: string) -> None:
+        """Constructor, opens the session.
+
+        Args:
+            path (string): Session directory.
+        """
+        self.path = path
+        headerFile, dataFile, indexFile = sessionFiles(path)
+        with open(headerFile) as file:
+            header = json.load(file)
+        self.traces = header['traces']
+        self.points = header['points']
+        self.dtype = np.dtype(header['dtype'])
+        self.step = header['step']
+        self.count = header['count']
+        if self.count:
+            self.data = np.memmap(dataFile, dtype=self.dtype, mode='r', shape=(self.count, self.traces, self.points))
+            self.index = np.memmap(indexFile, dtype=INDEX_DTYPE, mode='r', shape=(self.count,))
+        else:
+            self.data = np.empty((0, self.traces, self.points), dtype=self.dtype)
+            self.index = np.empty(0, dtype=INDEX_DTYPE)
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def times(self) -> np.ndarray:
+        """Times (time.time) of the sweeps.
+        """
+        return self.index['time']
+
+    def sweep(self, i: int) -> np.ndarray:
+        """Reads a sweep.
+
+        Args:
+            i (int): Sweep number.
+
+        Returns:
+            np.ndarray: (trace, point) float32 matrix, NaN where there is no data.
+        """
+        data = self.data[i]
+        if self.dtype == np.int16:
+            return np.where(data == INT16_MISSING, np.nan, data*np.float32(self.step)).astype(np.float32)
+        return np.array(data)
+
+    def settings(self, i: int) -> dict:
+        """Reads the instrument settings of a sweep.
+
+        Args:
+            i (int): Sweep number.
+
+        Returns:
+            dict: Time, start and stop frequencies (GHz) and resolution bandwidth (Hz).
+        """
+        entry = self.index[i]
+        return {name: float(entry[name]) for name in INDEX_DTYPE.names}
+
+    def frequencies(self, i: int) -> np.ndarray:
+        """Gives the frequency axis of a sweep.
+
+        Args:
+            i (int): Sweep number.
+
+        Returns:
+            np.ndarray: Frequencies (GHz) of the points.
+        """
+        entry = self.index[i]
+        return np.linspace(entry['start'], entry['stop'], self.points)
+
+    def seek(self, timestamp: float) -> int:
+        """Finds the sweep recorded at a given time (binary search on the index).
+
+        Args:
+            timestamp (float): Time (time.time).
+
+        Returns:
+            int: Number of the last sweep recorded before or at that time.
+        """
+        return max(0, int(np.searchsorted(self.times, timestamp, side='right')) - 1)
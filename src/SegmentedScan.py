@@ -0,0 +1,142 @@
+import string
+import time
+from collections import deque
+import numpy as np
+
+from FMP import FMP, decodeTrace
+
+def planSegments(startFreq: float, stopFreq: float, resolution: float, points: int) -> tuple[list[tuple[float, float]], np.ndarray]:
+    """Splits a span into segments whose points lie on a common grid spaced by at most the resolution.
+
+    Consecutive segments share their boundary point, so that the stitched trace is exactly the grid.
+
+    Args:
+        startFreq (float): Start frequency of the span (GHz).
+        stopFreq (float): Stop frequency of the span (GHz).
+        resolution (float): Maximum spacing of the points (Hz).
+        points (int): Number of points of a trace.
+
+    Returns:
+        tuple[list[tuple[float, float]], np.ndarray]: (start, stop) of every segment (GHz) and frequency grid of the span (GHz).
+    """
+    count = max(1, int(np.ceil((stopFreq - startFreq)*1e9/(resolution*(points - 1)))))
+    frequencies = np.linspace(startFreq, stopFreq, count*(points - 1) + 1)
+    bounds = frequencies[::points - 1]
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist())), frequencies
+
+class SegmentedScan:
+    """Wideband scan acquiring a span in several segments with the resolution of a single trace each.
+
+    The acquisition is pipelined on the connection: the transfer request of a segment, the
+    settings of the next segment and its sweep are sent together, so that the instrument
+    sweeps the next segment while the current one is being transferred and decoded.
+    """
+    def __init__(self, fmp: FMP, startFreq: float, stopFreq: float, resolution: float = None, nb: int = 1, timeout: float = None) -> None:
+        """Constructor, plans the segments.
+
+        Args:
+            fmp (FMP): The instrument.
+            startFreq (float): Start frequency of the span (GHz).
+            stopFreq (float): Stop frequency of the span (GHz).
+            resolution (float): Maximum spacing of the points (Hz), the resolution bandwidth by default.
+            nb (int): Number of the trace acquired (it should be Active and Clear/Write).
+            timeout (float): Timeout of the sweep of a segment (s), defaults to the instrument timeout.
+        """
+        self.fmp = fmp
+        self.nb = nb
+        self.timeout = timeout
+        self.points = fmp.getPointNumber()
+        self.resolution = fmp.getRBW() if resolution is None else resolution
+        self.segments, self.frequencies = planSegments(startFreq, stopFreq, self.resolution, self.points)
+
+        # Duration of the acquisition of every segment and of the whole scan (s), set by run
+        self.segmentTimes = []
+        self.totalTime = 0.0
+
+    def __len__(self) -> int:
+        return len(self.segments)
+
+    def configure(self, segment: tuple[float, float]) -> None:
+        """Sends the span of a segment and starts its sweep, without waiting.
+
+        Args:
+            segment (tuple[float, float]): (start, stop) of the segment (GHz).
+        """
+        with self.fmp.batch(sync=False):
+            self.fmp.setStartFreq(segment[0])
+            self.fmp.setStopFreq(segment[1])
+            self.fmp.sweepLaunch()
+        self.fmp.write('*OPC?')
+
+    def run(self) -> np.ndarray:
+        """Acquires every segment and stitches them.
+
+        The span and the sweep mode of the instrument are restored afterwards, even after an error. In single
+        sweep mode the trace then still holds the last segment until the next sweep.
+
+        Returns:
+            np.ndarray: Amplitudes (dB) on the frequency grid of the scan (self.frequencies).
+
+        Raises:
+            ValueError: The instrument returned a trace without the expected number of points.
+        """
+        fmp = self.fmp
+        amplitudes = np.empty(len(self.frequencies), dtype=np.float32)
+        self.segmentTimes = []
+        start = time.perf_counter()
+
+        span, continuous = (fmp.getStartFreq(), fmp.getStopFreq()), fmp.isContinuous()
+        # Kind (True for a block) of the responses requested and not read yet, in order
+        unread = deque()
+        def read(block: bool) -> bytes:
+            # A read that times out is discarded by FMP itself, it is no longer unread here
+            unread.popleft()
+            return fmp.readBlock(self.timeout) if block else fmp.readLine(self.timeout)
+
+        try:
+            fmp.continuousOff()
+            self.configure(self.segments[0])
+            unread.append(False)
+            read(False)
+            segmentStart = start
+            for i, segment in enumerate(self.segments):
+                # The transfer is requested before the next segment changes the span
+                fmp.write(f'TRACE:DATA? {self.nb}')
+                unread.append(True)
+                last = i == len(self.segments) - 1
+                if not last:
+                    self.configure(self.segments[i + 1])
+                    unread.append(False)
+                data = decodeTrace(read(True), fmp.binary)
+                if len(data) != self.points:
+                    raise ValueError(f'Segment {segment} returned {len(data)} points instead of {self.points}')
+                offset = i*(self.points - 1)
+                amplitudes[offset:offset + self.points] = data
+
+                now = time.perf_counter()
+                self.segmentTimes.append(now - segmentStart)
+                segmentStart = now
+                if not last:
+                    # Sweep of the next segment
+                    read(False)
+        finally:
+            # The responses already requested are discarded before the next ones, and the span and the
+            # sweep mode are restored even after an error (the continuous mode then sweeps the whole span)
+            for block in unread:
+                fmp.discard(block)
+            self.totalTime = time.perf_counter() - start
+            with fmp.batch():
+                fmp.setStartFreq(span[0])
+                fmp.setStopFreq(span[1])
+                if continuous:
+                    fmp.continuousOn()
+        return amplitudes
+
+    def report(self) -> string:
+        """Describes the timings of the last scan.
+
+        Returns:
+            string: Number of segments, total time and time per segment.
+        """
+        mean = self.totalTime/len(self.segmentTimes) if self.segmentTimes else 0.0
+        return f'{len(self.segments)} segments de {self.points} points, {self.totalTime:.2f} s ({mean*1e3:.0f} ms/segment)'
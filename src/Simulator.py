@@ -0,0 +1,350 @@
+import string
+import re
+import sys
+import time
+import random
+import asyncio
+import argparse
+import threading
+import numpy as np
+
+# Channels emitting in the synthetic spectra: (center frequency (GHz), width (GHz))
+CHANNELS = [(2.412 + 0.025*i, 0.020) for i in range(3)] + \
+    [(5.180 + 0.040*i, 0.020) for i in range(8)] + \
+    [(5.955 + 0.080*i, 0.020) for i in range(6)]
+
+# Most sweeps computed at once when catching up in continuous mode, the others are only counted
+MAX_CATCHUP = 10
+
+TRACE_TYPES = {'NOR': 'NORM', 'MAX': 'MAX', 'MIN': 'MIN', 'AVE': 'AVER'}
+
+def shortForm(node: string) -> string:
+    """Gives the SCPI short form of a header node (TRACe -> TRAC, UPDate -> UPD).
+
+    Args:
+        node (string): Header node in upper case, without its numeric suffix.
+
+    Returns:
+        string: Short form of the node.
+    """
+    if len(node) <= 4 or node.startswith('*'):
+        return node
+    return node[:3] if node[3] in 'AEIOU' else node[:4]
+
+def parseCommand(command: string) -> tuple[string, int, string]:
+    """Normalizes a SCPI command.
+
+    Args:
+        command (string): Command as sent by the client (e.g. ':TRACe2:TYPE MAXimum').
+
+    Returns:
+        tuple[string, int, string]: Header in short form with '?' for queries (e.g. 'TRAC:TYPE'),
+        numeric suffix of the header (None if absent) and arguments.
+    """
+    header, _, args = command.strip().lstrip(':').partition(' ')
+    query = header.endswith('?')
+    suffix = None
+    nodes = []
+    for node in header.rstrip('?').upper().split(':'):
+        match = re.fullmatch(r'(\*?[A-Z]+)(\d*)', node)
+        if match is None:
+            nodes.append(node)
+            continue
+        if match.group(2):
+            suffix = int(match.group(2))
+        nodes.append(shortForm(match.group(1)))
+    return ':'.join(nodes) + ('?' if query else ''), suffix, args.strip()
+
+class Simulator:
+    """Local TCP server emulating the subset of the MS2090A command set used by FMP.
+
+    Sweeps are computed lazily from the elapsed time: in continuous mode a new synthetic
+    spectrum is produced every sweepTime seconds, INIT runs a single sweep that *OPC? waits for.
+    """
+    def __init__(self, host: string = '127.0.0.1', port: int = 9001, points: int = 551, sweepTime: float = 0.05,
+                 latency: float = 0.0, latencies: dict = None, drop: float = 0.0, disconnect: float = 0.0,
+                 jitter: float = 0.0, seed: int = None) -> None:
+        """Constructor.
+
+        Args:
+            host (string): Listening address.
+            port (int): Listening port (0 picks a free port).
+            points (int): Number of points of the traces.
+            sweepTime (float): Duration of a sweep (s).
+            latency (float): Processing time of every command (s).
+            latencies (dict): Processing time per command header in short form (e.g. {'TRAC:DATA?': 0.01}).
+            drop (float): Probability that a query is never answered.
+            disconnect (float): Probability that the connection is closed on a command.
+            jitter (float): Maximum random delay added to every command (s).
+            seed (int): Seed of the random generators.
+        """
+        self.host = host
+        self.port = port
+        self.sweepTime = sweepTime
+        self.latency = latency
+        self.latencies = latencies or {}
+        self.drop = drop
+        self.disconnect = disconnect
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+
+        # Instrument state
+        self.points = points
+        self.settings = {
+            'FREQ:STAR': 2.4e9,
+            'FREQ:STOP': 2.5e9,
+            'BAND:RES': 3e5,
+            'DISP:WIND:TRAC:Y:SCAL:RLEV': 0.0,
+            'DISP:WIND:TRAC:Y:PDIV': 10.0,
+        }
+        self.binary = False
+        self.littleEndian = False
+        self.continuous = True
+        self.sweepStart = time.monotonic()
+        self.sweepsDone = 0
+        self.singleSweepEnd = None
+        self.traceType = {nb: 'NORM' for nb in range(1, 7)}
+        self.traceActive = {nb: nb == 1 for nb in range(1, 7)}
+        self.traceData = {nb: None for nb in range(1, 7)}
+        self.traceCount = {nb: 0 for nb in range(1, 7)}
+
+        self.server = None
+        self.loop = None
+
+    def spectrum(self) -> np.ndarray:
+        """Generates a synthetic spectrum on the current frequency grid.
+
+        Returns:
+            np.ndarray: Amplitudes (dBm) of the sweep.
+        """
+        frequencies = np.linspace(self.settings['FREQ:STAR'], self.settings['FREQ:STOP'], self.points)/1e9
+        amplitudes = -95.0 + 2.0*self.rng.standard_normal(self.points)
+        for center, width in CHANNELS:
+            # Intermittent emitters with a random level
+            if self.rng.random() < 0.5:
+                inBand = np.abs(frequencies - center) < width/2
+                amplitudes[inBand] = np.maximum(amplitudes[inBand], self.rng.uniform(-70, -40) + self.rng.standard_normal(inBand.sum()))
+        return amplitudes.astype(np.float32)
+
+    def applySweep(self, skipped: int = 0) -> None:
+        """Applies a new sweep to the active traces according to their type.
+
+        Args:
+            skipped (int): Number of sweeps completed before this one that are only counted.
+        """
+        amplitudes = self.spectrum()
+        self.sweepsDone += 1 + skipped
+        for nb in self.traceData:
+            if not self.traceActive[nb]:
+                continue
+            previous = self.traceData[nb]
+            count = self.traceCount[nb]
+            if previous is None or len(previous) != self.points or self.traceType[nb] == 'NORM':
+                data = amplitudes
+            elif self.traceType[nb] == 'MAX':
+                data = np.maximum(previous, amplitudes)
+            elif self.traceType[nb] == 'MIN':
+                data = np.minimum(previous, amplitudes)
+            else:
+                data = previous + (amplitudes - previous)/(count + 1)
+            self.traceData[nb] = data.astype(np.float32)
+            self.traceCount[nb] = count + 1 + skipped
+
+    def advance(self) -> None:
+        """Applies the sweeps completed since the last call.
+        """
+        now = time.monotonic()
+        if self.singleSweepEnd is not None and now >= self.singleSweepEnd:
+            self.singleSweepEnd = None
+            self.applySweep()
+        if self.continuous:
+            completed = int((now - self.sweepStart)/self.sweepTime)
+            if completed > 0:
+                self.sweepStart += completed*self.sweepTime
+                computed = min(completed, MAX_CATCHUP)
+                self.applySweep(completed - computed)
+                for _ in range(computed - 1):
+                    self.applySweep()
+
+    def block(self, data: np.ndarray) -> bytes:
+        """Formats trace data as an IEEE 488.2 definite length block.
+
+        Args:
+            data (np.ndarray): Trace data (None if the trace holds nothing).
+
+        Returns:
+            bytes: The block.
+        """
+        if data is None:
+            payload = b''
+        elif self.binary:
+            payload = data.astype('<f4' if self.littleEndian else '>f4').tobytes()
+        else:
+            payload = ','.join(f'{value:.2f}' for value in data).encode('ascii')
+        length = str(len(payload)).encode('ascii')
+        return b'#' + str(len(length)).encode('ascii') + length + payload
+
+    async def execute(self, command: string) -> bytes:
+        """Executes a single command.
+
+        Args:
+            command (string): SCPI command.
+
+        Returns:
+            bytes: Response (None for set-only commands).
+        """
+        header, suffix, args = parseCommand(command)
+        delay = self.latencies.get(header, self.latency) + self.random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.advance()
+        nb = suffix or 1
+
+        if header == '*IDN?':
+            return b'Anritsu,MS2090A,Simulator,1.0'
+        if header == '*OPC?':
+            # Waits for the single sweep in progress
+            if self.singleSweepEnd is not None:
+                await asyncio.sleep(max(0.0, self.singleSweepEnd - time.monotonic()))
+                self.advance()
+            return b'1'
+        if header.rstrip('?') in self.settings:
+            key = header.rstrip('?')
+            if header.endswith('?'):
+                return repr(self.settings[key]).encode('ascii')
+            self.settings[key] = float(args.split()[0])
+            return None
+        if header == 'DISP:POIN?':
+            return str(self.points).encode('ascii')
+        if header == 'DISP:POIN':
+            self.points = int(float(args))
+            return None
+        if header == 'FORM:DATA':
+            self.binary = args.upper().startswith('REAL')
+            return None
+        if header == 'FORM:BORD':
+            self.littleEndian = args.upper().startswith('SWAP')
+            return None
+        if header == 'TRAC:TYPE':
+            self.traceType[nb] = TRACE_TYPES.get(args[:3].upper(), 'NORM')
+            self.traceCount[nb] = 0
+            return None
+        if header == 'TRAC:TYPE?':
+            return self.traceType[nb].encode('ascii')
+        if header == 'TRAC:UPD?':
+            return b'1' if self.traceActive[nb] else b'0'
+        if header == 'TRAC:UPD':
+            self.traceActive[nb] = args.upper() in ('1', 'ON')
+            return None
+        if header == 'TRAC:CLE':
+            nb = int(args) if args else nb
+            self.traceData[nb] = None
+            self.traceCount[nb] = 0
+            return None
+        if header == 'TRAC:DATA?':
+            return self.block(self.traceData[int(args) if args else nb])
+        if header == 'TRAC:SWE:COUN?':
+            return str(self.traceCount[nb]).encode('ascii')
+        if header == 'INIT:CONT?':
+            return b'1' if self.continuous else b'0'
+        if header == 'INIT:CONT':
+            self.continuous = args.upper() in ('1', 'ON')
+            self.sweepStart = time.monotonic()
+            return None
+        if header == 'INIT':
+            self.singleSweepEnd = time.monotonic() + self.sweepTime
+            return None
+        if header == 'ABOR':
+            self.singleSweepEnd = None
+            self.sweepStart = time.monotonic()
+            return None
+        return None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves a client connection.
+
+        Args:
+            reader (asyncio.StreamReader): Client input.
+            writer (asyncio.StreamWriter): Client output.
+        """
+        try:
+            while line := await reader.readline():
+                # The responses of a compound query are sent in a single message
+                responses = []
+                for command in line.decode('ascii').split(';'):
+                    if not command.strip():
+                        continue
+                    if self.random.random() < self.disconnect:
+                        return
+                    response = await self.execute(command)
+                    if response is not None:
+                        responses.append(response)
+                if responses and self.random.random() >= self.drop:
+                    writer.write(b';'.join(responses) + b'\n')
+                    await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self) -> None:
+        """Starts listening, self.port holds the actual port once started.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def startInThread(self) -> 'Simulator':
+        """Runs the server in a background thread, returns once it is listening.
+
+        Returns:
+            Simulator: The running simulator.
+        """
+        started = threading.Event()
+
+        async def serve() -> None:
+            await self.start()
+            started.set()
+            try:
+                async with self.server:
+                    await self.server.serve_forever()
+            except asyncio.CancelledError:
+                # Closed by stop()
+                pass
+
+        threading.Thread(target=lambda: asyncio.run(serve()), daemon=True).start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server.
+        """
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='MS2090A simulator for ScryNet')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9001)
+    parser.add_argument('--points', type=int, default=551)
+    parser.add_argument('--sweep-time', type=float, default=0.05, help='duration of a sweep (s)')
+    parser.add_argument('--latency', type=float, default=0.0, help='processing time of every command (s)')
+    parser.add_argument('--drop', type=float, default=0.0, help='probability that a query is never answered')
+    parser.add_argument('--disconnect', type=float, default=0.0, help='probability that the connection is closed on a command')
+    parser.add_argument('--jitter', type=float, default=0.0, help='maximum random delay added to every command (s)')
+    args = parser.parse_args()
+
+    simulator = Simulator(args.host, args.port, args.points, args.sweep_time, args.latency,
+                          drop=args.drop, disconnect=args.disconnect, jitter=args.jitter)
+
+    async def serve() -> None:
+        await simulator.start()
+        print(f'Simulator listening on {simulator.host}:{simulator.port}', file=sys.stderr)
+        async with simulator.server:
+            await simulator.server.serve_forever()
+
+    asyncio.run(serve())
+
+if __name__ == '__main__':
+    main()
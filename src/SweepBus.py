@@ -0,0 +1,356 @@
+import string
+import sys
+import time
+import argparse
+from multiprocessing import shared_memory, resource_tracker
+import numpy as np
+
+from Instrumentation import METRICS
+
+# Number of sweeps kept by a bus, a consumer more than this number of sweeps behind skips ahead
+BUS_SLOTS = 8
+
+# Bounds of the interval between two polls of a waiting consumer (s), it doubles up to the maximum
+BUS_POLL_MIN = 0.0005
+BUS_POLL_MAX = 0.01
+
+# Header of the bus: sequence number of the latest sweep (0 before the first one) and shape of the ring
+CONTROL_DTYPE = np.dtype([('head', '<i8'), ('slots', '<i8'), ('traces', '<i8'), ('points', '<i8')])
+
+# Header of every slot: sequence number of its sweep (-1 while it is written), time, settings,
+# size of the matrix and index of the instrument that acquired it
+SLOT_DTYPE = np.dtype([('seq', '<i8'), ('time', '<f8'), ('start', '<f8'), ('stop', '<f8'), ('rbw', '<f8'),
+                       ('rows', '<i8'), ('points', '<i8'), ('source', '<i8')])
+
+def align(offset: int) -> int:
+    """Aligns an offset of the shared memory on a cache line.
+
+    Args:
+        offset (int): Offset (bytes).
+
+    Returns:
+        int: The next multiple of 64.
+    """
+    return -(-offset//64)*64
+
+def attachMemory(name: string) -> shared_memory.SharedMemory:
+    """Attaches to an existing shared memory block without taking its ownership.
+
+    Args:
+        name (string): Name of the block.
+
+    Returns:
+        shared_memory.SharedMemory: The block.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, track=False)
+    # Before Python 3.13 attaching registers the block with the resource tracker, which removes it when the process exits:
+    # the registration is undone, unless the tracker is the one of the creator (process spawned or forked by it)
+    shared = resource_tracker._resource_tracker._fd is not None
+    memory = shared_memory.SharedMemory(name)
+    if not shared:
+        resource_tracker.unregister(memory._name, 'shared_memory')
+    return memory
+
+class BusSweep:
+    """Sweep read from a bus: read-only views of its slot, without copy.
+
+    The slot is overwritten once the producer has published BUS_SLOTS more sweeps. A consumer that keeps
+    the views or works on them for a long time checks intact() once it is done, and drops its result if not.
+    """
+    def __init__(self, bus: 'SweepBus', seq: int, slot: int, header: np.void) -> None:
+        """Constructor.
+
+        Args:
+            bus (SweepBus): The bus.
+            seq (int): Sequence number of the sweep.
+            slot (int): Slot of the sweep.
+            header (np.void): Copy of the header of the slot (see SLOT_DTYPE).
+        """
+        self.bus = bus
+        self.seq = seq
+        self.slot = slot
+        self.timestamp = float(header['time'])
+        self.settings = {'start': float(header['start']), 'stop': float(header['stop']), 'rbw': float(header['rbw'])}
+        self.source = int(header['source'])
+        points = int(header['points'])
+        self.frequencies = bus.frequencies[slot, :points]
+        self.amplitudes = bus.amplitudes[slot, :int(header['rows']), :points]
+
+    def intact(self) -> bool:
+        """Tells whether the slot still holds this sweep.
+
+        Returns:
+            bool: False if the producer has started to overwrite it.
+        """
+        return int(self.bus.headers[self.slot]['seq']) == self.seq
+
+class BusReader:
+    """Consumer of a bus, each consumer has its own position and never blocks the producer.
+
+    By default every sweep is read in order; a consumer falling behind skips to the oldest sweep that
+    cannot be overwritten before it is read. A latest-only consumer (e.g. a display) always jumps to the latest sweep.
+    """
+    def __init__(self, bus: 'SweepBus', latest: bool = False, start: int = None) -> None:
+        """Constructor.
+
+        Args:
+            bus (SweepBus): The bus.
+            latest (bool): Only reads the latest sweep.
+            start (int): Sequence number of the first sweep read (1 for the oldest one kept), the next published one by default.
+        """
+        self.bus = bus
+        self.latest = latest
+        self.next = bus.head() + 1 if start is None else start
+        # Number of sweeps skipped so far
+        self.skipped = 0
+
+    def poll(self) -> BusSweep:
+        """Reads the next sweep if it is published.
+
+        Returns:
+            BusSweep: The sweep, None if there is no new sweep.
+        """
+        bus = self.bus
+        while True:
+            head = bus.head()
+            if head < self.next:
+                return None
+            # The slot after the head is the next one overwritten: it is never read
+            seq = head if self.latest else max(self.next, head - bus.slots + 2)
+            slot = seq % bus.slots
+            header = bus.headers[slot].copy()
+            if int(header['seq']) != seq:
+                # Overwritten while the head was read: the producer is far ahead
+                continue
+            if seq > self.next:
+                self.skipped += seq - self.next
+                METRICS.count('bus_skipped', seq - self.next)
+            self.next = seq + 1
+            return BusSweep(bus, seq, slot, header)
+
+    def wait(self, timeout: float = None) -> BusSweep:
+        """Waits for the next sweep, polling the bus with a growing interval.
+
+        Args:
+            timeout (float): Maximum waiting time (s), None to wait forever.
+
+        Returns:
+            BusSweep: The sweep, None if the timeout expired.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        interval = BUS_POLL_MIN
+        while True:
+            sweep = self.poll()
+            if sweep is not None:
+                return sweep
+            if deadline is not None:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    return None
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(2*interval, BUS_POLL_MAX)
+
+class SweepBus:
+    """Ring of sweeps in shared memory, written by a single producer and read without copy by any number
+    of consumers, threads of the producer process or other processes attached by name.
+
+    Each sweep takes the next slot of the ring and gets a sequence number: the header of its slot is
+    invalidated while the data are written, then the sweep is published by updating the head of the bus.
+    """
+    def __init__(self, traces: int, points: int, slots: int = BUS_SLOTS, name: string = None) -> None:
+        """Constructor, creates the bus.
+
+        Args:
+            traces (int): Maximum number of traces per sweep.
+            points (int): Maximum number of points per trace.
+            slots (int): Number of sweeps kept.
+            name (string): Name of the shared memory block, a random one by default.
+        """
+        if slots < 2:
+            raise ValueError('A sweep bus needs at least 2 slots')
+        self.creator = True
+        size = self.layout(slots, traces, points)[-1]
+        self.memory = shared_memory.SharedMemory(name, create=True, size=size)
+        self.map(slots, traces, points)
+        self.control[0] = (0, slots, traces, points)
+        self.headers['seq'] = 0
+
+    @classmethod
+    def attach(cls, name: string) -> 'SweepBus':
+        """Attaches to a bus created by another process.
+
+        Args:
+            name (string): Name of the bus (see SweepBus.name).
+
+        Returns:
+            SweepBus: The bus, to be read only.
+        """
+        bus = cls.__new__(cls)
+        bus.creator = False
+        bus.memory = attachMemory(name)
+        control = np.ndarray(1, CONTROL_DTYPE, bus.memory.buf)[0]
+        bus.map(int(control['slots']), int(control['traces']), int(control['points']))
+        return bus
+
+    @staticmethod
+    def layout(slots: int, traces: int, points: int) -> tuple[int, int, int, int]:
+        """Gives the layout of the shared memory block.
+
+        Args:
+            slots (int): Number of sweeps kept.
+            traces (int): Maximum number of traces per sweep.
+            points (int): Maximum number of points per trace.
+
+        Returns:
+            tuple[int, int, int, int]: Offsets of the slot headers, frequencies and amplitudes, and size of the block (bytes).
+        """
+        headers = align(CONTROL_DTYPE.itemsize)
+        frequencies = align(headers + slots*SLOT_DTYPE.itemsize)
+        amplitudes = align(frequencies + slots*points*8)
+        return headers, frequencies, amplitudes, align(amplitudes + slots*traces*points*4)
+
+    def map(self, slots: int, traces: int, points: int) -> None:
+        """Creates the arrays of the bus over the shared memory block, read-only for the consumers of other processes.
+
+        Args:
+            slots (int): Number of sweeps kept.
+            traces (int): Maximum number of traces per sweep.
+            points (int): Maximum number of points per trace.
+        """
+        self.slots, self.traces, self.points = slots, traces, points
+        headers, frequencies, amplitudes, _ = self.layout(slots, traces, points)
+        buffer = self.memory.buf
+        self.control = np.ndarray(1, CONTROL_DTYPE, buffer)
+        self.headers = np.ndarray(slots, SLOT_DTYPE, buffer, headers)
+        self.frequencies = np.ndarray((slots, points), np.float64, buffer, frequencies)
+        self.amplitudes = np.ndarray((slots, traces, points), np.float32, buffer, amplitudes)
+        if not self.creator:
+            self.frequencies.flags.writeable = False
+            self.amplitudes.flags.writeable = False
+
+    @property
+    def name(self) -> string:
+        return self.memory.name
+
+    def head(self) -> int:
+        """Gives the sequence number of the latest sweep.
+
+        Returns:
+            int: The sequence number, 0 before the first sweep.
+        """
+        return int(self.control[0]['head'])
+
+    def fits(self, amplitudes: np.ndarray) -> bool:
+        """Tells whether a sweep fits in the slots of the bus.
+
+        Args:
+            amplitudes (np.ndarray): Trace or (trace, point) matrix.
+
+        Returns:
+            bool: True if it can be published.
+        """
+        rows, points = np.atleast_2d(amplitudes).shape
+        return rows <= self.traces and points <= self.points
+
+    def publish(self, frequencies: np.ndarray, amplitudes: np.ndarray, timestamp: float = None, settings: dict = None, source: int = 0) -> int:
+        """Writes a sweep in the next slot and publishes it, only called by the producer.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz).
+            amplitudes (np.ndarray): Trace or (trace, point) matrix given by FMP.getTraces (dB).
+            timestamp (float): Time of the sweep (time.time), now by default.
+            settings (dict): Start and stop frequencies (GHz) and resolution bandwidth (Hz), NaN when missing.
+            source (int): Index of the instrument that acquired the sweep.
+
+        Returns:
+            int: Sequence number of the sweep.
+        """
+        if not self.creator:
+            raise PermissionError('Only the creator of a sweep bus can publish on it')
+        amplitudes = np.atleast_2d(amplitudes)
+        rows, points = amplitudes.shape
+        if not self.fits(amplitudes):
+            raise ValueError(f'A ({rows}, {points}) sweep does not fit in a ({self.traces}, {self.points}) bus')
+        settings = settings or {}
+        seq = self.head() + 1
+        slot = seq % self.slots
+        header = self.headers[slot:slot + 1]
+        # The readers of the previous sweep of the slot see it is overwritten
+        header['seq'] = -1
+        self.frequencies[slot, :points] = frequencies
+        self.amplitudes[slot, :rows, :points] = amplitudes
+        header[0] = (-1, time.time() if timestamp is None else timestamp, settings.get('start', np.nan), settings.get('stop', np.nan),
+                     settings.get('rbw', np.nan), rows, points, source)
+        header['seq'] = seq
+        self.control['head'] = seq
+        METRICS.count('bus_published')
+        return seq
+
+    def reader(self, latest: bool = False, start: int = None) -> BusReader:
+        """Creates a consumer of the bus.
+
+        Args:
+            latest (bool): Only reads the latest sweep.
+            start (int): Sequence number of the first sweep read (1 for the oldest one kept), the next published one by default.
+
+        Returns:
+            BusReader: The consumer.
+        """
+        return BusReader(self, latest, start)
+
+    def unlink(self) -> None:
+        """Removes the name of the bus, only called by the creator: no other process can attach to it anymore,
+        the attached consumers keep reading it and the memory is released once the last of them drops it.
+        """
+        if self.creator:
+            self.memory.unlink()
+            self.creator = False
+
+    def close(self) -> None:
+        """Detaches from the bus, the creator also removes it. The views of its sweeps must be dropped before.
+        """
+        self.unlink()
+        del self.control, self.headers, self.frequencies, self.amplitudes
+        self.memory.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ScryNet sweep bus monitor: reads the sweeps published on a bus by another process')
+    parser.add_argument('name', help='name of the bus')
+    parser.add_argument('--latest', action='store_true', help='only reads the latest sweep')
+    parser.add_argument('--period', type=float, default=1.0, help='time between two reports (s)')
+    args = parser.parse_args()
+
+    # The monitor can be started before the producer
+    while True:
+        try:
+            bus = SweepBus.attach(args.name)
+            break
+        except FileNotFoundError:
+            time.sleep(args.period)
+    reader = bus.reader(args.latest)
+    print(f'Bus {bus.name} : {bus.slots} emplacements de {bus.traces} traces x {bus.points} points', file=sys.stderr)
+    count, last, peak = 0, time.perf_counter(), np.nan
+    try:
+        while True:
+            sweep = reader.wait(args.period)
+            if sweep is not None:
+                count += 1
+                peak = np.nanmax(sweep.amplitudes) if np.isfinite(sweep.amplitudes).any() else np.nan
+                intact = sweep.intact()
+                del sweep
+                if not intact:
+                    continue
+            now = time.perf_counter()
+            if now - last >= args.period:
+                print(f'balayage {reader.next - 1} : {count/(now - last):.1f} balayages/s, {reader.skipped} sautés, maximum {peak:.1f} dB', file=sys.stderr)
+                count, last = 0, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del reader
+        bus.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,560 @@
+import string
+import sys
+import time
+import struct
+import socket
+import asyncio
+import argparse
+import threading
+from contextlib import nullcontext
+import numpy as np
+
+from FMP import traces, stackTraces
+from Analytics import ChannelAnalyzer
+from Instrumentation import METRICS
+
+# Default port of the sweep stream
+STREAM_PORT = 9100
+
+# Header of every message of the stream: magic, sequence number, time (time.time), first and last frequency of the axis (GHz),
+# resolution bandwidth (Hz), reference level (dB), scale (dB/div), type of every trace (index in STREAM_TYPES + 1, 0 if unknown),
+# traces present (bit i for traces[i]), instrument number (order of the publisher IPs) and number of points.
+# It is followed by the (trace, point) float32 little-endian matrix of the traces present only.
+STREAM_HEADER = struct.Struct('<4sQdddddd6sBHI')
+STREAM_MAGIC = b'SCRY'
+
+# Trace types sent in the header (see FMP.getTraceType)
+STREAM_TYPES = ('NORM', 'MIN', 'MAX', 'AVER')
+
+# Time a subscriber has to take a message before it is disconnected (s)
+STREAM_SEND_TIMEOUT = 10.0
+
+def encodeSweep(seq: int, frequencies: np.ndarray, amplitudes: np.ndarray, timestamp: float, settings: dict = None, source: int = 0) -> bytes:
+    """Builds the message of a sweep.
+
+    Args:
+        seq (int): Sequence number of the sweep.
+        frequencies (np.ndarray): Frequency axis (GHz), evenly spaced.
+        amplitudes (np.ndarray): (trace, point) matrix given by FMP.getTraces (dB), missing traces are NaN.
+        timestamp (float): Time of the sweep (time.time).
+        settings (dict): 'rbw' (Hz), 'ref' (dB), 'scale' (dB/div) and 'types' (trace type per trace number), NaN or unknown when missing.
+        source (int): Instrument number.
+
+    Returns:
+        bytes: The message.
+    """
+    settings = settings or {}
+    present = ~np.isnan(amplitudes).all(axis=-1) if amplitudes.shape[-1] else np.zeros(len(amplitudes), dtype=bool)
+    mask = sum(1 << i for i in np.flatnonzero(present))
+    types = settings.get('types', {})
+    codes = bytes(STREAM_TYPES.index(types[nb]) + 1 if types.get(nb) in STREAM_TYPES else 0 for nb in traces)
+    header = STREAM_HEADER.pack(STREAM_MAGIC, seq, timestamp, frequencies[0] if len(frequencies) else np.nan, frequencies[-1] if len(frequencies) else np.nan,
+                                settings.get('rbw', np.nan), settings.get('ref', np.nan), settings.get('scale', np.nan), codes, mask, source, len(frequencies))
+    return header + amplitudes[present].astype('<f4', copy=False).tobytes()
+
+class StreamSweep:
+    """Sweep received from the stream.
+    """
+    def __init__(self, header: tuple, payload: bytes, frequencies: np.ndarray) -> None:
+        """Constructor, decodes a message.
+
+        Args:
+            header (tuple): Fields of STREAM_HEADER.
+            payload (bytes): Matrix of the traces present.
+            frequencies (np.ndarray): Frequency axis (GHz) of the sweep.
+        """
+        _, self.seq, self.timestamp, start, stop, rbw, ref, scale, codes, mask, self.source, points = header
+        self.frequencies = frequencies
+        self.settings = {'start': start, 'stop': stop, 'rbw': rbw, 'ref': ref, 'scale': scale,
+                         'types': {nb: STREAM_TYPES[code - 1] for nb, code in zip(traces, codes) if code}}
+        rows = np.frombuffer(payload, dtype='<f4').reshape(-1, points)
+        present = [i for i in range(len(traces)) if mask & (1 << i)]
+        # The missing traces are NaN rows, as given by FMP.getTraces
+        self.amplitudes = stackTraces([rows[present.index(i)] if i in present else np.empty(0, dtype=np.float32) for i in range(len(traces))])
+        self.amplitudes.flags.writeable = False
+        self.present = [traces[i] for i in present]
+
+class Subscriber:
+    """Client of the server, it only ever has the latest message waiting for it.
+    """
+    def __init__(self, address: tuple) -> None:
+        """Constructor.
+
+        Args:
+            address (tuple): (host, port) of the subscriber.
+        """
+        self.address = address
+        self.pending = None
+        self.ready = asyncio.Event()
+        # Messages sent, and replaced by a newer one before they could be sent
+        self.sent = 0
+        self.dropped = 0
+
+    def offer(self, message: bytes) -> None:
+        """Makes a message the next one sent, run on the event loop.
+
+        Args:
+            message (bytes): The message.
+        """
+        if self.pending is not None:
+            self.dropped += 1
+            METRICS.count('stream_dropped')
+        self.pending = message
+        self.ready.set()
+
+class SweepServer:
+    """Serves the sweeps of the process that owns the instruments to any number of subscribers over TCP.
+
+    Every sweep is encoded once (see STREAM_HEADER) and handed to every subscriber. A subscriber only
+    has the latest sweep waiting for it: while it is slow to read, the sweeps it missed are replaced by
+    newer ones, so it never delays the others nor the acquisition. It is disconnected after STREAM_SEND_TIMEOUT without reading.
+    """
+    def __init__(self, host: string = '127.0.0.1', port: int = STREAM_PORT) -> None:
+        """Constructor.
+
+        Args:
+            host (string): Address listened on, '0.0.0.0' for every interface.
+            port (int): Port listened on, 0 for any free port.
+        """
+        self.host = host
+        self.port = port
+        self.server = None
+        self.loop = None
+        self.subscribers = set()
+        self.seq = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Sends the sweeps to a subscriber until it disconnects.
+        """
+        subscriber = Subscriber(writer.get_extra_info('peername'))
+        self.subscribers.add(subscriber)
+        try:
+            while True:
+                await subscriber.ready.wait()
+                subscriber.ready.clear()
+                message, subscriber.pending = subscriber.pending, None
+                writer.write(message)
+                # Backpressure: the next message is the latest one once the subscriber has taken this one
+                await asyncio.wait_for(writer.drain(), STREAM_SEND_TIMEOUT)
+                subscriber.sent += 1
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            writer.close()
+
+    def broadcast(self, message: bytes) -> None:
+        """Hands a message to every subscriber, run on the event loop.
+
+        Args:
+            message (bytes): The message.
+        """
+        for subscriber in self.subscribers:
+            subscriber.offer(message)
+
+    def publish(self, frequencies: np.ndarray, amplitudes: np.ndarray, timestamp: float = None, settings: dict = None, source: int = 0) -> int:
+        """Sends a sweep to every subscriber without waiting for them, called by the producer thread.
+
+        Args:
+            frequencies (np.ndarray): Frequency axis (GHz), evenly spaced.
+            amplitudes (np.ndarray): (trace, point) matrix given by FMP.getTraces (dB).
+            timestamp (float): Time of the sweep (time.time), now by default.
+            settings (dict): 'rbw', 'ref', 'scale' and 'types' of the instrument (see encodeSweep).
+            source (int): Instrument number.
+
+        Returns:
+            int: Sequence number of the sweep.
+        """
+        self.seq += 1
+        message = encodeSweep(self.seq, frequencies, amplitudes, time.time() if timestamp is None else timestamp, settings, source)
+        METRICS.count('stream_bytes', len(message)*len(self.subscribers))
+        self.loop.call_soon_threadsafe(self.broadcast, message)
+        return self.seq
+
+    def report(self) -> string:
+        """Summarizes the subscribers.
+
+        Returns:
+            string: Number of subscribers, and messages sent and dropped per subscriber.
+        """
+        subscribers = list(self.subscribers)
+        return f'{len(subscribers)} abonnés' + ''.join(f', {address[0]}:{address[1]} {subscriber.sent} envoyés/{subscriber.dropped} sautés'
+                                                      for subscriber in subscribers for address in [subscriber.address])
+
+    async def start(self) -> None:
+        """Starts listening, self.port holds the actual port once started.
+        """
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    def startInThread(self) -> 'SweepServer':
+        """Runs the server in a background thread, returns once it is listening.
+
+        Returns:
+            SweepServer: The running server.
+        """
+        started = threading.Event()
+
+        async def serve() -> None:
+            await self.start()
+            started.set()
+            try:
+                async with self.server:
+                    await self.server.serve_forever()
+            except asyncio.CancelledError:
+                # Closed by stop()
+                pass
+
+        threading.Thread(target=lambda: asyncio.run(serve()), name='SweepServer', daemon=True).start()
+        started.wait()
+        return self
+
+    def stop(self) -> None:
+        """Stops the server.
+        """
+        if self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+
+class SweepClient:
+    """Subscriber of a sweep server: a background thread receives the sweeps and keeps the latest one.
+    """
+    def __init__(self, host: string, port: int = STREAM_PORT, source: int = 0, timeout: float = 5.0) -> None:
+        """Constructor, connects to the server.
+
+        Args:
+            host (string): Address of the server.
+            port (int): Port of the server.
+            source (int): Instrument number of the publisher whose sweeps are kept.
+            timeout (float): Timeout of the connection (s).
+        """
+        self.host = host
+        self.port = port
+        self.source = source
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.settimeout(None)
+        self.condition = threading.Condition()
+        self.latest = None
+        self.error = None
+        # (start, stop, points) of the frequency axis and the axis, kept while it does not change
+        self.axis = None
+        self.thread = threading.Thread(target=self.run, name=f'SweepClient-{host}', daemon=True)
+        self.thread.start()
+
+    def receive(self, size: int) -> bytes:
+        """Reads a given number of bytes.
+
+        Args:
+            size (int): Number of bytes.
+
+        Returns:
+            bytes: The bytes.
+
+        Raises:
+            ConnectionError: The server closed the connection.
+        """
+        buffer = bytearray(size)
+        view = memoryview(buffer)
+        received = 0
+        while received < size:
+            count = self.sock.recv_into(view[received:])
+            if not count:
+                raise ConnectionError('The sweep server closed the connection')
+            received += count
+        METRICS.count('bytes_received', size)
+        return buffer
+
+    def run(self) -> None:
+        """Receiver thread loop: decodes the messages as fast as they come, only the latest is kept.
+        """
+        try:
+            while True:
+                header = STREAM_HEADER.unpack(self.receive(STREAM_HEADER.size))
+                if header[0] != STREAM_MAGIC:
+                    raise ValueError('Not a ScryNet sweep stream')
+                _, _, _, start, stop, _, _, _, _, mask, source, points = header
+                payload = self.receive(bin(mask).count('1')*points*4)
+                if source != self.source:
+                    continue
+                key = (start, stop, points)
+                if self.axis is None or self.axis[0] != key:
+                    frequencies = np.linspace(*key)
+                    frequencies.flags.writeable = False
+                    self.axis = (key, frequencies)
+                sweep = StreamSweep(header, payload, self.axis[1])
+                with self.condition:
+                    self.latest = sweep
+                    self.condition.notify_all()
+        except (OSError, ValueError) as error:
+            with self.condition:
+                self.error = error
+                self.condition.notify_all()
+
+    def wait(self, seq: int = 0, timeout: float = None) -> StreamSweep:
+        """Waits for a sweep newer than a given one.
+
+        Args:
+            seq (int): Sequence number of the last sweep known, 0 for any sweep.
+            timeout (float): Maximum waiting time (s), None to wait forever.
+
+        Returns:
+            StreamSweep: The latest sweep, None if the timeout expired.
+
+        Raises:
+            OSError: The connection to the server was lost.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.error is not None or (self.latest is not None and self.latest.seq > seq), timeout)
+            if self.error is not None:
+                raise self.error
+            return self.latest if self.latest is not None and self.latest.seq > seq else None
+
+    def close(self) -> None:
+        """Disconnects from the server.
+        """
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+class StreamInstrument:
+    """Read-only stand-in of FMP fed by a sweep server, so that the GUI can follow an instrument owned by another process.
+
+    The getters mirror the ones of FMP: the settings and the traces are the ones of the latest sweep received (read-only arrays). The commands that would change
+    the instrument are refused: the settings are chosen by the publisher.
+    Every getter of a frame answers from the same sweep, taken by the first of them: the transfer of the traces or the poll of
+    the sweep counter ends the frame, so that the settings, the frequency axis and the traces of a frame always match.
+    """
+    def __init__(self, host: string, port: int = STREAM_PORT, source: int = 0, timeout: float = 5.0, **kwargs) -> None:
+        """Constructor, connects to the server and waits for the first sweep.
+
+        Args:
+            host (string): Address of the server.
+            port (int): Port of the server.
+            source (int): Instrument number of the publisher.
+            timeout (float): Maximum time waited for the first sweep (s).
+            **kwargs: Other FMP constructor arguments, ignored.
+        """
+        self.ip = host
+        self.client = SweepClient(host, port, source, timeout)
+        self.analyzer = None
+        # Sweep the getters of the current frame answer from
+        self.snapshot = None
+        if self.client.wait(0, timeout) is None:
+            self.client.close()
+            raise TimeoutError(f'No sweep received from {host}:{port}')
+
+    def __getattr__(self, name: string):
+        """Refuses the FMP methods that are not mirrored.
+
+        Args:
+            name (string): Name of the attribute.
+
+        Raises:
+            AttributeError: Special names, so that hasattr and copy behave as usual.
+            PermissionError: Every other name, the method would send commands to the instrument.
+        """
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise PermissionError(f'{name} is not available on a sweep stream: the instrument is set by the publisher')
+
+    def sweep(self) -> StreamSweep:
+        """Gives the sweep of the current frame, the latest sweep received is taken by the first getter of the frame.
+
+        Returns:
+            StreamSweep: The sweep.
+        """
+        if self.snapshot is None:
+            self.snapshot = self.client.wait()
+        return self.snapshot
+
+    def endFrame(self) -> StreamSweep:
+        """Gives the sweep of the current frame and ends it, the next getter takes the latest sweep.
+
+        Returns:
+            StreamSweep: The sweep.
+        """
+        sweep, self.snapshot = self.sweep(), None
+        return sweep
+
+    def close(self) -> None:
+        """Disconnects from the server.
+        """
+        self.client.close()
+
+    def batch(self, sync: bool = True):
+        """Stands in for FMP.batch, there is nothing to group.
+
+        Args:
+            sync (bool): Ignored.
+        """
+        return nullcontext()
+
+    def refresh(self) -> None:
+        """Ends the current frame, the settings are read again from the latest sweep.
+        """
+        self.snapshot = None
+
+    def continuousOn(self) -> None:
+        """Stands in for FMP.continuousOn, the sweep mode is chosen by the publisher.
+        """
+
+    def continuousOff(self) -> None:
+        """Stands in for FMP.continuousOff, the sweep mode is chosen by the publisher.
+        """
+
+    def getStartFreq(self) -> float:
+        """Gets the start frequency.
+
+        Returns:
+            float: Start frequency (GHz).
+        """
+        return self.sweep().settings['start']
+
+    def getStopFreq(self) -> float:
+        """Gets the stop frequency.
+
+        Returns:
+            float: Stop frequency (GHz).
+        """
+        return self.sweep().settings['stop']
+
+    def getRBW(self) -> float:
+        """Gets the Resolution Bandwidth.
+
+        Returns:
+            float: Resolution Bandwidth (Hz)
+        """
+        return self.sweep().settings['rbw']
+
+    def getRefLvl(self) -> float:
+        """Gets the Reference level.
+
+        Returns:
+            float: Amplitude reference (top limit in dB).
+        """
+        return self.sweep().settings['ref']
+
+    def getTraceScale(self) -> float:
+        """Gets the trace vertical scale
+
+        Returns:
+            float: Scale (dB/division)
+        """
+        return self.sweep().settings['scale']
+
+    def getPointNumber(self) -> int:
+        """Gets the number of points in the traces.
+
+        Returns:
+            int: Point number.
+        """
+        return len(self.sweep().frequencies)
+
+    def getTraceType(self, nb: int) -> string:
+        """Gets the selected trace type.
+
+        Args:
+            nb (int): Trace number.
+
+        Returns:
+            string: Trace type : <NORM | MIN | MAX | AVER>
+        """
+        return self.sweep().settings['types'].get(nb, 'NORM')
+
+    def getTraceMode(self, nb: int) -> string:
+        """Gets the selected trace mode, only the active traces are sent.
+
+        Args:
+            nb (int): Trace number.
+
+        Returns:
+            string: Trace mode ('1' for Active, '0' otherwise).
+        """
+        return '1' if nb in self.sweep().present else '0'
+
+    def getSweepCount(self, nb: int) -> int:
+        """Gets the sequence number of the latest sweep. Polled alone by the live mode, it ends the frame
+        so that every poll sees the latest sweep.
+
+        Args:
+            nb (int): Trace number (every trace has the sequence number of the sweep).
+
+        Returns:
+            int: Sequence number.
+        """
+        return self.endFrame().seq
+
+    def getFrequencies(self) -> np.ndarray:
+        """Gets the frequency axis of the traces.
+
+        Returns:
+            np.ndarray: Frequencies (GHz) of the trace points (read-only).
+        """
+        return self.sweep().frequencies
+
+    def getTraces(self, nbs: list[int] = traces) -> np.ndarray:
+        """Gets the traces of the sweep and ends the frame.
+
+        Args:
+            nbs (list[int]): Numbers of the traces given, all of them by default.
+
+        Returns:
+            np.ndarray: (trace, point) float32 matrix, NaN rows for the traces that are not active or not given.
+        """
+        amplitudes = self.endFrame().amplitudes
+        if all(nb in nbs for nb in traces):
+            return amplitudes
+        return stackTraces([amplitudes[i] if nb in nbs else np.empty(0, dtype=np.float32) for i, nb in enumerate(traces)])
+
+    def getTrace(self, nb: int) -> np.ndarray:
+        """Gets a trace of the sweep and ends the frame.
+
+        Args:
+            nb (int): The trace number.
+
+        Returns:
+            np.ndarray: The trace data (NaN if the trace is not active).
+        """
+        return self.endFrame().amplitudes[traces.index(nb)]
+
+    def getAnalyzer(self) -> ChannelAnalyzer:
+        """Gets the WiFi channel analyzer of the frequency axis, memoized until the axis or the RBW change.
+
+        Returns:
+            ChannelAnalyzer: The analyzer.
+        """
+        frequencies, rbw = self.getFrequencies(), self.getRBW()
+        if self.analyzer is None or self.analyzer.frequencies is not frequencies or self.analyzer.rbw != rbw:
+            self.analyzer = ChannelAnalyzer(frequencies, rbw)
+        return self.analyzer
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='ScryNet sweep stream client: reports the sweeps served by a publisher (Headless.py --serve)')
+    parser.add_argument('host', help='address of the publisher')
+    parser.add_argument('--port', type=int, default=STREAM_PORT, help='port of the publisher')
+    parser.add_argument('--source', type=int, default=0, help='instrument number of the publisher')
+    parser.add_argument('--period', type=float, default=1.0, help='time between two reports (s)')
+    args = parser.parse_args()
+
+    client = SweepClient(args.host, args.port, args.source)
+    seq, count, last = 0, 0, time.perf_counter()
+    try:
+        while True:
+            sweep = client.wait(seq, args.period)
+            if sweep is not None:
+                count += 1
+                seq = sweep.seq
+            now = time.perf_counter()
+            if now - last >= args.period and seq:
+                latest = client.latest
+                print(f'balayage {seq} : {count/(now - last):.1f} balayages/s, {latest.settings["start"]:.4f}-{latest.settings["stop"]:.4f} GHz, traces {latest.present}', file=sys.stderr)
+                count, last = 0, now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
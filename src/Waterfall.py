@@ -0,0 +1,79 @@
+import numpy as np
+
+# Most rows kept by a waterfall, above the height of its axes in pixels: deeper histories are decimated as
+# the sweeps come, so that the memory (2 x rows x points float32) and the cost of a frame do not grow with the depth
+MAX_ROWS = 512
+
+class WaterfallBuffer:
+    """Preallocated ring buffer of the last sweeps of a trace, for the spectrogram view.
+
+    Every row is written twice, rows apart, so that the history is always a contiguous slice
+    of the buffer: view() returns it without copying or reordering. When the depth exceeds
+    MAX_ROWS, each row is the maximum of step consecutive sweeps, accumulated by push, so that
+    an intermittent burst is never dropped.
+    """
+    def __init__(self, depth: int, points: int) -> None:
+        """Constructor.
+
+        Args:
+            depth (int): Number of sweeps kept.
+            points (int): Number of points per sweep.
+        """
+        self.depth = depth
+        self.points = points
+        # Sweeps per row, number of rows and number of sweeps they span (depth rounded up to a whole number of rows)
+        self.step = -(-depth//MAX_ROWS)
+        self.length = -(-depth//self.step)
+        self.span = self.length*self.step
+        self.rows = np.full((2*self.length, points), np.nan, dtype=np.float32)
+        self.head = 0
+        self.count = 0
+        # Sweeps accumulated in the head row
+        self.filled = 0
+
+    def push(self, sweep: np.ndarray) -> None:
+        """Adds a sweep, in O(points): it starts a new row, the oldest one is then overwritten, or is accumulated in the head row.
+
+        Args:
+            sweep (np.ndarray): Amplitudes of the sweep (dB).
+        """
+        if self.filled == 0:
+            self.head = (self.head - 1) % self.length
+            self.rows[self.head] = sweep
+        else:
+            # fmax ignores the missing points of the sweep
+            np.fmax(self.rows[self.head], sweep, out=self.rows[self.head])
+        self.rows[self.head + self.length] = self.rows[self.head]
+        self.filled = (self.filled + 1) % self.step
+        self.count = min(self.count + 1, self.span)
+
+    def view(self, maxRows: int = None) -> np.ndarray:
+        """Gives the history, newest sweep first.
+
+        Args:
+            maxRows (int): Maximum number of rows returned (e.g. the height of the image in pixels),
+                the rows are then reduced further, in O(MAX_ROWS x points) at most.
+
+        Returns:
+            np.ndarray: (rows, points) view of the buffer, NaN rows until it is full. When reduced, a copy
+                where every row is the maximum of consecutive rows.
+        """
+        history = self.rows[self.head:self.head + self.length]
+        step = -(-self.length//maxRows) if maxRows else 1
+        if step == 1:
+            return history
+        # One fmax per offset within the groups (np.fmax.reduceat along the rows is much slower),
+        # fmax ignores the NaN rows of a buffer that is not full yet
+        reduced = history[0::step].copy()
+        for offset in range(1, step):
+            rows = history[offset::step]
+            np.fmax(reduced[:len(rows)], rows, out=reduced[:len(rows)])
+        return reduced
+
+    def clear(self) -> None:
+        """Empties the buffer.
+        """
+        self.rows.fill(np.nan)
+        self.head = 0
+        self.count = 0
+        self.filled = 0
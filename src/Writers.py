@@ -0,0 +1,105 @@
+import string
+import struct
+import numpy as np
+
+from FMP import traces
+
+# Header of every record of the binary format: time (time.time), instrument number (order of the IPs), number of traces, number of points.
+# It is followed by the (trace, point) float32 little-endian matrix, NaN for the inactive traces.
+RECORD_HEADER = struct.Struct('<dHHI')
+
+class CsvWriter:
+    """Writes one line per active trace: time, instrument, trace number, amplitudes (dB).
+    """
+    def __init__(self, stream) -> None:
+        """Constructor.
+
+        Args:
+            stream: Text stream written to.
+        """
+        self.stream = stream
+        self.frequencies = None
+
+    def write(self, timestamp: float, ip: string, frequencies: np.ndarray, amplitudes: np.ndarray) -> None:
+        """Writes a sweep.
+
+        Args:
+            timestamp (float): Time of the sweep (time.time).
+            ip (string): IP address of the instrument.
+            frequencies (np.ndarray): Frequency axis (GHz).
+            amplitudes (np.ndarray): (trace, point) matrix.
+        """
+        if self.frequencies is None or not np.array_equal(frequencies, self.frequencies):
+            # The header is written again when the frequency axis changes (its values, the instruments and bands have their own arrays)
+            self.frequencies = frequencies
+            self.stream.write('time,instrument,trace,' + ','.join(f'{frequency:.9g}' for frequency in frequencies) + '\n')
+        for nb, amplitude in zip(traces, amplitudes):
+            if not np.isnan(amplitude).all():
+                self.stream.write(f'{timestamp:.6f},{ip},{nb},' + ','.join(f'{value:.2f}' for value in amplitude) + '\n')
+
+    def close(self) -> None:
+        self.stream.flush()
+
+class BinaryWriter:
+    """Writes one record per sweep (see RECORD_HEADER).
+    """
+    def __init__(self, stream, ips: list[string]) -> None:
+        """Constructor.
+
+        Args:
+            stream: Binary stream written to.
+            ips (list[string]): IP addresses of the instruments, in the order of the instrument numbers.
+        """
+        self.stream = stream
+        self.ips = ips
+
+    def write(self, timestamp: float, ip: string, frequencies: np.ndarray, amplitudes: np.ndarray) -> None:
+        self.stream.write(RECORD_HEADER.pack(timestamp, self.ips.index(ip), *amplitudes.shape))
+        self.stream.write(amplitudes.astype('<f4', copy=False).tobytes())
+
+    def close(self) -> None:
+        self.stream.flush()
+
+class NpzWriter:
+    """Keeps the sweeps in memory and writes them as a single NPZ archive when closed, for acquisitions
+    with a number of sweeps (the memory grows with it).
+
+    The archive holds, per series i: 'ip_i', 'frequencies_i', 'times_i' and 'traces_i', a (sweep, trace, point)
+    float32 array. Series i is instrument number i until its frequency axis changes, the following sweeps
+    of the instrument then go to a new series after the others.
+    """
+    def __init__(self, stream, ips: list[string]) -> None:
+        """Constructor.
+
+        Args:
+            stream: Binary stream written to.
+            ips (list[string]): IP addresses of the instruments, in the order of the instrument numbers.
+        """
+        self.stream = stream
+        self.ips = ips
+        # [ip, frequencies, times, matrices] per series and current series per instrument
+        self.series = [[ip, None, [], []] for ip in ips]
+        self.current = {ip: i for i, ip in enumerate(ips)}
+
+    def write(self, timestamp: float, ip: string, frequencies: np.ndarray, amplitudes: np.ndarray) -> None:
+        series = self.series[self.current[ip]]
+        if series[1] is not None and not np.array_equal(frequencies, series[1]):
+            # The sweeps of a series are stacked: a new axis starts a new series
+            self.current[ip] = len(self.series)
+            series = [ip, None, [], []]
+            self.series.append(series)
+        series[1] = frequencies
+        series[2].append(timestamp)
+        series[3].append(amplitudes)
+
+    def close(self) -> None:
+        arrays = {}
+        for i, (ip, frequencies, times, matrices) in enumerate(self.series):
+            if not matrices:
+                continue
+            arrays[f'ip_{i}'] = np.array(ip)
+            arrays[f'frequencies_{i}'] = frequencies
+            arrays[f'times_{i}'] = np.array(times)
+            arrays[f'traces_{i}'] = np.stack(matrices)
+        np.savez(self.stream, **arrays)
+        self.stream.flush()
@@ -1,7 +1,21 @@
+import time
+# Origin of the startup timing report, taken before the heavy imports
+START_TIME = time.perf_counter()
+
+import argparse
+
 from GUI import GUI
+from Instrumentation import METRICS
 
 def main():
-    GUI()
+    parser = argparse.ArgumentParser(description='ScryNet')
+    parser.add_argument('--startup-report', help='appends the startup timings to a file (JSON lines)')
+    parser.add_argument('--metrics', action='store_true', help='enables the instrumentation from the startup')
+    parser.add_argument('--connect', metavar='HOST[:PORT]', help='client mode: follows the sweeps served by another ScryNet process (Headless.py --serve) instead of connecting to the instruments')
+    args = parser.parse_args()
+    if args.metrics:
+        METRICS.enable()
+    GUI(START_TIME, args.startup_report, args.connect)
     
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
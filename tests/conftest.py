@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# The modules of the application import each other from src
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from Simulator import Simulator
+from FMP import FMP
+
+@pytest.fixture
+def simulator():
+    """Simulator listening on a free port, with fast sweeps."""
+    simulator = Simulator(port=0, sweepTime=0.01, seed=0).startInThread()
+    yield simulator
+    simulator.stop()
+
+@pytest.fixture
+def fmp(simulator):
+    """Connection to the simulator, trace 1 Active."""
+    fmp = FMP('127.0.0.1', simulator.port, timeout=2.0)
+    fmp.setTraceModeActive(1)
+    yield fmp
+    fmp.close()
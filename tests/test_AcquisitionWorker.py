@@ -0,0 +1,44 @@
+import threading
+import time
+
+from AcquisitionWorker import AcquisitionWorker, LatestQueue
+
+def startWorker():
+    """Worker whose fetches wait for a release, with the number of fetches started."""
+    fetches, release = [], threading.Semaphore(0)
+    def fetch(live):
+        fetches.append(live)
+        release.acquire()
+        return len(fetches)
+    return AcquisitionWorker(fetch, LatestQueue()), fetches, release
+
+def waitFetches(fetches, count):
+    deadline = time.perf_counter() + 2.0
+    while len(fetches) < count and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    return len(fetches)
+
+def testRequestDuringFetchGivesOneMoreFetch():
+    worker, fetches, release = startWorker()
+    worker.request()
+    assert waitFetches(fetches, 1) == 1
+    # Requests made during the fetch are coalesced into a single next one
+    worker.request()
+    worker.request()
+    release.release()
+    assert waitFetches(fetches, 2) == 2
+    release.release()
+    time.sleep(0.05)
+    assert len(fetches) == 2
+    worker.stop()
+
+def testJobsRunBeforeTheFetch():
+    order = []
+    worker = AcquisitionWorker(lambda live: order.append('fetch'), LatestQueue())
+    worker.submit(lambda: order.append('job'))
+    worker.request()
+    deadline = time.perf_counter() + 2.0
+    while len(order) < 2 and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    assert order[:2] == ['job', 'fetch']
+    worker.stop()
@@ -0,0 +1,40 @@
+import numpy as np
+
+from Analytics import ChannelAnalyzer, noiseFloor, peakTable, toDb, toLinear
+
+def sweep(frequencies: np.ndarray, peaks: dict) -> np.ndarray:
+    """Flat -90 dBm sweep with a single point at the given amplitude for every frequency of peaks."""
+    amplitudes = np.full(len(frequencies), -90.0)
+    for frequency, amplitude in peaks.items():
+        amplitudes[np.argmin(abs(frequencies - frequency))] = amplitude
+    return amplitudes
+
+def testNoiseFloorIgnoresSignalsAndMissingPoints():
+    amplitudes = np.full((2, 100), -90.0)
+    amplitudes[:, :5] = -20
+    amplitudes[1, 50:] = np.nan
+    assert np.allclose(noiseFloor(amplitudes), -90)
+
+def testPeakTableIsSortedPerSweep():
+    frequencies = np.linspace(2.4, 2.5, 101)
+    amplitudes = np.stack((sweep(frequencies, {2.42: -40, 2.45: -30, 2.48: -50}), sweep(frequencies, {2.41: -60})))
+    table = peakTable(amplitudes, frequencies, count=2)
+    assert table['sweep'].tolist() == [0, 0, 1]
+    assert np.allclose(table['frequency'], [2.45, 2.42, 2.41])
+    assert np.allclose(table['amplitude'], [-30, -40, -60])
+    assert len(peakTable(amplitudes, frequencies, threshold=-35)) == 1
+
+def testChannelPowerAndOccupiedBandwidth():
+    frequencies = np.linspace(2.4, 2.5, 1001)
+    analyzer = ChannelAnalyzer(frequencies)
+    assert analyzer.names[0] == '2.4G 1' and analyzer.names[-1] == '2.4G 13'
+    # Two points of -30 dBm at the center of channel 6, nothing elsewhere
+    amplitudes = np.full(len(frequencies), np.nan)
+    amplitudes[[371, 372]] = -30
+    channel = analyzer.names.index('2.4G 6')
+    assert np.isclose(analyzer.channelPower(amplitudes)[0, channel], toDb(2*toLinear(-30.0)))
+    assert analyzer.channelPower(amplitudes)[0, 0] == -np.inf
+    assert np.isclose(analyzer.occupiedBandwidth(amplitudes)[0, channel], 2*analyzer.binWidth)
+    busy = analyzer.busy(amplitudes, threshold=-40)[0]
+    # Channels 20 MHz wide, 5 MHz apart: the neighbouring channels hold the points too
+    assert busy.tolist() == analyzer.masks[:, 371].tolist() and busy.sum() > 1
@@ -0,0 +1,61 @@
+import asyncio
+import numpy as np
+import pytest
+
+from AsyncFMP import AsyncFMP
+
+def testGettersAndPipelinedTraces(simulator):
+    async def run():
+        async with AsyncFMP('127.0.0.1', simulator.port) as fmp:
+            await fmp.setRBW(1e5)
+            await fmp.setTraceModeActive(1)
+            fmp.invalidate()
+            assert await fmp.getRBW() == 1e5
+            assert await fmp.getRefLvl() == 0.0
+            assert await fmp.getTraceMode(1) == '1'
+            assert await fmp.getPointNumber() == 551
+            await asyncio.sleep(0.05)
+            amplitudes = await fmp.getTraces()
+            assert amplitudes.shape == (6, 551)
+    asyncio.run(run())
+
+def testBatchIsPerTask(simulator):
+    async def run():
+        async with AsyncFMP('127.0.0.1', simulator.port) as fmp:
+            async def batched():
+                async with fmp.batch():
+                    await fmp.setRBW(1e5)
+                    await asyncio.sleep(0.1)
+            async def other():
+                await asyncio.sleep(0.02)
+                await fmp.setRefLvl(-10)
+                # Sent at once, not held by the batch of the other task
+                assert await fmp.query('DISP:WIND:TRAC:Y:SCAL:RLEV?') == '-10.0'
+            await asyncio.gather(batched(), other())
+            assert await fmp.query('BAND:RES?') == '100000.0'
+    asyncio.run(run())
+
+def testSweepsLikeFMP(simulator):
+    async def run():
+        async with AsyncFMP('127.0.0.1', simulator.port) as fmp:
+            await fmp.setTraceModeActive(1)
+            amplitudes = await fmp.getSweep([1])
+            assert amplitudes.shape == (6, 551) and not np.isnan(amplitudes[0]).any()
+            assert len(await fmp.getFrequencies()) == 551
+            counts = []
+            async for count, amplitudes in fmp.sweeps([1], continuous=True):
+                counts.append(count)
+                if len(counts) == 3:
+                    break
+            assert counts == sorted(set(counts))
+    asyncio.run(run())
+
+def testTraceTimeoutKeepsTheResponsesInOrder(simulator):
+    async def run():
+        async with AsyncFMP('127.0.0.1', simulator.port) as fmp:
+            simulator.latencies = {'TRAC:DATA?': 0.2}
+            with pytest.raises(TimeoutError):
+                await fmp.getTrace(1, timeout=0.05)
+            simulator.latencies = {}
+            assert await fmp.query('DISP:POIN?') == '551'
+    asyncio.run(run())
@@ -0,0 +1,34 @@
+import json
+import sys
+import pytest
+
+import Headless
+from BandScheduler import Band, BandScheduler, loadBands, orderBands
+
+def testBandsSharingSettingsFollowEachOther():
+    bands = [Band('a', 1.0, 2.0, rbw=1e5), Band('b', 2.0, 3.0, rbw=3e5), Band('c', 3.0, 4.0, rbw=1e5), Band('d', 4.0, 5.0)]
+    assert [band.name for band in orderBands(bands)] == ['d', 'a', 'c', 'b']
+
+def testLoadBandsTakesThePresetFrequencies(tmp_path):
+    path = tmp_path / 'bands.json'
+    path.write_text(json.dumps([{'name': 'WiFi 2', 'sweeps': 2}, {'name': 'GSM', 'start': 0.925, 'stop': 0.96, 'dwell': 0.5}]))
+    wifi, gsm = loadBands(str(path))
+    assert (wifi.start, wifi.stop, wifi.sweeps) == (2.4, 2.5, 2)
+    assert (gsm.start, gsm.dwell) == (0.925, 0.5)
+
+def testRunVisitsEveryBandAndRestoresTheSettings(fmp):
+    calls = []
+    bands = [Band('low', 2.4, 2.45, sweeps=2), Band('high', 2.45, 2.5, rbw=3e5)]
+    scheduler = BandScheduler(fmp, bands, [1], listener=lambda band, timestamp, frequencies, amplitudes: calls.append((band.name, frequencies[0])))
+    series = scheduler.run(cycles=2)
+    assert scheduler.count == len(calls) == 6
+    assert [name for name, _ in calls[:3]] == ['low', 'low', 'high']
+    assert calls[2][1] == 2.45
+    assert len(series['low'].visits) == 2 and series['low'].stacked().shape == (4, 6, 551)
+    fmp.invalidate()
+    assert (fmp.getStartFreq(), fmp.getStopFreq()) == (2.4, 2.5)
+
+def testHeadlessRejectsTheOptionsBandsIgnore(monkeypatch):
+    monkeypatch.setattr(sys, 'argv', ['Headless.py', '127.0.0.1', '--bands', 'WiFi 2', 'WiFi 5', '--serve'])
+    with pytest.raises(SystemExit):
+        Headless.main()
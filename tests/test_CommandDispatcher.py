@@ -0,0 +1,50 @@
+import threading
+import time
+
+from InstrumentPool import InstrumentPool
+from CommandDispatcher import CommandDispatcher
+
+def waitIdle(dispatcher: CommandDispatcher, timeout: float = 2.0) -> None:
+    deadline = time.perf_counter() + timeout
+    while dispatcher.pending and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+def testLastCommandWins(simulator):
+    pool = InstrumentPool(['127.0.0.1'], simulator.port)
+    dispatcher = CommandDispatcher(pool)
+    release = threading.Event()
+    # The worker is busy while the commands are queued
+    pool.submit('127.0.0.1', lambda fmp: release.wait())
+    ran = []
+    for value in range(5):
+        dispatcher.dispatch('127.0.0.1', 'rbw', lambda fmp, value=value: ran.append(value))
+    dispatcher.dispatch('127.0.0.1', 'ref', lambda fmp: ran.append('ref'))
+    assert dispatcher.pending == 2
+    release.set()
+    waitIdle(dispatcher)
+    assert ran == [4, 'ref']
+    assert dispatcher.poll() == [('rbw', None), ('ref', None)]
+    pool.close()
+
+def testCommandErrorsAreReported(simulator):
+    pool = InstrumentPool(['127.0.0.1'], simulator.port)
+    dispatcher = CommandDispatcher(pool)
+    def fail(fmp):
+        raise ValueError('refused')
+    dispatcher.dispatch('127.0.0.1', 'rbw', fail)
+    waitIdle(dispatcher)
+    (key, error), = dispatcher.poll()
+    assert key == 'rbw' and isinstance(error, ValueError)
+    pool.close()
+
+def testFailedConnectionReleasesCommands():
+    # Nothing listens on port 1: the background connection fails
+    pool = InstrumentPool(['127.0.0.1'], 1, wait=False)
+    dispatcher = CommandDispatcher(pool)
+    for _ in range(2):
+        dispatcher.dispatch('127.0.0.1', 'rbw', lambda fmp: None)
+        waitIdle(dispatcher)
+        assert dispatcher.pending == 0
+        (key, error), = dispatcher.poll()
+        assert key == 'rbw' and isinstance(error, OSError)
+    assert not dispatcher.queued
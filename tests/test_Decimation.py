@@ -0,0 +1,35 @@
+import numpy as np
+
+from Decimation import MinMaxPyramid, MIN_BLOCKS
+
+def testNarrowSpikeIsKept():
+    frequencies = np.linspace(1.0, 2.0, 100001)
+    amplitudes = np.full((2, 100001), -90.0, dtype=np.float32)
+    amplitudes[0, 54321] = 0.0
+    amplitudes[1, 12345] = -120.0
+    pyramid = MinMaxPyramid(frequencies, amplitudes)
+    x, y, density = pyramid.envelope(1.0, 2.0, 1000)
+    assert density > 1
+    assert y.shape[-1] <= 2*1000*2
+    assert len(x) == y.shape[-1]
+    assert y[0].max() == 0.0 and y[1].min() == -120.0
+
+def testLevelsAreHalved():
+    pyramid = MinMaxPyramid(np.linspace(1.0, 2.0, 1001), np.arange(1001, dtype=np.float32))
+    sizes = [mins.shape[-1] for mins, _ in pyramid.levels]
+    assert sizes[0] == 1001 and sizes[-1] <= MIN_BLOCKS
+    assert all(-(-a//2) == b for a, b in zip(sizes, sizes[1:]))
+
+def testZoomReturnsThePoints():
+    frequencies = np.linspace(1.0, 2.0, 10001)
+    amplitudes = np.random.default_rng(0).standard_normal(10001).astype(np.float32)
+    x, y, density = MinMaxPyramid(frequencies, amplitudes).envelope(1.5, 1.501, 1000)
+    assert density <= 1
+    assert np.array_equal(y[0], amplitudes[np.searchsorted(frequencies, x)])
+    assert x[0] < 1.5 and x[-1] > 1.501
+
+def testMissingPointsAreIgnored():
+    amplitudes = np.full(4096, np.nan, dtype=np.float32)
+    amplitudes[100] = -50
+    _, y, _ = MinMaxPyramid(np.linspace(1.0, 2.0, 4096), amplitudes).envelope(1.0, 2.0, 100)
+    assert np.nanmax(y) == -50
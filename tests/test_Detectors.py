@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from Detectors import Detector, DetectorBank, MaxHold, Average, ExponentialAverage
+
+def testMaxHoldWindow():
+    detector = MaxHold(window=2)
+    for value in (1.0, 3.0, 2.0):
+        detector.push(np.full(4, value))
+    # The window restarted on the third sweep
+    assert detector.value().tolist() == [2.0]*4
+
+def testAverageOfPowers():
+    detector = Average()
+    detector.push(np.full(2, -10.0))
+    detector.push(np.full(2, -20.0))
+    assert detector.value() == pytest.approx(10*np.log10((0.1 + 0.01)/2))
+
+def testDetectorIsAbstract():
+    with pytest.raises(TypeError):
+        Detector()
+
+def testBankRestartsOnNewAxisOrInstrument():
+    bank = DetectorBank()
+    bank.configure(['Max'])
+    frequencies = np.linspace(2.4, 2.5, 4)
+    bank.push(np.full(4, 0.0), 'a', frequencies)
+    bank.push(np.full(4, -10.0), 'a', frequencies.copy())
+    assert bank.values()['Max'].tolist() == [0.0]*4
+    # Same point number, other span
+    bank.push(np.full(4, -10.0), 'a', np.linspace(5.1, 5.2, 4))
+    assert bank.values()['Max'].tolist() == [-10.0]*4
+    bank.push(np.full(4, -20.0), 'b', np.linspace(5.1, 5.2, 4))
+    assert bank.values()['Max'].tolist() == [-20.0]*4
+
+def testAveragesSkipMissingPoints():
+    for detector in (Average(), ExponentialAverage()):
+        detector.push(np.array([-10.0, np.nan, np.nan]))
+        detector.push(np.array([np.nan, -20.0, np.nan]))
+        detector.push(np.array([-10.0, -20.0, np.nan]))
+        value = detector.value()
+        assert value[:2] == pytest.approx([-10.0, -20.0])
+        assert np.isnan(value[2])
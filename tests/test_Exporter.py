@@ -0,0 +1,26 @@
+import json
+from concurrent.futures import Future
+import numpy as np
+
+from Exporter import ExportBatch, Snapshot, exportSnapshot
+
+def testSnapshotDataAndMetadata(tmp_path):
+    amplitudes = np.full((6, 3), np.nan, dtype=np.float32)
+    amplitudes[0] = [-50, -40, -30]
+    snapshot = Snapshot('frame', [(np.linspace(2.4, 2.5, 3), amplitudes, '10.0.0.1')], {'time': 1.0, 'rbw': 1e5})
+    paths = exportSnapshot(snapshot, str(tmp_path), ['npz', 'csv'])
+    assert sorted(path.rsplit('.', 1)[1] for path in paths) == ['csv', 'json', 'npz']
+    assert np.array_equal(np.load(tmp_path / 'frame.npz')['traces_0'][0], amplitudes, equal_nan=True)
+    assert (tmp_path / 'frame.csv').read_text().splitlines()[1].startswith('1.000000,10.0.0.1,1,-50.00')
+    assert json.loads((tmp_path / 'frame.json').read_text()) == {'time': 1.0, 'rbw': 1e5}
+
+def testCancelledTasksFinishTheBatch():
+    batch = ExportBatch(5)
+    done, cancelled = Future(), Future()
+    batch.track(done, 3)
+    batch.track(cancelled, 2)
+    done.set_result(['a.png'])
+    assert not batch.finished
+    cancelled.cancel()
+    assert batch.finished
+    assert batch.paths == ['a.png'] and len(batch.errors) == 1
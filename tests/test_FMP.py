@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from FMP import FMP, batchLines, MAX_LINE_LENGTH
+
+IDN = 'Anritsu,MS2090A,Simulator,1.0'
+
+def recordWrites(fmp: FMP) -> list:
+    """Records the lines sent by an instrument connection."""
+    lines = []
+    write = fmp.write
+    def record(command):
+        lines.append(command)
+        write(command)
+    fmp.write = record
+    return lines
+
+def testQueryAfterTimeoutGetsItsOwnReply(simulator, fmp):
+    simulator.latencies = {'*IDN?': 0.2}
+    with pytest.raises(TimeoutError):
+        fmp.query('*IDN?', timeout=0.05)
+    assert fmp.query('DISP:POIN?') == '551'
+    assert fmp.query('*IDN?') == IDN
+
+def testTraceTimeoutIsRaisedAndDiscarded(simulator, fmp):
+    fmp.getSweep([1])
+    simulator.latencies = {'TRAC:DATA?': 0.2}
+    with pytest.raises(TimeoutError):
+        fmp.getTrace(1, timeout=0.05)
+    simulator.latencies = {}
+    assert fmp.query('FREQ:STAR?') == '2400000000.0'
+    assert len(fmp.getTrace(1)) == 551
+
+def testInactiveTraceIsEmpty(fmp):
+    fmp.setDataFormat(False)
+    assert len(fmp.getTrace(2)) == 0
+
+def testBinaryAndAsciiTraces(fmp):
+    amplitudes = fmp.getSweep([1])
+    assert amplitudes.shape == (6, 551)
+    assert np.isnan(amplitudes[1:]).all()
+    fmp.setDataFormat(False)
+    assert np.allclose(fmp.getTrace(1), amplitudes[0], atol=0.01)
+
+def testBatchSkipsUnchangedSettings():
+    applied = {'FREQ:STAR': 2.4e9}
+    pending = [('FREQ:STAR', 2.4e9, 'FREQ:STAR 2400000000.0'), ('FREQ:STOP', 2.5e9, 'FREQ:STOP 2500000000.0'), (None, None, 'INIT')]
+    assert batchLines(pending, applied, True) == [':FREQ:STOP 2500000000.0;:INIT;*OPC?']
+    assert applied['FREQ:STOP'] == 2.5e9
+    assert batchLines(pending[:2], applied, True) == []
+
+def testBatchSplitsLongLines():
+    pending = [(f'TRAC{i}:TYPE', 'NORMal', f'TRACe{i}:TYPE NORMal') for i in range(100)]
+    lines = batchLines(pending, {}, False)
+    assert len(lines) > 1
+    assert all(len(line) <= MAX_LINE_LENGTH for line in lines)
+
+def testBatchIsSentOnOneLine(fmp):
+    lines = recordWrites(fmp)
+    with fmp.batch():
+        fmp.setStartFreq(5.1)
+        fmp.setStopFreq(5.9)
+        fmp.setRBW(1e5)
+    assert len(lines) == 1 and lines[0].endswith('*OPC?')
+    fmp.invalidate()
+    assert (fmp.getStartFreq(), fmp.getStopFreq(), fmp.getRBW()) == (5.1, 5.9, 1e5)
+
+def testCacheAvoidsQueries(fmp):
+    lines = recordWrites(fmp)
+    fmp.setStartFreq(2.41)
+    assert fmp.getStartFreq() == 2.41
+    fmp.getStopFreq()
+    fmp.getStopFreq()
+    assert lines == ['FREQ:STAR 2410000000.0', 'FREQ:STOP?']
+    fmp.invalidate('FREQ:STOP')
+    fmp.getStopFreq()
+    assert lines[-1] == 'FREQ:STOP?'
+
+def testFrequenciesAreMemoized(fmp):
+    frequencies = fmp.getFrequencies()
+    assert fmp.getFrequencies() is frequencies
+    fmp.setStopFreq(2.6)
+    assert fmp.getFrequencies()[-1] == 2.6
+
+def testDiscardedReplies(fmp):
+    fmp.write('*IDN?')
+    fmp.discard()
+    fmp.write('TRACE:DATA? 1')
+    fmp.discard(True)
+    assert fmp.query('DISP:POIN?') == '551'
@@ -0,0 +1,34 @@
+import threading
+
+from FMP import FMP
+from InstrumentPool import InstrumentPool
+
+def simulated(simulator, failing=()):
+    """Pool factory connecting every IP to the simulator, the traces of the failing IPs raise."""
+    def factory(ip, port, **kwargs):
+        fmp = FMP('127.0.0.1', simulator.port, timeout=2.0)
+        if ip in failing:
+            def getTraces(nbs=None):
+                raise ConnectionError('lost')
+            fmp.getTraces = getTraces
+        fmp.setTraceModeActive(1)
+        fmp.getSweep([1])
+        return fmp
+    return factory
+
+def testEveryInstrumentHasItsOwnWorker(simulator):
+    pool = InstrumentPool(['a', 'b'], factory=simulated(simulator))
+    threads = pool.fanOut(lambda fmp: threading.current_thread().name)
+    assert threads['a'] != threads['b']
+    assert pool.fanOut(FMP.getPointNumber) == {'a': 551, 'b': 551}
+    pool.remove('b')
+    assert pool.ips == ['a']
+    pool.close()
+
+def testFailedInstrumentIsReported(simulator):
+    pool = InstrumentPool(['a', 'b'], factory=simulated(simulator, failing=['b']))
+    acquisition = pool.getTraces()
+    assert list(acquisition.traces) == ['a'] and list(acquisition.errors) == ['b']
+    assert acquisition.stacked().shape == (1, 6, 551)
+    assert acquisition.skew == 0.0
+    pool.close()
@@ -0,0 +1,61 @@
+import csv
+import json
+import pytest
+
+from FMP import FMP
+from Instrumentation import Metrics, Histogram, METRICS, DISABLED_SPAN, commandKey
+
+def testCommandKey():
+    assert commandKey('TRACe2:SWEep:COUNt?') == commandKey('TRACe5:SWEep:COUNt?') == 'TRACE:SWEEP:COUNT?'
+    assert commandKey(':FREQ:STAR?;:FREQ:STOP?') == 'FREQ:STAR?;FREQ:STOP?'
+    assert commandKey('INIT:CONT ON') == 'INIT:CONT'
+
+def testHistogramPercentiles():
+    histogram = Histogram()
+    for duration in [0.001]*90 + [0.1]*10:
+        histogram.add(duration)
+    summary = histogram.summary()
+    assert summary['count'] == 100
+    assert 1.0 <= summary['p50_ms'] < 1.3
+    assert 100.0 <= summary['p99_ms'] < 130.0
+    assert summary['max_ms'] == pytest.approx(100.0)
+
+def testDisabledMetricsRecordNothing():
+    metrics = Metrics()
+    metrics.count('sweeps')
+    metrics.latency('*IDN?', 0.01)
+    assert metrics.span('parse') is DISABLED_SPAN
+    snapshot = metrics.snapshot()
+    assert snapshot['counters'] == {} and snapshot['commands'] == {}
+
+def testSpansAndExport(tmp_path):
+    metrics = Metrics(enabled=True)
+    with metrics.span('parse'):
+        pass
+    metrics.count('sweeps', 3)
+    metrics.export(str(tmp_path/'metrics.json'))
+    metrics.export(str(tmp_path/'metrics.csv'))
+    with open(tmp_path/'metrics.json') as file:
+        snapshot = json.load(file)
+    assert snapshot['spans']['parse']['count'] == 1
+    assert snapshot['counters']['sweeps']['count'] == 3
+    with open(tmp_path/'metrics.csv', newline='') as file:
+        rows = {(row['kind'], row['name']): row for row in csv.DictReader(file)}
+    assert rows[('counters', 'sweeps')]['count'] == '3'
+    assert 'balayages/s' in metrics.status()
+
+def testInstrumentLatencies(simulator):
+    METRICS.enable()
+    try:
+        METRICS.reset()
+        fmp = FMP('127.0.0.1', simulator.port)
+        fmp.setTraceModeActive(1)
+        fmp.getSweep([1])
+        fmp.close()
+        snapshot = METRICS.snapshot()
+        assert snapshot['commands']['*OPC?']['count'] >= 1
+        assert snapshot['commands']['TRACE:DATA?']['count'] == 1
+        assert snapshot['counters']['bytes_received']['count'] > 551*4
+    finally:
+        METRICS.enable(False)
+        METRICS.reset()
@@ -0,0 +1,47 @@
+import numpy as np
+
+from Masks import LimitMask, MaskChecker, AlarmStream
+
+MASK = LimitMask('test', upper=[(1.0, -50), (2.0, -50), (2.0, -20), (3.0, -20)], lower=[(1.0, -100), (3.0, -100)])
+
+def testInterpolationOutsideTheLines():
+    upper, lower = LimitMask('upper', upper=[(2.0, -20), (3.0, -20)]).interpolate(np.array([1.0, 2.5, 4.0]))
+    assert upper.tolist() == [np.inf, -20, np.inf]
+    assert np.isneginf(lower).all()
+
+def testViolations():
+    frequencies = np.linspace(1.0, 3.0, 21)
+    amplitudes = np.full((6, 21), np.nan, dtype=np.float32)
+    amplitudes[0] = -60
+    amplitudes[0, 3:5] = -40
+    amplitudes[2] = -110
+    result = MaskChecker(MASK).check(frequencies, amplitudes)
+    assert result.violated
+    assert result.counts.tolist() == [2, 0, 21, 0, 0, 0]
+    assert result.margins[0] == -10
+    assert result.worstFrequencies[0] in frequencies[3:5]
+    assert np.isinf(result.margins[1]) and np.isnan(result.worstFrequencies[1])
+    assert result.regions.tolist() == [[1.0, 3.0]]
+
+def testRegions():
+    frequencies = np.linspace(1.0, 3.0, 21)
+    amplitudes = np.full(21, -60.0)
+    amplitudes[3:5] = -40
+    amplitudes[8] = -40
+    result = MaskChecker(MASK).check(frequencies, amplitudes)
+    assert np.allclose(result.regions, [[1.3, 1.4], [1.8, 1.8]])
+
+def testLimitsFollowTheAxis():
+    checker = MaskChecker(MASK)
+    assert checker.check(np.linspace(1.0, 3.0, 11), np.full(11, -30.0)).violated
+    assert not checker.check(np.linspace(2.5, 3.0, 11), np.full(11, -30.0)).violated
+
+def testAlarmsAreRateLimited():
+    frequencies = np.linspace(1.0, 3.0, 21)
+    result = MaskChecker(MASK).check(frequencies, np.full(21, -40.0))
+    alarms = AlarmStream(period=5.0)
+    assert len(alarms.push(result, 0.0)) == 1
+    assert alarms.push(result, 1.0) == []
+    assert alarms.push(result, 2.0) == []
+    alarm, = alarms.push(result, 6.0)
+    assert alarm['suppressed'] == 2 and alarm['trace'] == 1
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from Recorder import SweepRecorder, SweepSession, INT16_STEP
+
+def sweep(value: float) -> np.ndarray:
+    amplitudes = np.full((2, 5), np.nan, dtype=np.float32)
+    amplitudes[0] = value
+    return amplitudes
+
+def testSessionGrowsAndIsReadBack(tmp_path):
+    recorder = SweepRecorder(str(tmp_path), 2, 5, capacity=2)
+    for i in range(5):
+        recorder.append(sweep(-50.0 + i), 2.4, 2.5, 1e5, timestamp=100.0 + i)
+    recorder.close()
+    session = SweepSession(str(tmp_path))
+    assert len(session) == 5 and recorder.capacity == 8
+    assert np.array_equal(session.sweep(3), sweep(-47.0), equal_nan=True)
+    assert session.settings(3) == {'time': 103.0, 'start': 2.4, 'stop': 2.5, 'rbw': 1e5}
+    assert session.frequencies(0)[-1] == 2.5
+    assert session.seek(102.5) == 2 and session.seek(0.0) == 0
+
+def testInt16SessionKeepsTheMissingPoints(tmp_path):
+    recorder = SweepRecorder(str(tmp_path), 2, 5, dtype='int16')
+    recorder.append(sweep(-50.123), 2.4, 2.5, 1e5)
+    recorder.append(sweep(0.0), 2.4, 2.5, 1e5)
+    recorder.discardLast()
+    recorder.close()
+    session = SweepSession(str(tmp_path))
+    assert len(session) == 1
+    assert session.sweep(0)[0] == pytest.approx(-50.123, abs=INT16_STEP)
+    assert np.isnan(session.sweep(0)[1]).all()
+
+def testShapeMismatchIsRefused(tmp_path):
+    recorder = SweepRecorder(str(tmp_path), 2, 5)
+    with pytest.raises(ValueError):
+        recorder.append(np.zeros((2, 6), dtype=np.float32), 2.4, 2.5, 1e5)
+    recorder.close()
+    assert len(SweepSession(str(tmp_path))) == 0
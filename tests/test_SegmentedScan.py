@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from SegmentedScan import SegmentedScan, planSegments
+
+def testPlanSegmentsSharesBoundaries():
+    segments, frequencies = planSegments(2.4, 2.5, 1e4, 551)
+    spacing = np.diff(frequencies)
+    assert spacing.max()*1e9 <= 1e4 + 1e-3
+    assert segments[0][0] == 2.4 and segments[-1][1] == pytest.approx(2.5)
+    assert len(frequencies) == len(segments)*550 + 1
+    for (_, stop), (start, _) in zip(segments, segments[1:]):
+        assert stop == start
+
+def testPlanSegmentsSingleSegment():
+    segments, frequencies = planSegments(2.4, 2.5, 1e6, 551)
+    assert segments == [(2.4, 2.5)]
+    assert len(frequencies) == 551
+
+def testRunStitchesAndRestoresSpan(fmp):
+    scan = SegmentedScan(fmp, 2.4, 2.5, 5e4)
+    amplitudes = scan.run()
+    assert len(amplitudes) == len(scan.frequencies)
+    assert not np.isnan(amplitudes).any()
+    fmp.invalidate()
+    assert (fmp.getStartFreq(), fmp.getStopFreq()) == (2.4, 2.5)
+    assert fmp.isContinuous()
+
+def testSingleSweepModeIsKept(fmp):
+    fmp.continuousOff()
+    SegmentedScan(fmp, 2.4, 2.5, 5e4).run()
+    fmp.invalidate()
+    assert not fmp.isContinuous()
+
+def testFailedRunRestoresSpanAndConnection(simulator, fmp):
+    scan = SegmentedScan(fmp, 2.4, 2.5, 5e4, timeout=0.05)
+    simulator.latencies = {'*OPC?': 0.2}
+    with pytest.raises(TimeoutError):
+        scan.run()
+    simulator.latencies = {}
+    fmp.invalidate()
+    assert (fmp.getStartFreq(), fmp.getStopFreq()) == (2.4, 2.5)
+    assert fmp.isContinuous()
+    assert fmp.query('*IDN?').startswith('Anritsu')
+
+def testPointCountError(fmp):
+    scan = SegmentedScan(fmp, 2.4, 2.5, 5e4)
+    scan.points = 10
+    with pytest.raises(ValueError):
+        scan.run()
+    assert fmp.query('DISP:POIN?') == '551'
@@ -0,0 +1,70 @@
+import numpy as np
+
+from SweepBus import SweepBus
+
+def publish(bus: SweepBus, count: int) -> None:
+    frequencies = np.linspace(1.0, 2.0, 11)
+    for _ in range(count):
+        # Every sweep holds its sequence number
+        bus.publish(frequencies, np.full((6, 11), bus.head() + 1, dtype=np.float32))
+
+def testReaderGetsEverySweepInOrder():
+    bus = SweepBus(6, 11, slots=8)
+    try:
+        reader = bus.reader()
+        seqs = []
+        for _ in range(20):
+            publish(bus, 1)
+            sweep = reader.poll()
+            seqs.append(sweep.seq)
+            assert sweep.amplitudes[0, 0] == sweep.seq
+        assert seqs == list(range(1, 21)) and reader.skipped == 0
+        assert reader.poll() is None
+    finally:
+        bus.unlink()
+        bus.close()
+
+def testSlowReaderSkipsAhead():
+    bus = SweepBus(6, 11, slots=8)
+    try:
+        reader = bus.reader()
+        publish(bus, 20)
+        sweep = reader.poll()
+        # The oldest sweep that cannot be overwritten before it is read
+        assert sweep.seq == 20 - 8 + 2
+        assert reader.skipped == sweep.seq - 1
+        assert sweep.intact()
+        seqs = [sweep.seq]
+        while (sweep := reader.poll()) is not None:
+            seqs.append(sweep.seq)
+        assert seqs == list(range(14, 21))
+    finally:
+        bus.unlink()
+        bus.close()
+
+def testLatestReaderAndOverwrittenSweep():
+    bus = SweepBus(6, 11, slots=4)
+    try:
+        latest = bus.reader(latest=True)
+        publish(bus, 5)
+        sweep = latest.poll()
+        assert sweep.seq == 5 and sweep.amplitudes[0, 0] == 5
+        publish(bus, 4)
+        assert not sweep.intact()
+    finally:
+        bus.unlink()
+        bus.close()
+
+def testAttachByName():
+    bus = SweepBus(6, 11, slots=4)
+    try:
+        other = SweepBus.attach(bus.name)
+        reader = other.reader()
+        publish(bus, 1)
+        sweep = reader.wait(1.0)
+        assert sweep.seq == 1 and np.array_equal(sweep.frequencies, np.linspace(1.0, 2.0, 11))
+        del sweep
+        other.close()
+    finally:
+        bus.unlink()
+        bus.close()
@@ -0,0 +1,87 @@
+import time
+import threading
+import numpy as np
+import pytest
+
+from SweepStream import SweepServer, SweepClient, StreamInstrument
+
+SETTINGS = {'rbw': 1e5, 'ref': -10.0, 'scale': 5.0, 'types': {1: 'NORM', 3: 'MAX'}}
+
+def sweep(points: int) -> tuple[np.ndarray, np.ndarray]:
+    amplitudes = np.full((6, points), np.nan, dtype=np.float32)
+    amplitudes[0] = np.arange(points)
+    amplitudes[2] = -np.arange(points)
+    return np.linspace(2.4, 2.5, points), amplitudes
+
+def waitSubscribers(server: SweepServer, count: int = 1) -> None:
+    deadline = time.perf_counter() + 2.0
+    while len(server.subscribers) < count and time.perf_counter() < deadline:
+        time.sleep(0.01)
+
+def connect(server: SweepServer, points: int) -> StreamInstrument:
+    """Connects an instrument, the first sweep is published once it has subscribed."""
+    def publish():
+        waitSubscribers(server)
+        server.publish(*sweep(points), settings=SETTINGS)
+    threading.Thread(target=publish).start()
+    return StreamInstrument('127.0.0.1', server.port)
+
+@pytest.fixture
+def server():
+    server = SweepServer(port=0).startInThread()
+    yield server
+    server.stop()
+
+def testRoundTrip(server):
+    client = SweepClient('127.0.0.1', server.port)
+    waitSubscribers(server)
+    try:
+        frequencies, amplitudes = sweep(101)
+        seq = server.publish(frequencies, amplitudes, 123.0, SETTINGS)
+        received = client.wait(seq - 1, 2.0)
+        assert received.seq == seq and received.timestamp == 123.0
+        assert np.allclose(received.frequencies, frequencies)
+        assert np.array_equal(received.amplitudes, amplitudes, equal_nan=True)
+        assert received.present == [1, 3]
+        assert received.settings['rbw'] == 1e5 and received.settings['types'] == {1: 'NORM', 3: 'MAX'}
+    finally:
+        client.close()
+
+def testFrameComesFromOneSweep(server):
+    instrument = connect(server, 11)
+    try:
+        frequencies = instrument.getFrequencies()
+        # The publisher changes its axis in the middle of the frame
+        seq = server.publish(*sweep(21), settings=SETTINGS)
+        instrument.client.wait(seq - 1, 2.0)
+        assert instrument.getPointNumber() == len(frequencies) == 11
+        assert instrument.getTraces([1]).shape == (6, 11)
+        # The next frame takes the latest sweep
+        assert len(instrument.getFrequencies()) == 21
+        assert instrument.getTraces().shape == (6, 21)
+    finally:
+        instrument.close()
+
+def testSweepCountFollowsThePublisher(server):
+    instrument = connect(server, 11)
+    try:
+        counts = []
+        for _ in range(4):
+            # The live mode reads the trace modes then the counter, without transferring the traces
+            instrument.getTraceMode(1)
+            counts.append(instrument.getSweepCount(1))
+            seq = server.publish(*sweep(11), settings=SETTINGS)
+            instrument.client.wait(seq - 1, 2.0)
+        assert counts == sorted(set(counts)) and len(counts) == 4
+    finally:
+        instrument.close()
+
+def testInstrumentIsReadOnly(server):
+    instrument = connect(server, 11)
+    try:
+        assert instrument.getRBW() == 1e5 and instrument.getTraceMode(3) == '1' and instrument.getTraceMode(2) == '0'
+        with pytest.raises(PermissionError):
+            instrument.setRBW(1e6)
+        assert not hasattr(instrument, '__len__')
+    finally:
+        instrument.close()
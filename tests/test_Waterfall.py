@@ -0,0 +1,36 @@
+import numpy as np
+
+from Waterfall import WaterfallBuffer, MAX_ROWS
+
+def testNewestSweepFirst():
+    buffer = WaterfallBuffer(4, 3)
+    for i in range(6):
+        buffer.push(np.full(3, i))
+    assert buffer.view()[:, 0].tolist() == [5, 4, 3, 2]
+    assert buffer.count == 4
+
+def testDecimationKeepsIntermittentBursts():
+    buffer = WaterfallBuffer(1000, 10)
+    for i in range(1000):
+        buffer.push(np.full(10, 0.0 if i % 7 == 0 else -90.0))
+    rows = buffer.view(100)
+    assert rows.shape == (100, 10)
+    # Every group of 10 sweeps holds a burst
+    assert (rows[:, 0] == 0.0).all()
+
+def testDecimationOfAPartialBuffer():
+    buffer = WaterfallBuffer(1000, 10)
+    buffer.push(np.zeros(10))
+    rows = buffer.view(100)
+    assert rows[0, 0] == 0.0 and np.isnan(rows[1:]).all()
+
+def testDeepHistoryIsDecimatedAsTheSweepsCome():
+    buffer = WaterfallBuffer(10000, 101)
+    assert len(buffer.rows) <= 2*MAX_ROWS and buffer.span >= 10000
+    for i in range(10000):
+        buffer.push(np.full(101, 0.0 if i == 1234 else -90.0))
+    rows = buffer.view()
+    assert len(rows) == buffer.length <= MAX_ROWS
+    # The burst is in the row of its group of sweeps, counted from the newest one
+    assert np.flatnonzero(rows[:, 0] == 0.0).tolist() == [(10000 - 1 - 1234)//buffer.step]
+    assert buffer.count == 10000
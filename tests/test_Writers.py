@@ -0,0 +1,41 @@
+import io
+import numpy as np
+
+from Writers import CsvWriter, BinaryWriter, NpzWriter, RECORD_HEADER
+
+def matrix(points: int) -> np.ndarray:
+    amplitudes = np.full((6, points), np.nan, dtype=np.float32)
+    amplitudes[0] = -50
+    return amplitudes
+
+def testNpzSplitsSeriesOnAxisChange():
+    stream = io.BytesIO()
+    writer = NpzWriter(stream, ['a', 'b'])
+    writer.write(1.0, 'a', np.linspace(1, 2, 5), matrix(5))
+    writer.write(1.0, 'b', np.linspace(1, 2, 5), matrix(5))
+    writer.write(2.0, 'a', np.linspace(1, 2, 7), matrix(7))
+    writer.write(3.0, 'a', np.linspace(1, 2, 7), matrix(7))
+    writer.close()
+    stream.seek(0)
+    archive = np.load(stream)
+    assert [str(archive[f'ip_{i}']) for i in range(3)] == ['a', 'b', 'a']
+    assert archive['traces_2'].shape == (2, 6, 7)
+    assert archive['times_2'].tolist() == [2.0, 3.0]
+
+def testCsvHeaderFollowsTheAxisValues():
+    stream = io.StringIO()
+    writer = CsvWriter(stream)
+    for ip in 'abab':
+        # Every instrument has its own array of the same axis
+        writer.write(1.0, ip, np.linspace(1, 2, 3), matrix(3))
+    writer.write(2.0, 'a', np.linspace(1, 3, 3), matrix(3))
+    lines = stream.getvalue().splitlines()
+    assert [line.startswith('time,') for line in lines] == [True, False, False, False, False, True, False]
+
+def testBinaryRecords():
+    stream = io.BytesIO()
+    writer = BinaryWriter(stream, ['a', 'b'])
+    writer.write(1.5, 'b', np.linspace(1, 2, 4), matrix(4))
+    data = stream.getvalue()
+    assert RECORD_HEADER.unpack_from(data) == (1.5, 1, 6, 4)
+    assert np.array_equal(np.frombuffer(data, '<f4', offset=RECORD_HEADER.size).reshape(6, 4), matrix(4), equal_nan=True)